@@ -7,6 +7,8 @@ from flask_session import Session
 from flask_sqlalchemy import SQLAlchemy
 
 from core.configuration.configuration import get_app_version
+from core.managers.analytics_manager import AnalyticsManager
+from core.managers.cache_manager import CacheManager
 from core.managers.config_manager import ConfigManager
 from core.managers.error_handler_manager import ErrorHandlerManager
 from core.managers.logging_manager import LoggingManager
@@ -32,6 +34,14 @@ def create_app(config_name="development"):
     db.init_app(app)
     migrate.init_app(app, db)
 
+    # Initialize the application cache
+    cache_manager = CacheManager(app)
+    cache_manager.init_cache()
+
+    # Initialize the buffered writer of view and download records
+    analytics_manager = AnalyticsManager(app)
+    analytics_manager.init_writer()
+
     # Initilize Session
     app.config["SESSION_SQLALCHEMY"] = db
     from flask_session.sqlalchemy import sqlalchemy as flask_session_module
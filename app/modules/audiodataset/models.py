@@ -1,7 +1,7 @@
 from sqlalchemy import Enum as SQLAlchemyEnum
 
 from app import db
-from app.modules.dataset.models import DataSet, PublicationType
+from app.modules.dataset.models import DataSet, PublicationType, sync_tags, tag_association
 
 
 class AudioDataset(DataSet):
@@ -15,12 +15,6 @@ class AudioDataset(DataSet):
     def files(self):
         return [file for audio in self.audios for file in audio.files]
 
-    def get_files_count(self):
-        return sum(len(audio.files) for audio in self.audios)
-
-    def get_file_total_size(self):
-        return sum(file.size for audio in self.audios for file in audio.files)
-
 
 class Audio(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -33,6 +27,9 @@ class Audio(db.Model):
         return f"Audio<{self.id}>"
 
 
+audio_meta_data_tag = tag_association("audio_meta_data")
+
+
 class AudioMetaData(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(120), nullable=False)
@@ -41,6 +38,9 @@ class AudioMetaData(db.Model):
     publication_type = db.Column(SQLAlchemyEnum(PublicationType), nullable=False)
     publication_doi = db.Column(db.String(120))
     tags = db.Column(db.String(120))
+    tag_list = db.relationship(
+        "Tag", secondary=audio_meta_data_tag, order_by=audio_meta_data_tag.c.position, lazy=True, viewonly=True
+    )
 
     authors = db.relationship(
         "Author", backref="audio_metadata", lazy=True, cascade="all, delete", foreign_keys="Author.audio_meta_data_id"
@@ -48,3 +48,6 @@ class AudioMetaData(db.Model):
 
     def __repr__(self):
         return f"AudioMetaData<{self.title}>"
+
+
+sync_tags(AudioMetaData, audio_meta_data_tag)
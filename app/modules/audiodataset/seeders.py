@@ -1,6 +1,5 @@
 import hashlib
 import os
-import shutil
 from datetime import datetime, timezone
 
 from dotenv import load_dotenv
@@ -8,8 +7,11 @@ from dotenv import load_dotenv
 from app.modules.audiodataset.models import Audio, AudioDataset, AudioMetaData
 from app.modules.auth.models import User
 from app.modules.dataset.models import Author, DSMetaData, PublicationType
+from app.modules.explore.repositories import ExploreRepository
 from app.modules.hubfile.models import Hubfile
+from app.modules.hubfile.services import HubfileService
 from core.seeders.BaseSeeder import BaseSeeder
+from core.storage.backends import get_storage
 
 
 class AudioDatasetSeeder(BaseSeeder):
@@ -31,6 +33,7 @@ class AudioDatasetSeeder(BaseSeeder):
 
         working_dir = os.getenv("WORKING_DIR", "")
         src_folder = os.path.join(working_dir, "app", "modules", "audiodataset", "songs_examples")
+        storage = get_storage()
 
         if not os.path.isdir(src_folder):
             raise Exception(f"Audio samples folder not found: {src_folder}")
@@ -111,9 +114,6 @@ class AudioDatasetSeeder(BaseSeeder):
             self.db.session.add(dataset)
             self.db.session.flush()
 
-            dest_folder = os.path.join(working_dir, "uploads", f"user_{user.id}", f"dataset_{dataset.id}")
-            os.makedirs(dest_folder, exist_ok=True)
-
             for track in dataset_def["tracks"]:
                 source_path = os.path.join(src_folder, track["filename"])
                 if not os.path.isfile(source_path):
@@ -142,11 +142,19 @@ class AudioDatasetSeeder(BaseSeeder):
                 self.db.session.add(audio)
                 self.db.session.flush()
 
-                dest_path = os.path.join(dest_folder, track["filename"])
-                shutil.copy(source_path, dest_path)
-
-                checksum, size = self._checksum_and_size(dest_path)
-                file_entry = Hubfile(name=track["filename"], checksum=checksum, size=size, audio_id=audio.id)
+                with open(source_path, "rb") as source:
+                    storage.write(HubfileService.get_storage_key(user.id, dataset.id, track["filename"]), source)
+
+                checksum, size = self._checksum_and_size(source_path)
+                file_entry = Hubfile(
+                    name=track["filename"],
+                    checksum=checksum,
+                    size=size,
+                    audio_id=audio.id,
+                    dataset_id=dataset.id,
+                    user_id=user.id,
+                )
                 self.db.session.add(file_entry)
 
             self.db.session.commit()
+            ExploreRepository().index_dataset(dataset)
@@ -1,10 +1,11 @@
 import logging
 import os
 
-from flask import flash, jsonify, redirect, render_template, request, send_file, url_for
+from flask import Response, flash, jsonify, redirect, render_template, request, url_for
 
 from app.modules.cart import cart_bp
 from app.modules.cart.services import CartService
+from core.delivery.file_delivery import deliver_file
 
 logger = logging.getLogger(__name__)
 
@@ -109,16 +110,22 @@ def download_cart():
             return redirect(url_for("cart.view_cart"))
 
         # Generate ZIP file
-        zip_path = cart_service.generate_cart_download()
+        zip_path, chunks = cart_service.generate_cart_download()
+        download_name = cart_service.get_download_name()
 
-        if not zip_path or not os.path.exists(zip_path):
+        if zip_path and os.path.exists(zip_path):
+            return deliver_file(zip_path, as_attachment=True, download_name=download_name, mimetype="application/zip")
+
+        if chunks is None:
             flash("Failed to generate download. Please try again.", "error")
             return redirect(url_for("cart.view_cart"))
 
-        # Send file
-        zip_filename = os.path.basename(zip_path)
-
-        return send_file(zip_path, as_attachment=True, download_name=zip_filename, mimetype="application/zip")
+        # Too large for the archive cache (or evicted meanwhile by another worker): streamed instead
+        return Response(
+            chunks,
+            mimetype="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{download_name}"'},
+        )
 
     except Exception as e:
         logger.exception(f"Error downloading cart: {e}")
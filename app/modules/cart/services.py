@@ -1,20 +1,21 @@
 import os
-import tempfile
 import uuid
 from datetime import datetime, timezone
-from typing import Optional
-from zipfile import ZipFile
+from typing import Iterator, Optional, Tuple
 
 from flask import session
 from flask_login import current_user
 
-from app import db
 from app.modules.audiodataset.models import Audio
 from app.modules.cart.models import Cart, CartItem
 from app.modules.cart.repositories import CartRepository
-from app.modules.dataset.models import DataSet, DSDownloadRecord
+from app.modules.dataset.models import DataSet
+from app.modules.dataset.services import DataSetService, DSDownloadRecordService
 from app.modules.featuremodel.models import FeatureModel
 from app.modules.imagedataset.models import Image
+from core.archives.archive_cache import archive_key
+from core.archives.zip_stream import stream_zip
+from core.storage.backends import get_storage, storage_source
 
 
 class CartService:
@@ -155,85 +156,94 @@ class CartService:
                 # Clear session cart ID
                 session.pop("cart_session_id", None)
 
-    def generate_cart_download(self) -> Optional[str]:
+    def generate_cart_download(self) -> Tuple[Optional[str], Optional[Iterator[bytes]]]:
         """
         Generate a ZIP file containing all items in the cart.
-        Returns the path to the generated ZIP file.
+        Returns the path to the ZIP file inside the archive cache (None when the cart is too large to be
+        cached) and a lazy stream of the same archive to send instead; (None, None) for an empty cart.
         """
         cart = self.get_or_create_cart()
         cart_items = self.repository.get_cart_items(cart)
 
         if not cart_items:
-            return None
-
-        # Create temporary directory
-        temp_dir = tempfile.mkdtemp()
-        zip_filename = f"my_custom_dataset_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.zip"
-        zip_path = os.path.join(temp_dir, zip_filename)
-
-        # Create ZIP file
-        with ZipFile(zip_path, "w") as zipf:
-            # Track datasets for README
-            datasets_info = {}
-
-            for cart_item in cart_items:
-                files_to_add = []
-                dataset = None
-
-                if cart_item.feature_model_id:
-                    feature_model = cart_item.feature_model
-                    if feature_model:
-                        dataset = DataSet.query.get(feature_model.data_set_id)
-                        if dataset:
-                            files_to_add = feature_model.files
-
-                elif cart_item.audio_id:
-                    audio = cart_item.audio
-                    if audio:
-                        dataset = audio.audio_dataset
-                        if dataset:
-                            files_to_add = audio.files
-
-                elif cart_item.image_id:
-                    image = cart_item.image
-                    if image:
-                        dataset = image.image_dataset
-                        if dataset:
-                            files_to_add = image.files
-
-                if not dataset or not files_to_add:
-                    continue
-
-                dataset_name = dataset.ds_meta_data.title if dataset.ds_meta_data else f"dataset_{dataset.id}"
-                dataset_name = self._sanitize_filename(dataset_name)
-
-                # Track dataset info for README
-                if dataset.id not in datasets_info:
-                    datasets_info[dataset.id] = {"name": dataset_name, "models": []}
-
-                # Add files to ZIP
-                for hubfile in files_to_add:
-                    file_path = f"uploads/user_{dataset.user_id}/dataset_{dataset.id}/{hubfile.name}"
-
-                    if os.path.exists(file_path):
-                        # Create structure: dataset_name/filename
-                        arcname = os.path.join(dataset_name, hubfile.name)
-                        zipf.write(file_path, arcname=arcname)
-
-                        # Track for README
-                        datasets_info[dataset.id]["models"].append(hubfile.name)
-
-            # Add README file
-            readme_content = self._generate_readme(datasets_info)
-            readme_path = os.path.join(temp_dir, "README.txt")
-            with open(readme_path, "w", encoding="utf-8") as f:
-                f.write(readme_content)
-            zipf.write(readme_path, arcname="README.txt")
+            return None, None
+
+        storage = get_storage()
+        dataset_service = DataSetService()
+        entries = []
+        members = []
+        total_size = 0
+
+        # Track datasets for README
+        datasets_info = {}
+
+        for cart_item in cart_items:
+            files_to_add = []
+            dataset = None
+
+            if cart_item.feature_model_id:
+                feature_model = cart_item.feature_model
+                if feature_model:
+                    dataset = DataSet.query.get(feature_model.data_set_id)
+                    if dataset:
+                        files_to_add = feature_model.files
+
+            elif cart_item.audio_id:
+                audio = cart_item.audio
+                if audio:
+                    dataset = audio.audio_dataset
+                    if dataset:
+                        files_to_add = audio.files
+
+            elif cart_item.image_id:
+                image = cart_item.image
+                if image:
+                    dataset = image.image_dataset
+                    if dataset:
+                        files_to_add = image.files
+
+            if not dataset or not files_to_add:
+                continue
+
+            dataset_name = dataset.ds_meta_data.title if dataset.ds_meta_data else f"dataset_{dataset.id}"
+            dataset_name = self._sanitize_filename(dataset_name)
+
+            # Track dataset info for README
+            if dataset.id not in datasets_info:
+                datasets_info[dataset.id] = {"name": dataset_name, "models": []}
+
+            # Add files to ZIP
+            for hubfile in files_to_add:
+                key = dataset_service.get_storage_key(dataset, hubfile.name)
+
+                if storage.exists(key):
+                    # Create structure: dataset_name/filename
+                    arcname = os.path.join(dataset_name, hubfile.name)
+                    entries.append((storage_source(storage, key), arcname))
+                    members.append((hubfile.checksum, arcname))
+                    total_size += hubfile.size or 0
+
+                    # Track for README
+                    datasets_info[dataset.id]["models"].append(hubfile.name)
+
+        # Add README file
+        entries.append((self._generate_readme(datasets_info).encode("utf-8"), "README.txt"))
+
+        # Identical carts share one archive; it lives in the archive cache so the front end can serve it
+        archive_cache = dataset_service.get_archive_cache()
+        key = archive_key("cart", members)
+        zip_path = archive_cache.get("cart", key)
+        # The ZIP is never smaller than its files; past the cache size it could not be kept anyway
+        if zip_path is None and total_size <= archive_cache.max_bytes:
+            zip_path = archive_cache.build("cart", key, stream_zip(entries))
 
         # Record download for each item
         self._record_downloads(cart_items)
 
-        return zip_path
+        return zip_path, stream_zip(entries)
+
+    def get_download_name(self) -> str:
+        return f"my_custom_dataset_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.zip"
 
     def _sanitize_filename(self, filename: str) -> str:
         """Sanitize filename to be filesystem-safe."""
@@ -251,7 +261,7 @@ class CartService:
             "CUSTOM DATASET - UVLHUB.IO",
             "=" * 60,
             "",
-            f"Downloaded: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}",
+            f"Generated: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}",
             "",
             "This archive contains items you selected from UVLHUB.IO",
             "",
@@ -286,7 +296,7 @@ class CartService:
         return "\n".join(content)
 
     def _record_downloads(self, cart_items: list) -> None:
-        """Record download statistics for cart items."""
+        """Record one download per dataset in the cart; the analytics writer counts each visitor once."""
         user_id = current_user.id if current_user.is_authenticated else None
         download_cookie = session.get("download_cookie", str(uuid.uuid4()))
 
@@ -294,6 +304,7 @@ class CartService:
         if "download_cookie" not in session:
             session["download_cookie"] = download_cookie
 
+        dataset_ids = []
         for cart_item in cart_items:
             dataset_id = None
             if cart_item.feature_model_id and cart_item.feature_model:
@@ -306,14 +317,9 @@ class CartService:
                 # Image model has data_set_id field.
                 dataset_id = cart_item.image.data_set_id
 
-            if dataset_id:
-                # Create download record
-                download_record = DSDownloadRecord(
-                    user_id=user_id,
-                    dataset_id=dataset_id,
-                    download_date=datetime.now(timezone.utc),
-                    download_cookie=download_cookie,
-                )
-                db.session.add(download_record)
-
-        db.session.commit()
+            if dataset_id and dataset_id not in dataset_ids:
+                dataset_ids.append(dataset_id)
+
+        download_record_service = DSDownloadRecordService()
+        for dataset_id in dataset_ids:
+            download_record_service.record_download(dataset_id, user_id, download_cookie)
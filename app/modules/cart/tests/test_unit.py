@@ -114,3 +114,78 @@ def test_cart_ui_route(test_client):
     response = test_client.get("/cart")
     assert response.status_code == 200
     assert b"My Cart" in response.data
+
+
+# Regression: two models of one dataset, downloaded twice by the same session
+def test_cart_download_records_each_dataset_once(test_client):
+    from app import db
+    from app.modules.dataset.models import DSDownloadRecord
+
+    user = User(email="cart_download_test@example.com", password="password")
+    db.session.add(user)
+    db.session.commit()
+
+    ds_meta = DSMetaData(
+        title="Test DS Download", description="Desc", publication_type=PublicationType.OTHER, deposition_id=67890
+    )
+    db.session.add(ds_meta)
+    db.session.commit()
+
+    ds = DataSet(user_id=user.id, ds_meta_data_id=ds_meta.id)
+    db.session.add(ds)
+    db.session.commit()
+
+    for name in ("first.uvl", "second.uvl"):
+        fm_meta = FMMetaData(uvl_filename=name, title=name, description="Desc", publication_type=PublicationType.OTHER)
+        db.session.add(fm_meta)
+        db.session.commit()
+        fm = FeatureModel(data_set_id=ds.id, fm_meta_data_id=fm_meta.id)
+        db.session.add(fm)
+        db.session.commit()
+        assert test_client.post(f"/cart/add/{fm.id}").status_code == 200
+
+    for _ in range(2):
+        response = test_client.get("/cart/download")
+        assert response.status_code == 200
+        assert response.mimetype == "application/zip"
+
+    db.session.refresh(ds)
+    assert DSDownloadRecord.query.filter_by(dataset_id=ds.id).count() == 1
+    assert ds.download_count == 1
+
+
+def test_cart_too_large_for_the_archive_cache_is_streamed(test_app, test_client):
+    from app import db
+
+    user = User(email="cart_stream_test@example.com", password="password")
+    db.session.add(user)
+    db.session.commit()
+
+    ds_meta = DSMetaData(
+        title="Test DS Stream", description="Desc", publication_type=PublicationType.OTHER, deposition_id=67891
+    )
+    db.session.add(ds_meta)
+    db.session.commit()
+    ds = DataSet(user_id=user.id, ds_meta_data_id=ds_meta.id)
+    db.session.add(ds)
+    db.session.commit()
+    fm_meta = FMMetaData(
+        uvl_filename="big.uvl", title="big", description="Desc", publication_type=PublicationType.OTHER
+    )
+    db.session.add(fm_meta)
+    db.session.commit()
+    fm = FeatureModel(data_set_id=ds.id, fm_meta_data_id=fm_meta.id)
+    db.session.add(fm)
+    db.session.commit()
+    assert test_client.post(f"/cart/add/{fm.id}").status_code == 200
+
+    previous = test_app.config["ARCHIVE_CACHE_MAX_BYTES"]
+    test_app.config["ARCHIVE_CACHE_MAX_BYTES"] = 0
+    try:
+        response = test_client.get("/cart/download")
+    finally:
+        test_app.config["ARCHIVE_CACHE_MAX_BYTES"] = previous
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.get_data().startswith(b"PK")
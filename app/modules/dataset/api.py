@@ -15,7 +15,26 @@ dataset_fields = {
 
 dataset_serializer = Serializer(dataset_fields, related_serializers={"files": file_serializer})
 
-DataSetResource = create_resource(DataSet, dataset_serializer)
+
+class DataSetResource(create_resource(DataSet, dataset_serializer)):
+    def list_items(self, fields=None) -> list:
+        if fields is None or "files" in fields:
+            return super().list_items(fields)
+
+        # Without the file lists every field comes from one row per dataset, no models are loaded
+        from app.modules.dataset.services import DataSetService
+
+        dataset_service = DataSetService()
+        items = []
+        for row in dataset_service.get_summaries():
+            values = {
+                "dataset_id": row.id,
+                "created": row.created_at.isoformat(),
+                "name": row.title,
+                "doi": dataset_service.get_uvlhub_doi_url(row.dataset_doi),
+            }
+            items.append({key: values[key] for key in dataset_fields if key in fields})
+        return items
 
 
 def init_blueprint_api(api):
@@ -1,8 +1,10 @@
 from datetime import datetime
 from enum import Enum
 
+import unidecode
 from flask import request
 from sqlalchemy import Enum as SQLAlchemyEnum
+from sqlalchemy import event, func, inspect, select
 
 from app import db
 
@@ -52,6 +54,121 @@ class DSMetrics(db.Model):
         return f"DSMetrics<models={self.number_of_models}, features={self.number_of_features}>"
 
 
+def normalize_tag(name: str) -> str:
+    return " ".join(unidecode.unidecode(name).lower().split())
+
+
+def split_tags(tags) -> list:
+    """(name, normalized name) of every distinct tag in a comma-separated tags string, in order"""
+    seen, result = set(), []
+    for name in (tags or "").split(","):
+        name = name.strip()
+        normalized = normalize_tag(name)
+        if normalized and normalized not in seen:
+            seen.add(normalized)
+            result.append((name, normalized))
+    return result
+
+
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False)
+    normalized_name = db.Column(db.String(120), nullable=False, unique=True, index=True)
+    # Number of metadata records (dataset, feature model, image or audio) carrying the tag
+    usage_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    def to_dict(self):
+        return {"name": self.name, "usage_count": self.usage_count}
+
+    def __repr__(self):
+        return f"Tag<{self.normalized_name}>"
+
+
+TAG_ASSOCIATIONS = []
+
+
+def tag_association(owner_table: str) -> db.Table:
+    """Association table between ``owner_table`` and tag, remembering the order tags were written in"""
+    association = db.Table(
+        f"{owner_table}_tag",
+        db.Column(
+            f"{owner_table}_id", db.Integer, db.ForeignKey(f"{owner_table}.id", ondelete="CASCADE"), primary_key=True
+        ),
+        db.Column("tag_id", db.Integer, db.ForeignKey("tag.id", ondelete="CASCADE"), primary_key=True, index=True),
+        db.Column("position", db.Integer, nullable=False, default=0),
+    )
+    TAG_ASSOCIATIONS.append(association)
+    return association
+
+
+def _refresh_usage_counts(connection, tag_ids):
+    if not tag_ids:
+        return
+    tag = Tag.__table__
+    usage = sum(
+        select(func.count()).select_from(association).where(association.c.tag_id == tag.c.id).scalar_subquery()
+        for association in TAG_ASSOCIATIONS
+    )
+    connection.execute(tag.update().where(tag.c.id.in_(tag_ids)).values(usage_count=usage))
+
+
+def _tag_ids(connection, tags) -> list:
+    tag = Tag.__table__
+    existing = dict(
+        connection.execute(
+            select(tag.c.normalized_name, tag.c.id).where(tag.c.normalized_name.in_([n for _, n in tags]))
+        ).all()
+    )
+    tag_ids = []
+    for name, normalized in tags:
+        if normalized not in existing:
+            result = connection.execute(tag.insert().values(name=name, normalized_name=normalized, usage_count=0))
+            existing[normalized] = result.inserted_primary_key[0]
+        tag_ids.append(existing[normalized])
+    return tag_ids
+
+
+def sync_tags(model, association: db.Table):
+    """
+    Mirror the comma-separated ``tags`` column of ``model`` into ``association`` within the same
+    flush, keeping Tag.usage_count up to date for every tag that was added or dropped.
+    """
+    owner_column = association.c[f"{model.__tablename__}_id"]
+
+    def write(connection, target, tags):
+        previous = {
+            tag_id for tag_id, in connection.execute(select(association.c.tag_id).where(owner_column == target.id))
+        }
+        connection.execute(association.delete().where(owner_column == target.id))
+        tag_ids = _tag_ids(connection, tags) if tags else []
+        if tag_ids:
+            connection.execute(
+                association.insert(),
+                [
+                    {owner_column.name: target.id, "tag_id": tag_id, "position": position}
+                    for position, tag_id in enumerate(tag_ids)
+                ],
+            )
+        _refresh_usage_counts(connection, previous | set(tag_ids))
+
+    @event.listens_for(model, "after_insert")
+    def _tag_inserted(mapper, connection, target):
+        if target.tags:
+            write(connection, target, split_tags(target.tags))
+
+    @event.listens_for(model, "after_update")
+    def _tag_updated(mapper, connection, target):
+        if inspect(target).attrs.tags.history.has_changes():
+            write(connection, target, split_tags(target.tags))
+
+    @event.listens_for(model, "after_delete")
+    def _tag_deleted(mapper, connection, target):
+        write(connection, target, [])
+
+
+ds_meta_data_tag = tag_association("ds_meta_data")
+
+
 class DSMetaData(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     deposition_id = db.Column(db.Integer)
@@ -64,6 +181,13 @@ class DSMetaData(db.Model):
     ds_metrics_id = db.Column(db.Integer, db.ForeignKey("ds_metrics.id"))
     ds_metrics = db.relationship("DSMetrics", uselist=False, backref="ds_meta_data", cascade="all, delete")
     authors = db.relationship("Author", backref="ds_meta_data", lazy=True, cascade="all, delete")
+    # Read side of `tags`, maintained by sync_tags
+    tag_list = db.relationship(
+        "Tag", secondary=ds_meta_data_tag, order_by=ds_meta_data_tag.c.position, lazy=True, viewonly=True
+    )
+
+
+sync_tags(DSMetaData, ds_meta_data_tag)
 
 
 class DataSet(db.Model):
@@ -73,12 +197,17 @@ class DataSet(db.Model):
     ds_meta_data_id = db.Column(db.Integer, db.ForeignKey("ds_meta_data.id"), nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     download_count = db.Column(db.Integer, nullable=False, default=0)
+    # Materialized file aggregates, kept in step with the file table by the Hubfile mapper events
+    files_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    total_size = db.Column(db.BigInteger, nullable=False, default=0, server_default="0")
 
     ds_meta_data = db.relationship("DSMetaData", backref=db.backref("data_set", uselist=False))
 
     dataset_type = db.Column(db.String(50))
 
     __mapper_args__ = {"polymorphic_identity": "dataset", "polymorphic_on": dataset_type}
+    # Serves the (created_at, id) keyset pagination of Explore
+    __table_args__ = (db.Index("ix_data_set_created_at_id", "created_at", "id"),)
 
     def name(self):
         return self.ds_meta_data.title
@@ -87,8 +216,16 @@ class DataSet(db.Model):
         return []
 
     def delete(self):
+        from app.modules.dataset.services import DataSetService
+        from app.modules.explore.services import ExploreService
+
+        dataset_service = DataSetService()
+        dataset_service.invalidate_dataset_archive(self)
+        file_references = dataset_service.get_file_references(self)
+        ExploreService().unindex_dataset(self.id)
         db.session.delete(self)
         db.session.commit()
+        dataset_service.release_files(file_references)
 
     def get_cleaned_publication_type(self):
         return self.ds_meta_data.publication_type.name.replace("_", " ").title()
@@ -97,10 +234,16 @@ class DataSet(db.Model):
         return f"https://zenodo.org/record/{self.ds_meta_data.deposition_id}" if self.ds_meta_data.dataset_doi else None
 
     def get_files_count(self):
-        return 0
+        return self.files_count or 0
 
     def get_file_total_size(self):
-        return 0
+        return self.total_size or 0
+
+    def get_listed_files(self):
+        """Files of the dataset straight from the file table, without walking the typed children"""
+        from app.modules.hubfile.models import Hubfile
+
+        return Hubfile.query.filter_by(dataset_id=self.id).order_by(Hubfile.id).all()
 
     def get_file_total_size_for_human(self):
         from app.modules.dataset.services import SizeService
@@ -128,7 +271,7 @@ class DataSet(db.Model):
             "download": f'{request.host_url.rstrip("/")}/dataset/download/{self.id}',
             "download_count": self.download_count,
             "zenodo": self.get_zenodo_url(),
-            "files": [file.to_dict() for file in self.files()],
+            "files": [file.to_dict() for file in self.get_listed_files()],
             "files_count": self.get_files_count(),
             "total_size_in_bytes": self.get_file_total_size(),
             "total_size_in_human_format": self.get_file_total_size_for_human(),
@@ -144,6 +287,12 @@ class DSDownloadRecord(db.Model):
     dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id"))
     download_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     download_cookie = db.Column(db.String(36), nullable=False)  # Assuming UUID4 strings
+    # user_id with anonymous visitors as 0, so that they are covered by the unique key too
+    user_key = db.Column(db.Integer, db.Computed("coalesce(user_id, 0)", persisted=True))
+
+    __table_args__ = (
+        db.UniqueConstraint("dataset_id", "user_key", "download_cookie", name="uq_ds_download_record_visitor"),
+    )
 
     def __repr__(self):
         return (
@@ -160,11 +309,60 @@ class DSViewRecord(db.Model):
     dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id"))
     view_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     view_cookie = db.Column(db.String(36), nullable=False)  # Assuming UUID4 strings
+    user_key = db.Column(db.Integer, db.Computed("coalesce(user_id, 0)", persisted=True))
+
+    __table_args__ = (db.UniqueConstraint("dataset_id", "user_key", "view_cookie", name="uq_ds_view_record_visitor"),)
 
     def __repr__(self):
         return f"<View id={self.id} dataset_id={self.dataset_id} date={self.view_date} cookie={self.view_cookie}>"
 
 
+class DSDailyStats(db.Model):
+    """Views and downloads of a dataset per day, counted as the records are inserted"""
+
+    __tablename__ = "ds_daily_stats"
+
+    dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="CASCADE"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    views = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    downloads = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (db.Index("ix_ds_daily_stats_day", "day"),)
+
+    def __repr__(self):
+        return f"DSDailyStats<{self.dataset_id} {self.day}>"
+
+
+class DSDailySketch(db.Model):
+    """HyperLogLog sketches of the distinct visitors that viewed and downloaded a dataset on a day"""
+
+    __tablename__ = "ds_daily_sketch"
+
+    dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="CASCADE"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    views = db.Column(db.LargeBinary)
+    downloads = db.Column(db.LargeBinary)
+
+    __table_args__ = (db.Index("ix_ds_daily_sketch_day", "day"),)
+
+    def __repr__(self):
+        return f"DSDailySketch<{self.dataset_id} {self.day}>"
+
+
+class DSMonthlySketch(db.Model):
+    """The daily sketches of a dataset merged per month, so all-time counts read one row per month"""
+
+    __tablename__ = "ds_monthly_sketch"
+
+    dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="CASCADE"), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)
+    views = db.Column(db.LargeBinary)
+    downloads = db.Column(db.LargeBinary)
+
+    def __repr__(self):
+        return f"DSMonthlySketch<{self.dataset_id} {self.month}>"
+
+
 class DOIMapping(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     dataset_doi_old = db.Column(db.String(120))
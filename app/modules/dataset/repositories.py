@@ -1,12 +1,29 @@
 import logging
+from collections import Counter
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import List, Optional, Tuple
 
-from flask_login import current_user
 from sqlalchemy import desc, func
 
-from app.modules.dataset.models import Author, DataSet, DOIMapping, DSDownloadRecord, DSMetaData, DSViewRecord
+from app.modules.dataset.models import (
+    Author,
+    DataSet,
+    DOIMapping,
+    DSDailySketch,
+    DSDailyStats,
+    DSDownloadRecord,
+    DSMetaData,
+    DSMonthlySketch,
+    DSViewRecord,
+    Tag,
+    normalize_tag,
+)
+from app.modules.explore.models import DataSetSearchDocument
+from core.analytics.records import count_daily, store_events
+from core.analytics.sketches import distinct_visitors
+from core.analytics.writer import register_event_writer
 from core.repositories.BaseRepository import BaseRepository
+from core.repositories.counters import daily_counts
 
 logger = logging.getLogger(__name__)
 
@@ -21,8 +38,29 @@ class DSDownloadRecordRepository(BaseRepository):
         super().__init__(DSDownloadRecord)
 
     def total_dataset_downloads(self) -> int:
-        max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
-        return max_id if max_id is not None else 0
+        return self.session.query(func.coalesce(func.sum(DSDailyStats.downloads), 0)).scalar()
+
+    def write_events(self, events: List[dict]):
+        """Store a batch of download events, counting the new ones into the rollups and the datasets"""
+        inserted = store_events(
+            self.session,
+            events,
+            DSDownloadRecord,
+            (DSDailySketch, DSMonthlySketch),
+            "dataset_id",
+            "download_date",
+            "download_cookie",
+            "downloads",
+        )
+        count_daily(self.session, DSDailyStats.__table__, "dataset_id", inserted, "downloads")
+
+        # Only downloads that were actually recorded move the dataset counters
+        per_dataset = Counter()
+        for (dataset_id, _), amount in inserted.items():
+            per_dataset[dataset_id] += amount
+        dataset_repository = DataSetRepository()
+        for dataset_id, amount in per_dataset.items():
+            dataset_repository.add_downloads(dataset_id, amount)
 
 
 class DSMetaDataRepository(BaseRepository):
@@ -38,23 +76,21 @@ class DSViewRecordRepository(BaseRepository):
         super().__init__(DSViewRecord)
 
     def total_dataset_views(self) -> int:
-        max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
-        return max_id if max_id is not None else 0
-
-    def the_record_exists(self, dataset: DataSet, user_cookie: str):
-        return self.model.query.filter_by(
-            user_id=current_user.id if current_user.is_authenticated else None,
-            dataset_id=dataset.id,
-            view_cookie=user_cookie,
-        ).first()
-
-    def create_new_record(self, dataset: DataSet, user_cookie: str) -> DSViewRecord:
-        return self.create(
-            user_id=current_user.id if current_user.is_authenticated else None,
-            dataset_id=dataset.id,
-            view_date=datetime.now(timezone.utc),
-            view_cookie=user_cookie,
+        return self.session.query(func.coalesce(func.sum(DSDailyStats.views), 0)).scalar()
+
+    def write_events(self, events: List[dict]):
+        """Store a batch of view events, counting the new ones into the rollups"""
+        inserted = store_events(
+            self.session,
+            events,
+            DSViewRecord,
+            (DSDailySketch, DSMonthlySketch),
+            "dataset_id",
+            "view_date",
+            "view_cookie",
+            "views",
         )
+        count_daily(self.session, DSDailyStats.__table__, "dataset_id", inserted, "views")
 
 
 class DataSetRepository(BaseRepository):
@@ -99,39 +135,60 @@ class DataSetRepository(BaseRepository):
             .all()
         )
 
+    def repair_file_aggregates(self) -> list:
+        """
+        Recompute files_count/total_size from the file table and fix the rows that drifted.
+        Returns (dataset_id, (old_count, old_size), (new_count, new_size)) for every fixed row.
+        """
+        from app.modules.hubfile.models import Hubfile
+
+        actual = {
+            dataset_id: (count, int(size))
+            for dataset_id, count, size in self.session.query(
+                Hubfile.dataset_id, func.count(Hubfile.id), func.coalesce(func.sum(Hubfile.size), 0)
+            )
+            .filter(Hubfile.dataset_id.isnot(None))
+            .group_by(Hubfile.dataset_id)
+        }
+
+        repaired = []
+        for dataset_id, files_count, total_size in self.session.query(
+            DataSet.id, DataSet.files_count, DataSet.total_size
+        ):
+            expected = actual.get(dataset_id, (0, 0))
+            if (files_count, total_size) != expected:
+                self.session.query(DataSet).filter(DataSet.id == dataset_id).update(
+                    {DataSet.files_count: expected[0], DataSet.total_size: expected[1]}, synchronize_session=False
+                )
+                repaired.append((dataset_id, (files_count, total_size), expected))
+        self.session.commit()
+        return repaired
+
     def get_trending_datasets(self, period_days: int = 7, limit: int = 10):
-        cutoff_date = datetime.now(timezone.utc) - timedelta(days=period_days)
+        cutoff_day = (datetime.now(timezone.utc) - timedelta(days=period_days)).date()
 
-        downloads_subquery = (
+        activity_subquery = (
             self.session.query(
-                DSDownloadRecord.dataset_id, func.count(func.distinct(DSDownloadRecord.id)).label("download_count")
+                DSDailyStats.dataset_id,
+                func.sum(DSDailyStats.downloads).label("download_count"),
+                func.sum(DSDailyStats.views).label("view_count"),
             )
-            .filter(DSDownloadRecord.download_date >= cutoff_date)
-            .group_by(DSDownloadRecord.dataset_id)
-            .subquery()
-        )
-
-        views_subquery = (
-            self.session.query(DSViewRecord.dataset_id, func.count(func.distinct(DSViewRecord.id)).label("view_count"))
-            .filter(DSViewRecord.view_date >= cutoff_date)
-            .group_by(DSViewRecord.dataset_id)
+            .filter(DSDailyStats.day >= cutoff_day)
+            .group_by(DSDailyStats.dataset_id)
             .subquery()
         )
 
-        total_activity_col = func.coalesce(downloads_subquery.c.download_count, 0) + func.coalesce(
-            views_subquery.c.view_count, 0
-        )
+        total_activity_col = activity_subquery.c.download_count + activity_subquery.c.view_count
 
         result = (
             self.session.query(
                 DataSet,
-                func.coalesce(downloads_subquery.c.download_count, 0).label("downloads"),
-                func.coalesce(views_subquery.c.view_count, 0).label("views"),
+                activity_subquery.c.download_count.label("downloads"),
+                activity_subquery.c.view_count.label("views"),
                 total_activity_col.label("total_activity"),
             )
             .join(DSMetaData, DataSet.ds_meta_data_id == DSMetaData.id)
-            .outerjoin(downloads_subquery, DataSet.id == downloads_subquery.c.dataset_id)
-            .outerjoin(views_subquery, DataSet.id == views_subquery.c.dataset_id)
+            .join(activity_subquery, DataSet.id == activity_subquery.c.dataset_id)
             .filter(DSMetaData.dataset_doi.isnot(None))
             .filter(total_activity_col > 0)
             .order_by(desc(total_activity_col))
@@ -141,13 +198,69 @@ class DataSetRepository(BaseRepository):
 
         return result
 
+    def get_summaries(self) -> list:
+        """(id, created_at, title, dataset_doi) rows of every dataset, without loading the models"""
+        return (
+            self.session.query(DataSet.id, DataSet.created_at, DSMetaData.title, DSMetaData.dataset_doi)
+            .join(DSMetaData, DSMetaData.id == DataSet.ds_meta_data_id)
+            .order_by(DataSet.id)
+            .all()
+        )
+
+    def add_downloads(self, dataset_id: int, amount: int):
+        """Add to the download count of a dataset and of its search document in place, without committing"""
+        self.session.query(DataSet).filter_by(id=dataset_id).update(
+            {"download_count": DataSet.download_count + amount}, synchronize_session=False
+        )
+        self.session.query(DataSetSearchDocument).filter_by(data_set_id=dataset_id).update(
+            {"download_count": DataSetSearchDocument.download_count + amount}, synchronize_session=False
+        )
+
     def increment_download_count(self, dataset_id: int):
-        """Increment the download count for a dataset"""
-        dataset = self.model.query.filter_by(id=dataset_id).first()
-        if dataset:
-            dataset.download_count += 1
-            self.session.commit()
-        return dataset
+        """Increment the download count for a dataset with one in-place UPDATE, so parallel downloads all count"""
+        self.add_downloads(dataset_id, 1)
+        self.session.commit()
+        return self.model.query.filter_by(id=dataset_id).first()
+
+
+class DSDailyStatsRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(DSDailyStats)
+
+    def totals(self, dataset_id: int) -> Tuple[int, int]:
+        """(views, downloads) of a dataset over all days"""
+        views, downloads = (
+            self.session.query(
+                func.coalesce(func.sum(DSDailyStats.views), 0), func.coalesce(func.sum(DSDailyStats.downloads), 0)
+            )
+            .filter(DSDailyStats.dataset_id == dataset_id)
+            .one()
+        )
+        return int(views), int(downloads)
+
+    def rebuild(self) -> int:
+        """Recount every day from the raw view and download records; returns the number of rollup rows"""
+        views = daily_counts(self.session, DSViewRecord.dataset_id, DSViewRecord.view_date)
+        downloads = daily_counts(self.session, DSDownloadRecord.dataset_id, DSDownloadRecord.download_date)
+
+        self.session.query(DSDailyStats).delete(synchronize_session=False)
+        rows = [
+            {"dataset_id": dataset_id, "day": day, "views": views.get(key, 0), "downloads": downloads.get(key, 0)}
+            for key in views.keys() | downloads.keys()
+            for dataset_id, day in [key]
+        ]
+        self.session.bulk_insert_mappings(DSDailyStats, rows)
+        self.session.commit()
+        return len(rows)
+
+
+class DSDailySketchRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(DSDailySketch)
+
+    def distinct_visitors(self, dataset_ids, periods) -> dict:
+        """Distinct viewers and downloaders per dataset and period, merged from the daily and monthly sketches"""
+        return distinct_visitors(self.session, (DSDailySketch, DSMonthlySketch), "dataset_id", dataset_ids, periods)
 
 
 class DOIMappingRepository(BaseRepository):
@@ -158,6 +271,33 @@ class DOIMappingRepository(BaseRepository):
         return self.model.query.filter_by(dataset_doi_old=old_doi).first()
 
 
+class TagRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(Tag)
+
+    def get_by_name(self, name: str) -> Optional[Tag]:
+        return self.model.query.filter_by(normalized_name=normalize_tag(name)).first()
+
+    def autocomplete(self, prefix: str, limit: int = 10) -> List[Tag]:
+        """Most used tags starting with ``prefix``, served by the unique index on the normalized name"""
+        return (
+            self.model.query.filter(
+                Tag.normalized_name.startswith(normalize_tag(prefix), autoescape=True), Tag.usage_count > 0
+            )
+            .order_by(Tag.usage_count.desc(), Tag.normalized_name)
+            .limit(limit)
+            .all()
+        )
+
+    def most_used(self, limit: int = 50) -> List[Tag]:
+        return (
+            self.model.query.filter(Tag.usage_count > 0)
+            .order_by(Tag.usage_count.desc(), Tag.normalized_name)
+            .limit(limit)
+            .all()
+        )
+
+
 class DatasetCommentRepository(BaseRepository):
     def __init__(self):
         from app.modules.dataset.models import DatasetComment
@@ -200,3 +340,7 @@ class DatasetCommentRepository(BaseRepository):
                 comment.updated_at = datetime.utcnow()
                 self.session.commit()
         return comment
+
+
+register_event_writer("dataset_view", lambda events: DSViewRecordRepository().write_events(events))
+register_event_writer("dataset_download", lambda events: DSDownloadRecordRepository().write_events(events))
@@ -1,27 +1,25 @@
+import base64
 import json
 import logging
 import os
 import shutil
-import tempfile
 import uuid
-from datetime import datetime, timezone
-from zipfile import ZipFile
 
 from flask import (
+    Response,
     abort,
     jsonify,
     make_response,
     redirect,
     render_template,
     request,
-    send_from_directory,
     url_for,
 )
 from flask_login import current_user, login_required
 
 from app.modules.auth.models import User
 from app.modules.dataset import dataset_bp
-from app.modules.dataset.models import DataSet, DSDownloadRecord
+from app.modules.dataset.models import DataSet
 from app.modules.dataset.services import (
     AuthorService,
     DatasetCommentService,
@@ -30,8 +28,17 @@ from app.modules.dataset.services import (
     DSDownloadRecordService,
     DSMetaDataService,
     DSViewRecordService,
+    TagService,
+    TempUploadService,
 )
 from app.modules.zenodo.services import ZenodoService
+from core.delivery.file_delivery import (
+    deliver_file,
+    not_modified_response,
+    offloads_delivery,
+    request_matches_etag,
+)
+from core.uploads.resumable import UploadOffsetMismatch, UploadTooLarge, normalize_upload_id
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +49,10 @@ dsmetadata_service = DSMetaDataService()
 zenodo_service = ZenodoService()
 doi_mapping_service = DOIMappingService()
 ds_view_record_service = DSViewRecordService()
+temp_upload_service = TempUploadService()
+tag_service = TagService()
+
+TUS_VERSION = "1.0.0"
 
 
 @dataset_bp.route("/dataset/upload", methods=["GET", "POST"])
@@ -114,6 +125,12 @@ def create_dataset(dataset_type="uvl_dataset"):
                 msg = f"it has not been possible upload feature models in Zenodo and update the DOI: {e}"
                 return jsonify({"message": msg}), 200
 
+            # Prebuild the archive of the published dataset so downloads are served from cache
+            try:
+                dataset_service.build_dataset_archive(dataset)
+            except Exception as exc:
+                logger.exception(f"Exception while building dataset archive {exc}")
+
         # Delete temp folder
         file_path = current_user.temp_folder()
         if os.path.exists(file_path) and os.path.isdir(file_path):
@@ -150,37 +167,20 @@ def user_datasets(user_id):
 @dataset_bp.route("/dataset/file/upload", methods=["POST"])
 @login_required
 def upload():
-    file = request.files["file"]
-    temp_folder = current_user.temp_folder()
+    file = request.files.get("file")
 
     if not file:
         return jsonify({"message": "No file provided"}), 400
 
-    allowed_extensions = {".uvl", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".mp3"}
-    file_ext = os.path.splitext(file.filename)[1].lower()
-
-    if file_ext not in allowed_extensions:
+    if not temp_upload_service.is_allowed(file.filename):
+        file_ext = os.path.splitext(file.filename)[1].lower()
         return jsonify({"message": f"Invalid file extension: {file_ext}"}), 400
 
-    # create temp folder
-    if not os.path.exists(temp_folder):
-        os.makedirs(temp_folder)
-
-    file_path = os.path.join(temp_folder, file.filename)
-
-    if os.path.exists(file_path):
-        # Generate unique filename (by recursion)
-        base_name, extension = os.path.splitext(file.filename)
-        i = 1
-        while os.path.exists(os.path.join(temp_folder, f"{base_name} ({i}){extension}")):
-            i += 1
-        new_filename = f"{base_name} ({i}){extension}"
-        file_path = os.path.join(temp_folder, new_filename)
-    else:
-        new_filename = file.filename
+    if "dzuuid" in request.form:
+        return upload_chunk(file)
 
     try:
-        file.save(file_path)
+        new_filename = temp_upload_service.save_upload(current_user, file)
     except Exception as e:
         return jsonify({"message": str(e)}), 500
 
@@ -195,15 +195,153 @@ def upload():
     )
 
 
+@dataset_bp.route("/dataset/file/upload/check", methods=["POST"])
+@login_required
+def check_upload():
+    """Pre-upload deduplication: accept a file we already store without transferring it"""
+    data = request.get_json(silent=True) or {}
+    filename, checksum, size = data.get("filename"), data.get("checksum"), data.get("size")
+    if not filename or not isinstance(checksum, str) or not isinstance(size, int):
+        return jsonify({"message": "filename, checksum and size are required"}), 400
+
+    new_filename = temp_upload_service.claim_existing(current_user, filename, checksum, size)
+    if new_filename is None:
+        return jsonify({"exists": False}), 200
+
+    return jsonify({"exists": True, "message": "File already stored", "filename": new_filename}), 200
+
+
+def upload_chunk(file):
+    """One chunk of a Dropzone chunked upload, mapped onto the resumable upload store"""
+    upload_id = normalize_upload_id(request.form.get("dzuuid"))
+    try:
+        offset = int(request.form.get("dzchunkbyteoffset", 0))
+        length = int(request.form.get("dztotalfilesize", 0))
+    except ValueError:
+        upload_id = None
+    if not upload_id:
+        return jsonify({"message": "Invalid chunk parameters"}), 400
+
+    store = temp_upload_service.get_resumable_store(current_user)
+    state = store.status(upload_id)
+    try:
+        if state is None:
+            if offset != 0:
+                return jsonify({"message": "Unknown upload"}), 404
+            store.create(file.filename, length, upload_id=upload_id)
+            state = store.status(upload_id)
+
+        file.stream.seek(0, os.SEEK_END)
+        chunk_length = file.stream.tell()
+        file.stream.seek(0)
+
+        # A retried chunk whose first attempt did arrive is acknowledged without rewriting it
+        if offset + chunk_length > state["offset"]:
+            store.append(upload_id, offset, file.stream)
+    except UploadOffsetMismatch as e:
+        return jsonify({"message": str(e), "offset": e.offset}), 409
+    except UploadTooLarge as e:
+        store.abort(upload_id)
+        return jsonify({"message": str(e)}), 413
+
+    if not store.is_complete(upload_id):
+        return jsonify({"message": "Chunk received", "offset": store.status(upload_id)["offset"]}), 200
+
+    new_filename = temp_upload_service.complete_resumable(current_user, upload_id)
+    return jsonify({"message": "File uploaded successfully", "filename": new_filename}), 200
+
+
+def _tus_response(body=None, status=204, **headers):
+    response = jsonify(body) if body is not None else make_response("", status)
+    response.status_code = status
+    response.headers["Tus-Resumable"] = TUS_VERSION
+    response.headers["Cache-Control"] = "no-store"
+    for name, value in headers.items():
+        response.headers[name.replace("_", "-")] = str(value)
+    return response
+
+
+def _tus_filename(metadata_header: str):
+    for pair in (metadata_header or "").split(","):
+        key, _, value = pair.strip().partition(" ")
+        if key == "filename" and value:
+            try:
+                return base64.b64decode(value).decode("utf-8")
+            except (ValueError, UnicodeDecodeError):
+                return None
+    return None
+
+
+@dataset_bp.route("/dataset/file/upload/resumable", methods=["POST"])
+@login_required
+def create_resumable_upload():
+    """Start a resumable upload (tus creation): Upload-Length and Upload-Metadata filename"""
+    filename = _tus_filename(request.headers.get("Upload-Metadata"))
+    try:
+        length = int(request.headers.get("Upload-Length", ""))
+    except ValueError:
+        length = None
+
+    if not filename or length is None:
+        return _tus_response({"message": "Upload-Length and a filename in Upload-Metadata are required"}, 400)
+    if not temp_upload_service.is_allowed(filename):
+        file_ext = os.path.splitext(filename)[1].lower()
+        return _tus_response({"message": f"Invalid file extension: {file_ext}"}, 400)
+
+    try:
+        upload_id = temp_upload_service.get_resumable_store(current_user).create(os.path.basename(filename), length)
+    except UploadTooLarge as e:
+        return _tus_response({"message": str(e)}, 413)
+
+    return _tus_response(
+        {"upload_id": upload_id},
+        201,
+        Location=url_for("dataset.resumable_upload", upload_id=upload_id),
+        Upload_Offset=0,
+    )
+
+
+@dataset_bp.route("/dataset/file/upload/resumable/<string:upload_id>", methods=["HEAD", "PATCH", "DELETE"])
+@login_required
+def resumable_upload(upload_id):
+    """Query the offset (HEAD), append a chunk at Upload-Offset (PATCH) or abort (DELETE)"""
+    upload_id = normalize_upload_id(upload_id)
+    store = temp_upload_service.get_resumable_store(current_user)
+    state = store.status(upload_id) if upload_id else None
+    if state is None:
+        return _tus_response({"message": "Unknown upload"}, 404)
+
+    if request.method == "HEAD":
+        return _tus_response(status=200, Upload_Offset=state["offset"], Upload_Length=state["length"])
+
+    if request.method == "DELETE":
+        store.abort(upload_id)
+        return _tus_response()
+
+    if request.mimetype != "application/offset+octet-stream":
+        return _tus_response({"message": "Content-Type must be application/offset+octet-stream"}, 415)
+    try:
+        offset = store.append(upload_id, int(request.headers.get("Upload-Offset", "")), request.stream)
+    except ValueError:
+        return _tus_response({"message": "Upload-Offset is required"}, 400)
+    except UploadOffsetMismatch as e:
+        return _tus_response({"message": str(e)}, 409, Upload_Offset=e.offset)
+    except UploadTooLarge as e:
+        return _tus_response({"message": str(e)}, 413, Upload_Offset=state["offset"])
+
+    if offset < state["length"]:
+        return _tus_response(Upload_Offset=offset)
+
+    new_filename = temp_upload_service.complete_resumable(current_user, upload_id)
+    return _tus_response({"message": "File uploaded successfully", "filename": new_filename}, 200, Upload_Offset=offset)
+
+
 @dataset_bp.route("/dataset/file/delete", methods=["POST"])
 def delete():
     data = request.get_json()
     filename = data.get("file")
-    temp_folder = current_user.temp_folder()
-    filepath = os.path.join(temp_folder, filename)
 
-    if os.path.exists(filepath):
-        os.remove(filepath)
+    if temp_upload_service.delete_upload(current_user, filename):
         return jsonify({"message": "File deleted successfully"})
 
     return jsonify({"error": "Error: File not found"})
@@ -213,62 +351,42 @@ def delete():
 def download_dataset(dataset_id):
     dataset = dataset_service.get_or_404(dataset_id)
 
-    file_path = f"uploads/user_{dataset.user_id}/dataset_{dataset.id}/"
-
-    temp_dir = tempfile.mkdtemp()
-    zip_path = os.path.join(temp_dir, f"dataset_{dataset_id}.zip")
-
-    with ZipFile(zip_path, "w") as zipf:
-        for subdir, dirs, files in os.walk(file_path):
-            for file in files:
-                full_path = os.path.join(subdir, file)
-
-                relative_path = os.path.relpath(full_path, file_path)
-
-                zipf.write(
-                    full_path,
-                    arcname=os.path.join(os.path.basename(zip_path[:-4]), relative_path),
-                )
+    archive_name = dataset_service.get_archive_name(dataset)
+    etag = dataset_service.get_archive_key(dataset)
+    cached_archive = dataset_service.get_cached_archive(dataset)
+    if not cached_archive and ("Range" in request.headers or offloads_delivery()):
+        # Resuming an interrupted download, or handing it to the front end, needs a file on disk
+        cached_archive = dataset_service.build_dataset_archive(dataset)
+
+    # Archives too large for the cache (or evicted meanwhile by another worker) are streamed instead
+    if cached_archive and os.path.exists(cached_archive):
+        resp = deliver_file(
+            cached_archive,
+            etag=etag,
+            mimetype="application/zip",
+            as_attachment=True,
+            download_name=f"{archive_name}.zip",
+        )
+    elif request_matches_etag(etag):
+        resp = not_modified_response(etag)
+    else:
+        resp = Response(
+            dataset_service.stream_dataset_archive(dataset),
+            mimetype="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{archive_name}.zip"', "Accept-Ranges": "bytes"},
+        )
+        resp.set_etag(etag)
 
     user_cookie = request.cookies.get("download_cookie")
     if not user_cookie:
         user_cookie = str(uuid.uuid4())  # Generate a new unique identifier if it does not exist
         # Save the cookie to the user's browser
-        resp = make_response(
-            send_from_directory(
-                temp_dir,
-                f"dataset_{dataset_id}.zip",
-                as_attachment=True,
-                mimetype="application/zip",
-            )
-        )
         resp.set_cookie("download_cookie", user_cookie)
-    else:
-        resp = send_from_directory(
-            temp_dir,
-            f"dataset_{dataset_id}.zip",
-            as_attachment=True,
-            mimetype="application/zip",
-        )
 
-    # Check if the download record already exists for this cookie
-    existing_record = DSDownloadRecord.query.filter_by(
-        user_id=current_user.id if current_user.is_authenticated else None,
-        dataset_id=dataset_id,
-        download_cookie=user_cookie,
-    ).first()
-
-    if not existing_record:
-        # Record the download in your database
-        DSDownloadRecordService().create(
-            user_id=current_user.id if current_user.is_authenticated else None,
-            dataset_id=dataset_id,
-            download_date=datetime.now(timezone.utc),
-            download_cookie=user_cookie,
-        )
-
-        # Increment download counter
-        dataset_service.increment_download_count(dataset_id)
+    # Stored and counted on the dataset by the analytics writer, once per user and cookie
+    DSDownloadRecordService().record_download(
+        dataset_id, current_user.id if current_user.is_authenticated else None, user_cookie
+    )
 
     return resp
 
@@ -312,18 +430,22 @@ def get_unsynchronized_dataset(dataset_id):
     return render_template("dataset/view_dataset.html", dataset=dataset)
 
 
+@dataset_bp.route("/dataset/tags", methods=["GET"])
+def list_tags():
+    """Tag autocomplete when ?q= is given, otherwise the most used tags (a tag cloud)"""
+    prefix = request.args.get("q", "").strip()
+    limit = min(request.args.get("limit", 10 if prefix else 50, type=int), 100)
+    tags = tag_service.autocomplete(prefix, limit) if prefix else tag_service.tag_cloud(limit)
+    return jsonify([tag.to_dict() for tag in tags])
+
+
 @dataset_bp.route("/datasets/<int:dataset_id>/stats", methods=["GET"])
 def get_dataset_stats(dataset_id):
     """Get dataset statistics including downloads, views, etc."""
-    from app.modules.dataset.models import DSDownloadRecord, DSViewRecord
-
     dataset = dataset_service.get_or_404(dataset_id)
 
-    # Get total views count
-    total_views = DSViewRecord.query.filter_by(dataset_id=dataset_id).count()
-
-    # Get total downloads count
-    total_downloads_records = DSDownloadRecord.query.filter_by(dataset_id=dataset_id).count()
+    # Views and download records come from the daily rollups, not from the raw event tables
+    total_views, total_downloads_records = dataset_service.get_activity_totals(dataset_id)
 
     return jsonify(
         {
@@ -332,6 +454,7 @@ def get_dataset_stats(dataset_id):
             "download_count": dataset.download_count,
             "total_download_records": total_downloads_records,
             "total_views": total_views,
+            "unique_visitors": dataset_service.get_distinct_visitors(dataset_id),
             "created_at": dataset.created_at.isoformat(),
             "files_count": dataset.get_files_count(),
             "total_size_bytes": dataset.get_file_total_size(),
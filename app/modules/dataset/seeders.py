@@ -1,14 +1,16 @@
 import os
-import shutil
 from datetime import datetime, timezone
 
 from dotenv import load_dotenv
 
 from app.modules.auth.models import User
 from app.modules.dataset.models import Author, DSMetaData, DSMetrics, PublicationType
+from app.modules.explore.repositories import ExploreRepository
 from app.modules.featuremodel.models import FeatureModel, FMMetaData, UVLDataset
 from app.modules.hubfile.models import Hubfile
+from app.modules.hubfile.services import HubfileService
 from core.seeders.BaseSeeder import BaseSeeder
+from core.storage.backends import get_storage
 
 
 class DataSetSeeder(BaseSeeder):
@@ -104,22 +106,29 @@ class DataSetSeeder(BaseSeeder):
         load_dotenv()
         working_dir = os.getenv("WORKING_DIR", "")
         src_folder = os.path.join(working_dir, "app", "modules", "dataset", "uvl_examples")
+        storage = get_storage()
         for i in range(12):
             file_name = f"file{i+1}.uvl"
             feature_model = seeded_feature_models[i]
             dataset = next(ds for ds in seeded_datasets if ds.id == feature_model.data_set_id)
             user_id = dataset.user_id
 
-            dest_folder = os.path.join(working_dir, "uploads", f"user_{user_id}", f"dataset_{dataset.id}")
-            os.makedirs(dest_folder, exist_ok=True)
-            shutil.copy(os.path.join(src_folder, file_name), dest_folder)
-
-            file_path = os.path.join(dest_folder, file_name)
+            file_path = os.path.join(src_folder, file_name)
+            with open(file_path, "rb") as source:
+                storage.write(HubfileService.get_storage_key(user_id, dataset.id, file_name), source)
 
             uvl_file = Hubfile(
                 name=file_name,
                 checksum=f"checksum{i+1}",
                 size=os.path.getsize(file_path),
                 feature_model_id=feature_model.id,
+                dataset_id=dataset.id,
+                user_id=user_id,
             )
             self.seed([uvl_file])
+
+        # Make the seeded datasets searchable from Explore
+        explore_repository = ExploreRepository()
+        for dataset in seeded_datasets:
+            explore_repository.index_dataset(dataset, commit=False)
+        self.db.session.commit()
@@ -1,39 +1,77 @@
 import hashlib
 import logging
 import os
-import shutil
+import posixpath
 import uuid
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
 
-from flask import request
+from flask import current_app, request
+from flask_login import current_user
 
 from app.modules.auth.services import AuthenticationService
-from app.modules.dataset.models import DataSet, DSMetaData, DSViewRecord
+from app.modules.dataset.models import DataSet, DSMetaData
 from app.modules.dataset.repositories import (
     AuthorRepository,
     DataSetRepository,
     DOIMappingRepository,
+    DSDailySketchRepository,
+    DSDailyStatsRepository,
     DSDownloadRecordRepository,
     DSMetaDataRepository,
     DSViewRecordRepository,
+    TagRepository,
 )
+from app.modules.explore.repositories import ExploreRepository
 from app.modules.featuremodel.repositories import FeatureModelRepository, FMMetaDataRepository
 from app.modules.hubfile.repositories import (
     HubfileDownloadRecordRepository,
     HubfileRepository,
     HubfileViewRecordRepository,
 )
+from app.modules.hubfile.services import HubfileService
+from core.analytics.sketches import PERIODS
+from core.archives.archive_cache import ArchiveCache, archive_key
+from core.archives.zip_stream import stream_zip
+from core.managers.analytics_manager import get_analytics
 from core.services.BaseService import BaseService
+from core.storage.backends import get_storage, storage_source
+from core.uploads.resumable import (
+    ResumableUploadStore,
+    read_checksum_sidecar,
+    remove_checksum_sidecar,
+    save_stream,
+    write_checksum_sidecar,
+)
 
 logger = logging.getLogger(__name__)
 
 
-def calculate_checksum_and_size(file_path):
-    file_size = os.path.getsize(file_path)
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+ALLOWED_UPLOAD_EXTENSIONS = {".uvl", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".mp3"}
+
+
+def calculate_checksum_and_size(file_path, chunk_size=CHECKSUM_CHUNK_SIZE):
+    hash_md5 = hashlib.md5()
+    file_size = 0
     with open(file_path, "rb") as file:
-        content = file.read()
-        hash_md5 = hashlib.md5(content).hexdigest()
-        return hash_md5, file_size
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            hash_md5.update(chunk)
+            file_size += len(chunk)
+    return hash_md5.hexdigest(), file_size
+
+
+def calculate_checksums_and_sizes(file_paths: Iterable[str], max_workers: int = 4) -> Dict[str, Tuple[str, int]]:
+    """
+    Hash several files on a bounded thread pool (hashlib releases the GIL on large updates).
+    Returns {path: (checksum, size)}; the first failure is re-raised.
+    """
+    paths = list(dict.fromkeys(file_paths))
+    if len(paths) <= 1 or max_workers <= 1:
+        return {path: calculate_checksum_and_size(path) for path in paths}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as executor:
+        return dict(zip(paths, executor.map(calculate_checksum_and_size, paths)))
 
 
 class DataSetService(BaseService):
@@ -46,22 +84,20 @@ class DataSetService(BaseService):
         self.dsdownloadrecord_repository = DSDownloadRecordRepository()
         self.hubfiledownloadrecord_repository = HubfileDownloadRecordRepository()
         self.hubfilerepository = HubfileRepository()
+        self.explore_repository = ExploreRepository()
         self.dsviewrecord_repostory = DSViewRecordRepository()
         self.hubfileviewrecord_repository = HubfileViewRecordRepository()
+        self.daily_stats_repository = DSDailyStatsRepository()
+        self.daily_sketch_repository = DSDailySketchRepository()
 
     def move_feature_models(self, dataset: DataSet):
         current_user = AuthenticationService().get_authenticated_user()
         source_dir = current_user.temp_folder()
 
-        working_dir = os.getenv("WORKING_DIR", "")
-        dest_dir = os.path.join(working_dir, "uploads", f"user_{current_user.id}", f"dataset_{dataset.id}")
-
-        os.makedirs(dest_dir, exist_ok=True)
-
         if hasattr(dataset, "feature_models"):
             for feature_model in dataset.feature_models:
                 uvl_filename = feature_model.fm_meta_data.uvl_filename
-                shutil.move(os.path.join(source_dir, uvl_filename), dest_dir)
+                self.store_uploaded_file(dataset, os.path.join(source_dir, uvl_filename), feature_model.files)
 
     def get_synchronized(self, current_user_id: int) -> DataSet:
         return self.repository.get_synchronized(current_user_id)
@@ -93,6 +129,21 @@ class DataSetService(BaseService):
     def total_dataset_views(self) -> int:
         return self.dsviewrecord_repostory.total_dataset_views()
 
+    def get_activity_totals(self, dataset_id: int) -> Tuple[int, int]:
+        """(views, downloads) of a dataset, summed from its daily rollups"""
+        return self.daily_stats_repository.totals(dataset_id)
+
+    def get_distinct_visitors(self, dataset_id: int, periods: Iterable[str] = PERIODS) -> Dict[str, Dict[str, int]]:
+        """Estimated distinct viewers and downloaders of a dataset per period: the last "week", "month" or "all" time"""
+        return self.daily_sketch_repository.distinct_visitors([dataset_id], periods)[dataset_id]
+
+    def rebuild_daily_stats(self) -> int:
+        if not current_app.config["ANALYTICS_AUDIT_RECORDS"]:
+            raise ValueError(
+                "The daily stats can only be rebuilt from the per-visitor records (ANALYTICS_AUDIT_RECORDS)"
+            )
+        return self.daily_stats_repository.rebuild()
+
     def get_trending_datasets(self, period="week", limit=10):
         period_days = 7 if period == "week" else 30 if period == "month" else 7
 
@@ -100,16 +151,19 @@ class DataSetService(BaseService):
             period_days=period_days,
             limit=limit,
         )
+        # Distinct visitors of the same window, merged from the daily sketches of the datasets listed
+        window = "month" if period == "month" else "week"
+        visitors = self.daily_sketch_repository.distinct_visitors(
+            [dataset.id for dataset, *_ in trending_data], [window]
+        )
 
         result = []
         for dataset, downloads, views, total_activity in trending_data:
             authors = dataset.ds_meta_data.authors
             main_author = authors[0].name if authors else "Unknown"
 
-            community = None
-            if dataset.ds_meta_data.tags:
-                tags = dataset.ds_meta_data.tags.split(",")
-                community = tags[0].strip() if tags else None
+            tag_list = dataset.ds_meta_data.tag_list
+            community = tag_list[0].name if tag_list else None
 
             result.append(
                 {
@@ -120,6 +174,9 @@ class DataSetService(BaseService):
                     "downloads": int(downloads),
                     "views": int(views),
                     "total_activity": int(total_activity),
+                    "unique_viewers": visitors[dataset.id][window]["views"],
+                    "unique_downloaders": visitors[dataset.id][window]["downloads"],
+                    "url": dataset.get_uvlhub_doi(),
                     "dataset": dataset,
                 }
             )
@@ -133,6 +190,8 @@ class DataSetService(BaseService):
             "orcid": current_user.profile.orcid,
         }
         try:
+            checksums = self.calculate_form_checksums(form, current_user)
+
             logger.info(f"Creating dsmetadata...: {form.get_dsmetadata()}")
             dsmetadata = self.dsmetadata_repository.create(**form.get_dsmetadata())
             for author_data in [main_author] + form.get_authors():
@@ -172,10 +231,16 @@ class DataSetService(BaseService):
 
                     # associated files in feature model
                     file_path = os.path.join(current_user.temp_folder(), uvl_filename)
-                    checksum, size = calculate_checksum_and_size(file_path)
+                    checksum, size = checksums[file_path]
 
                     file = self.hubfilerepository.create(
-                        commit=False, name=uvl_filename, checksum=checksum, size=size, feature_model_id=fm.id
+                        commit=False,
+                        name=uvl_filename,
+                        checksum=checksum,
+                        size=size,
+                        feature_model_id=fm.id,
+                        dataset_id=dataset.id,
+                        user_id=current_user.id,
                     )
                     fm.files.append(file)
 
@@ -207,8 +272,8 @@ class DataSetService(BaseService):
                     self.repository.session.flush()
 
                     file_path = os.path.join(current_user.temp_folder(), filename)
-                    if os.path.exists(file_path):
-                        checksum, size = calculate_checksum_and_size(file_path)
+                    if file_path in checksums:
+                        checksum, size = checksums[file_path]
 
                         file = self.hubfilerepository.create(
                             commit=False,
@@ -217,6 +282,8 @@ class DataSetService(BaseService):
                             size=size,
                             image_id=image.id,
                             feature_model_id=None,
+                            dataset_id=dataset.id,
+                            user_id=current_user.id,
                         )
                         image.files.append(file)
                     else:
@@ -250,8 +317,8 @@ class DataSetService(BaseService):
                     self.repository.session.flush()
 
                     file_path = os.path.join(current_user.temp_folder(), filename)
-                    if os.path.exists(file_path):
-                        checksum, size = calculate_checksum_and_size(file_path)
+                    if file_path in checksums:
+                        checksum, size = checksums[file_path]
 
                         file = self.hubfilerepository.create(
                             commit=False,
@@ -260,11 +327,14 @@ class DataSetService(BaseService):
                             size=size,
                             audio_id=audio.id,
                             feature_model_id=None,
+                            dataset_id=dataset.id,
+                            user_id=current_user.id,
                         )
                         audio.files.append(file)
                     else:
                         logger.warning(f"File {filename} not found in temp folder")
 
+            self.explore_repository.index_dataset(dataset, commit=False)
             self.repository.session.commit()
 
         except Exception as exc:
@@ -273,44 +343,160 @@ class DataSetService(BaseService):
             raise exc
         return dataset
 
+    def calculate_form_checksums(self, form, current_user) -> Dict[str, Tuple[str, int]]:
+        """Hash every file referenced by the form up front, in parallel"""
+        temp_folder = current_user.temp_folder()
+        if hasattr(form, "feature_models"):
+            # UVL files are mandatory: a missing one must still fail the creation
+            paths = [os.path.join(temp_folder, fm.uvl_filename.data) for fm in form.feature_models]
+        elif hasattr(form, "images"):
+            paths = [os.path.join(temp_folder, image.filename.data) for image in form.images]
+            paths = [path for path in paths if os.path.exists(path)]
+        elif hasattr(form, "audios"):
+            paths = [os.path.join(temp_folder, audio.filename.data) for audio in form.audios]
+            paths = [path for path in paths if os.path.exists(path)]
+        else:
+            paths = []
+
+        # Files received through the upload endpoints were hashed on arrival
+        checksums = {}
+        for path in paths:
+            recorded = read_checksum_sidecar(path)
+            if recorded:
+                checksums[path] = recorded
+        pending = [path for path in paths if path not in checksums]
+        checksums.update(calculate_checksums_and_sizes(pending, max_workers=current_app.config["CHECKSUM_MAX_WORKERS"]))
+        return checksums
+
     def move_images(self, dataset: DataSet):
         current_user = AuthenticationService().get_authenticated_user()
         source_dir = current_user.temp_folder()
 
-        working_dir = os.getenv("WORKING_DIR", "")
-        dest_dir = os.path.join(working_dir, "uploads", f"user_{current_user.id}", f"dataset_{dataset.id}")
-
-        os.makedirs(dest_dir, exist_ok=True)
-
         if hasattr(dataset, "images"):
             for image in dataset.images:
                 filename = image.image_meta_data.filename
                 source_path = os.path.join(source_dir, filename)
                 if os.path.exists(source_path):
-                    shutil.move(source_path, dest_dir)
+                    self.store_uploaded_file(dataset, source_path, image.files)
 
     def move_audios(self, dataset: DataSet):
         current_user = AuthenticationService().get_authenticated_user()
         source_dir = current_user.temp_folder()
 
-        working_dir = os.getenv("WORKING_DIR", "")
-        dest_dir = os.path.join(working_dir, "uploads", f"user_{current_user.id}", f"dataset_{dataset.id}")
-
-        os.makedirs(dest_dir, exist_ok=True)
-
         if hasattr(dataset, "audios"):
             for audio in dataset.audios:
                 filename = audio.audio_meta_data.filename
                 source_path = os.path.join(source_dir, filename)
                 if os.path.exists(source_path):
-                    shutil.move(source_path, dest_dir)
+                    self.store_uploaded_file(dataset, source_path, audio.files)
+
+    def get_storage_prefix(self, dataset: DataSet) -> str:
+        return posixpath.dirname(self.get_storage_key(dataset, ""))
+
+    def get_storage_key(self, dataset: DataSet, filename: str) -> str:
+        return HubfileService.get_storage_key(dataset.user_id, dataset.id, filename)
+
+    def store_uploaded_file(self, dataset: DataSet, source_path: str, hubfiles):
+        """Move a temp upload into storage (deduplicated by checksum where the backend supports it)"""
+        checksum = hubfiles[0].checksum if hubfiles else None
+        key = self.get_storage_key(dataset, os.path.basename(source_path))
+        get_storage().put_file(key, source_path, checksum=checksum)
+
+    def get_file_references(self, dataset: DataSet):
+        return [(self.get_storage_key(dataset, hubfile.name), hubfile.checksum) for hubfile in dataset.files()]
+
+    def release_files(self, file_references):
+        """Remove dataset files, dropping their blobs once nothing else references them"""
+        storage = get_storage()
+        for key, checksum in file_references:
+            try:
+                storage.delete(key, checksum=checksum)
+            except Exception as exc:
+                logger.warning(f"Could not release {key}: {exc}")
+
+    def get_archive_name(self, dataset: DataSet) -> str:
+        return f"dataset_{dataset.id}"
+
+    def get_archive_cache(self) -> ArchiveCache:
+        cache_dir = os.path.abspath(os.path.join(os.getenv("WORKING_DIR", ""), current_app.config["ARCHIVE_CACHE_DIR"]))
+        return ArchiveCache(cache_dir, current_app.config["ARCHIVE_CACHE_MAX_BYTES"])
+
+    def get_archive_key(self, dataset: DataSet) -> str:
+        return archive_key(self.get_archive_name(dataset), [(f.checksum, f.name) for f in dataset.files()])
+
+    def _archive_entries(self, dataset: DataSet):
+        storage = get_storage()
+        archive_name = self.get_archive_name(dataset)
+        hubfiles = dataset.files()
+        if hubfiles:
+            keys = [self.get_storage_key(dataset, hubfile.name) for hubfile in hubfiles]
+        else:
+            # Datasets without typed children: fall back to whatever is stored under the dataset
+            keys = storage.list(self.get_storage_prefix(dataset))
+        prefix_length = len(self.get_storage_prefix(dataset)) + 1
+        for key in keys:
+            yield storage_source(storage, key), os.path.join(archive_name, key[prefix_length:])
+
+    def get_cached_archive(self, dataset: DataSet) -> Optional[str]:
+        return self.get_archive_cache().get(self.get_archive_name(dataset), self.get_archive_key(dataset))
+
+    def stream_dataset_archive(self, dataset: DataSet):
+        """Yield the dataset ZIP chunk by chunk, filling the archive cache on the way"""
+        archive_name = self.get_archive_name(dataset)
+        key = self.get_archive_key(dataset)
+        return self.get_archive_cache().store(archive_name, key, stream_zip(self._archive_entries(dataset)))
+
+    def build_dataset_archive(self, dataset: DataSet) -> Optional[str]:
+        """
+        Build the dataset ZIP eagerly (e.g. on publication) so downloads are served from cache.
+        Returns None for datasets too large for the archive cache, which are only ever streamed.
+        """
+        cached = self.get_cached_archive(dataset)
+        if cached:
+            return cached
+        # Members are stored uncompressed, so the archive is at least as large as its files
+        if sum(hubfile.size or 0 for hubfile in dataset.files()) > current_app.config["ARCHIVE_CACHE_MAX_BYTES"]:
+            return None
+        archive_name = self.get_archive_name(dataset)
+        key = self.get_archive_key(dataset)
+        return self.get_archive_cache().build(archive_name, key, stream_zip(self._archive_entries(dataset)))
+
+    def invalidate_dataset_archive(self, dataset: DataSet) -> int:
+        return self.get_archive_cache().invalidate(self.get_archive_name(dataset))
+
+    def backfill_file_locations(self) -> int:
+        """Fill in dataset_id/user_id on file rows that predate their denormalization"""
+        hubfile_service = HubfileService()
+        hubfiles = self.hubfilerepository.model.query.filter(
+            (self.hubfilerepository.model.dataset_id.is_(None)) | (self.hubfilerepository.model.user_id.is_(None))
+        ).all()
+        filled = 0
+        for hubfile in hubfiles:
+            dataset = hubfile_service.get_dataset_by_hubfile(hubfile)
+            if dataset is not None:
+                hubfile.dataset_id, hubfile.user_id = dataset.id, dataset.user_id
+                filled += 1
+        self.repository.session.commit()
+        return filled
+
+    def repair_file_aggregates(self):
+        return self.repository.repair_file_aggregates()
 
     def update_dsmetadata(self, id, **kwargs):
-        return self.dsmetadata_repository.update(id, **kwargs)
+        dsmetadata = self.dsmetadata_repository.update(id, **kwargs)
+        if dsmetadata is not None and dsmetadata.data_set is not None:
+            self.explore_repository.index_dataset(dsmetadata.data_set)
+        return dsmetadata
 
     def get_uvlhub_doi(self, dataset: DataSet) -> str:
+        return self.get_uvlhub_doi_url(dataset.ds_meta_data.dataset_doi)
+
+    def get_summaries(self) -> list:
+        return self.repository.get_summaries()
+
+    def get_uvlhub_doi_url(self, dataset_doi: str) -> str:
         domain = os.getenv("DOMAIN", "localhost")
-        return f"http://{domain}/doi/{dataset.ds_meta_data.dataset_doi}"
+        return f"http://{domain}/doi/{dataset_doi}"
 
     def increment_download_count(self, dataset_id: int):
         """Increment the download count for a dataset"""
@@ -360,6 +546,10 @@ class DSDownloadRecordService(BaseService):
     def __init__(self):
         super().__init__(DSDownloadRecordRepository())
 
+    def record_download(self, dataset_id: int, user_id: Optional[int], user_cookie: str):
+        """Queue the download; the first one per user and cookie is stored and counted on the dataset"""
+        get_analytics().record("dataset_download", dataset_id, user_id, user_cookie)
+
 
 class DSMetaDataService(BaseService):
     def __init__(self):
@@ -372,15 +562,20 @@ class DSMetaDataService(BaseService):
         return self.repository.filter_by_doi(doi)
 
 
-class DSViewRecordService(BaseService):
+class TagService(BaseService):
     def __init__(self):
-        super().__init__(DSViewRecordRepository())
+        super().__init__(TagRepository())
+
+    def autocomplete(self, prefix: str, limit: int = 10):
+        return self.repository.autocomplete(prefix, limit)
 
-    def the_record_exists(self, dataset: DataSet, user_cookie: str):
-        return self.repository.the_record_exists(dataset, user_cookie)
+    def tag_cloud(self, limit: int = 50):
+        return self.repository.most_used(limit)
 
-    def create_new_record(self, dataset: DataSet, user_cookie: str) -> DSViewRecord:
-        return self.repository.create_new_record(dataset, user_cookie)
+
+class DSViewRecordService(BaseService):
+    def __init__(self):
+        super().__init__(DSViewRecordRepository())
 
     def create_cookie(self, dataset: DataSet) -> str:
 
@@ -388,10 +583,8 @@ class DSViewRecordService(BaseService):
         if not user_cookie:
             user_cookie = str(uuid.uuid4())
 
-        existing_record = self.the_record_exists(dataset=dataset, user_cookie=user_cookie)
-
-        if not existing_record:
-            self.create_new_record(dataset=dataset, user_cookie=user_cookie)
+        user_id = current_user.id if current_user.is_authenticated else None
+        get_analytics().record("dataset_view", dataset.id, user_id, user_cookie)
 
         return user_cookie
 
@@ -408,6 +601,80 @@ class DOIMappingService(BaseService):
             return None
 
 
+class TempUploadService:
+    """Files uploaded to the user's temp folder while a dataset is being prepared"""
+
+    def __init__(self):
+        self.hubfile_repository = HubfileRepository()
+
+    def is_allowed(self, filename: str) -> bool:
+        return os.path.splitext(filename)[1].lower() in ALLOWED_UPLOAD_EXTENSIONS
+
+    def unique_filename(self, temp_folder: str, filename: str) -> str:
+        filename = os.path.basename(filename)
+        if not os.path.exists(os.path.join(temp_folder, filename)):
+            return filename
+
+        base_name, extension = os.path.splitext(filename)
+        i = 1
+        while os.path.exists(os.path.join(temp_folder, f"{base_name} ({i}){extension}")):
+            i += 1
+        return f"{base_name} ({i}){extension}"
+
+    def save_upload(self, user, file) -> str:
+        """Save a whole uploaded file, hashing it while it is written. Returns the stored name"""
+        temp_folder = user.temp_folder()
+        os.makedirs(temp_folder, exist_ok=True)
+        filename = self.unique_filename(temp_folder, file.filename)
+        save_stream(file.stream, os.path.join(temp_folder, filename))
+        return filename
+
+    def get_resumable_store(self, user) -> ResumableUploadStore:
+        return ResumableUploadStore(user.temp_folder(), max_bytes=current_app.config["RESUMABLE_UPLOAD_MAX_BYTES"])
+
+    def complete_resumable(self, user, upload_id: str) -> str:
+        """Move a finished resumable upload into the temp folder. Returns the stored name"""
+        store = self.get_resumable_store(user)
+        temp_folder = user.temp_folder()
+        filename = self.unique_filename(temp_folder, store.status(upload_id)["filename"])
+        store.finish(upload_id, os.path.join(temp_folder, filename))
+        return filename
+
+    def claim_existing(self, user, filename: str, checksum: str, size: int) -> Optional[str]:
+        """
+        Pre-upload deduplication: if a file with this checksum and size is already stored and the
+        user may read it (it belongs to a published dataset or to one of their own), link it into
+        the temp folder as if it had been uploaded. Returns the stored name, or None to upload.
+        """
+        if not self.is_allowed(filename):
+            return None
+        storage = get_storage()
+
+        readable = any(
+            dataset is not None and (dataset.ds_meta_data.dataset_doi or dataset.user_id == user.id)
+            for dataset in (hubfile.get_dataset() for hubfile in self.hubfile_repository.get_by_checksum(checksum))
+        )
+        if not readable:
+            return None
+
+        temp_folder = user.temp_folder()
+        os.makedirs(temp_folder, exist_ok=True)
+        new_filename = self.unique_filename(temp_folder, filename)
+        file_path = os.path.join(temp_folder, new_filename)
+        if not storage.link_duplicate(checksum, size, file_path):
+            return None
+        write_checksum_sidecar(file_path, checksum.lower(), size)
+        return new_filename
+
+    def delete_upload(self, user, filename: str) -> bool:
+        file_path = os.path.join(user.temp_folder(), os.path.basename(filename))
+        if not os.path.exists(file_path):
+            return False
+        os.remove(file_path)
+        remove_checksum_sidecar(file_path)
+        return True
+
+
 class SizeService:
 
     def __init__(self):
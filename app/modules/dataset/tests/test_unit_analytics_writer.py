@@ -0,0 +1,144 @@
+"""
+Unit tests for the write-behind writer of view and download records.
+"""
+
+import os
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.modules.dataset.models import DataSet, DSDailyStats, DSDownloadRecord, DSMetaData, DSViewRecord
+from core.analytics.writer import AnalyticsWriter
+
+
+@pytest.fixture
+def datasets(test_database_poblated):
+    return db.session.query(DataSet).join(DSMetaData).order_by(DataSet.id).all()
+
+
+@pytest.fixture
+def make_writer(test_app, tmp_path, monkeypatch):
+    # Flushes are driven by the tests instead of the background thread
+    monkeypatch.setattr(AnalyticsWriter, "_ensure_flusher", lambda self: None)
+
+    def make_writer(**options):
+        return AnalyticsWriter(test_app, spool_dir=str(tmp_path), **options)
+
+    return make_writer
+
+
+def _spool(tmp_path):
+    return sorted(os.listdir(tmp_path))
+
+
+def test_events_are_buffered_until_flushed(datasets, make_writer, tmp_path):
+    dataset = datasets[0]
+    downloads = dataset.download_count
+    writer = make_writer()
+
+    writer.record("dataset_view", dataset.id, None, "cookie-a")
+    writer.record("dataset_view", dataset.id, None, "cookie-a")
+    writer.record("dataset_download", dataset.id, None, "cookie-a")
+
+    assert writer.pending() == 2
+    assert DSViewRecord.query.count() == 0
+    assert len(_spool(tmp_path)) == 1
+
+    assert writer.flush() == 2
+    db.session.refresh(dataset)
+    assert DSViewRecord.query.filter_by(dataset_id=dataset.id).count() == 1
+    assert dataset.download_count == downloads + 1
+    assert db.session.query(DSDailyStats.views, DSDailyStats.downloads).filter_by(dataset_id=dataset.id).one() == (1, 1)
+    assert _spool(tmp_path) == []
+
+
+def test_a_visitor_coming_back_another_day_is_not_dropped(datasets, make_writer, monkeypatch, test_app):
+    monkeypatch.setitem(test_app.config, "ANALYTICS_AUDIT_RECORDS", False)
+    dataset = datasets[0]
+    writer = make_writer()
+
+    for at in (datetime(2026, 10, 1, 12, tzinfo=timezone.utc), datetime(2026, 10, 2, 12, tzinfo=timezone.utc)):
+        writer.record("dataset_view", dataset.id, None, "cookie-a", at=at)
+        writer.record("dataset_view", dataset.id, None, "cookie-a", at=at)
+
+    assert writer.pending() == 2
+    writer.flush()
+    assert [views for views, in db.session.query(DSDailyStats.views).filter_by(dataset_id=dataset.id)] == [1, 1]
+
+
+def test_a_flush_inserts_per_dataset_and_day_without_reading(datasets, make_writer):
+    writer = make_writer()
+    for dataset in datasets:
+        writer.record("dataset_view", dataset.id, None, "cookie-a")
+        writer.record("dataset_view", dataset.id, None, "cookie-b")
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        writer.flush()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+    assert len([s for s in statements if s.startswith("INSERT INTO ds_view_record")]) == len(datasets)
+    assert not any(s.startswith("SELECT") and "ds_view_record" in s for s in statements)
+    assert DSViewRecord.query.count() == 2 * len(datasets)
+
+
+def test_journal_of_a_dead_worker_is_replayed_once(datasets, make_writer, tmp_path):
+    dataset = datasets[0]
+    downloads = dataset.download_count
+
+    crashed = make_writer()
+    crashed.record("dataset_download", dataset.id, None, "cookie-a")
+    crashed.record("dataset_view", dataset.id, None, "cookie-a")
+    # The worker dies without flushing: its journal is left in the spool, unlocked
+    crashed._journal.close()
+    journal = os.path.join(tmp_path, _spool(tmp_path)[0])
+    with open(journal) as source, open(os.path.join(tmp_path, "copy.segment"), "w") as copy:
+        copy.write(source.read())
+
+    assert make_writer().flush() == 4
+    db.session.refresh(dataset)
+    assert DSDownloadRecord.query.filter_by(dataset_id=dataset.id).count() == 1
+    assert dataset.download_count == downloads + 1
+    assert _spool(tmp_path) == []
+
+
+def test_a_torn_journal_line_does_not_block_the_replay(datasets, make_writer, tmp_path):
+    crashed = make_writer()
+    crashed.record("dataset_view", datasets[0].id, None, "cookie-a")
+    crashed.record("dataset_view", datasets[1].id, None, "cookie-a")
+    crashed._journal.close()
+    # The worker died halfway through writing a line
+    journal = os.path.join(tmp_path, _spool(tmp_path)[0])
+    with open(journal, "a") as torn:
+        torn.write('{"kind": "dataset_vi')
+
+    assert make_writer().flush() == 2
+    assert DSViewRecord.query.count() == 2
+    assert _spool(tmp_path) == [os.path.basename(journal) + ".bad"]
+    assert make_writer().flush() == 0
+
+
+def test_failed_flush_keeps_the_events_in_the_spool(datasets, make_writer, tmp_path, monkeypatch):
+    writer = make_writer()
+    writer.record("dataset_view", datasets[0].id, None, "cookie-a")
+
+    def fail(self, events):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(AnalyticsWriter, "_write", fail)
+    assert writer.flush() == 0
+    assert len(_spool(tmp_path)) == 1
+
+    monkeypatch.undo()
+    monkeypatch.setattr(AnalyticsWriter, "_ensure_flusher", lambda self: None)
+    assert writer.flush() == 1
+    assert DSViewRecord.query.count() == 1
+    assert _spool(tmp_path) == []
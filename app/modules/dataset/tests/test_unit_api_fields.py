@@ -0,0 +1,53 @@
+"""
+Unit tests for sparse fieldsets on the datasets REST API.
+"""
+
+from sqlalchemy import event
+
+from app import db
+
+
+def _recorded(client, url):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+    return response, statements
+
+
+def test_list_without_files_takes_one_query(test_database_poblated):
+    response, statements = _recorded(test_database_poblated, "/api/v1/datasets/?fields=dataset_id,name")
+
+    assert response.status_code == 200
+    items = response.get_json()["items"]
+    assert {"dataset_id", "name"} == set(items[0])
+    assert "Sample dataset 1" in [item["name"] for item in items]
+    assert len(statements) == 1
+
+
+def test_slim_list_matches_the_full_one(test_database_poblated):
+    client = test_database_poblated
+    full = client.get("/api/v1/datasets/").get_json()["items"]
+    slim = client.get("/api/v1/datasets/?fields=dataset_id,created,name,doi").get_json()["items"]
+
+    assert slim == [{key: item[key] for key in ("dataset_id", "created", "name", "doi")} for item in full]
+
+
+def test_single_item_honours_fields(test_database_poblated):
+    full = test_database_poblated.get("/api/v1/datasets/").get_json()["items"][0]
+
+    response = test_database_poblated.get(f"/api/v1/datasets/{full['dataset_id']}?fields=name")
+
+    assert response.get_json() == {"name": full["name"]}
+
+
+def test_unknown_fields_are_rejected(test_database_poblated):
+    response = test_database_poblated.get("/api/v1/datasets/?fields=name,secret")
+
+    assert response.status_code == 400
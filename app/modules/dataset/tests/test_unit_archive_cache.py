@@ -0,0 +1,132 @@
+"""
+Unit tests for the content-addressed cache of dataset archives.
+"""
+
+import io
+import os
+from zipfile import ZipFile
+
+import pytest
+
+from app import db
+from app.modules.dataset.models import DataSet
+from app.modules.dataset.services import DataSetService
+from core.archives.archive_cache import ArchiveCache, archive_key
+
+dataset_service = DataSetService()
+
+
+@pytest.fixture
+def archive_cache_dir(test_app, tmp_path):
+    previous = test_app.config["ARCHIVE_CACHE_DIR"]
+    test_app.config["ARCHIVE_CACHE_DIR"] = str(tmp_path / "archives")
+    yield tmp_path / "archives"
+    test_app.config["ARCHIVE_CACHE_DIR"] = previous
+
+
+def test_archive_key_ignores_member_order_but_not_content():
+    key = archive_key("dataset_1", [("aaa", "a.uvl"), ("bbb", "b.uvl")])
+
+    assert key == archive_key("dataset_1", [("bbb", "b.uvl"), ("aaa", "a.uvl")])
+    assert key != archive_key("dataset_1", [("aaa", "a.uvl"), ("ccc", "b.uvl")])
+    assert key != archive_key("dataset_2", [("aaa", "a.uvl"), ("bbb", "b.uvl")])
+
+
+def test_store_only_publishes_complete_archives(tmp_path):
+    cache = ArchiveCache(str(tmp_path), max_bytes=1024)
+
+    stream = cache.store("dataset_1", "k", iter([b"abc", b"def"]))
+    next(stream)
+    stream.close()
+    assert cache.get("dataset_1", "k") is None
+    assert os.listdir(tmp_path) == []
+
+    assert b"".join(cache.store("dataset_1", "k", iter([b"abc", b"def"]))) == b"abcdef"
+    with open(cache.get("dataset_1", "k"), "rb") as f:
+        assert f.read() == b"abcdef"
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    cache = ArchiveCache(str(tmp_path), max_bytes=10)
+    cache.build("dataset_1", "k1", [b"x" * 6])
+    os.utime(cache.path_for("dataset_1", "k1"), (1, 1))
+    cache.build("dataset_2", "k2", [b"y" * 6])
+
+    assert cache.get("dataset_1", "k1") is None
+    assert cache.get("dataset_2", "k2") is not None
+
+
+def test_archives_larger_than_the_cache_are_not_kept(tmp_path):
+    cache = ArchiveCache(str(tmp_path), max_bytes=100)
+    cache.build("dataset_1", "small", [b"x" * 60])
+
+    assert cache.build("dataset_2", "big", [b"y" * 500]) is None
+    assert b"".join(cache.store("dataset_2", "big", iter([b"y" * 500]))) == b"y" * 500
+    assert os.listdir(tmp_path) == [os.path.basename(cache.path_for("dataset_1", "small"))]
+
+    # The entry just built is never the one evicted to make room
+    assert cache.build("dataset_3", "fits", [b"z" * 90]) == cache.path_for("dataset_3", "fits")
+    assert cache.get("dataset_1", "small") is None
+
+
+def test_invalidate_removes_every_version(tmp_path):
+    cache = ArchiveCache(str(tmp_path), max_bytes=1024)
+    cache.build("dataset_1", "old", [b"1"])
+    cache.build("dataset_1", "new", [b"2"])
+    cache.build("dataset_10", "other", [b"3"])
+
+    assert cache.invalidate("dataset_1") == 2
+    assert cache.get("dataset_10", "other") is not None
+
+
+def test_repeat_download_is_served_from_cache(test_database_poblated, archive_cache_dir):
+    client = test_database_poblated
+    dataset = db.session.query(DataSet).first()
+
+    first = client.get(f"/dataset/download/{dataset.id}")
+    assert first.status_code == 200
+    assert first.is_streamed
+    first_body = first.get_data()
+
+    cached_path = dataset_service.get_cached_archive(dataset)
+    assert cached_path is not None
+
+    second = client.get(f"/dataset/download/{dataset.id}")
+    assert second.status_code == 200
+    assert second.headers["Content-Length"] == str(os.path.getsize(cached_path)), "Cached archives are sent as files"
+    assert second.get_data() == first_body
+    second.close()
+
+    with ZipFile(io.BytesIO(first_body)) as zipf:
+        assert len(zipf.namelist()) == dataset.get_files_count()
+
+
+def test_build_and_invalidate_dataset_archive(test_database_poblated, archive_cache_dir):
+    dataset = db.session.query(DataSet).first()
+
+    path = dataset_service.build_dataset_archive(dataset)
+    assert os.path.exists(path)
+    assert dataset_service.get_cached_archive(dataset) == path
+
+    dataset_service.invalidate_dataset_archive(dataset)
+    assert dataset_service.get_cached_archive(dataset) is None
+
+
+@pytest.mark.parametrize("headers", [{"Range": "bytes=0-9"}, {}])
+def test_datasets_larger_than_the_cache_are_streamed(test_app, test_database_poblated, archive_cache_dir, headers):
+    client = test_database_poblated
+    dataset = db.session.query(DataSet).first()
+    previous = test_app.config["ARCHIVE_CACHE_MAX_BYTES"], test_app.config["FILE_DELIVERY_MODE"]
+    test_app.config["ARCHIVE_CACHE_MAX_BYTES"] = 10
+    # Offloading to the front end needs a cached file as much as a range does
+    test_app.config["FILE_DELIVERY_MODE"] = "app" if headers else "x-accel"
+    try:
+        response = client.get(f"/dataset/download/{dataset.id}", headers=headers)
+    finally:
+        test_app.config["ARCHIVE_CACHE_MAX_BYTES"], test_app.config["FILE_DELIVERY_MODE"] = previous
+
+    assert response.status_code == 200
+    assert "X-Accel-Redirect" not in response.headers
+    with ZipFile(io.BytesIO(response.get_data())) as zipf:
+        assert len(zipf.namelist()) == dataset.get_files_count()
+    assert dataset_service.get_cached_archive(dataset) is None
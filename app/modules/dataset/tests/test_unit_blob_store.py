@@ -0,0 +1,99 @@
+"""
+Unit tests for the content-addressed blob store and pre-upload deduplication.
+"""
+
+import hashlib
+import os
+import shutil
+
+import pytest
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.conftest import login, logout
+from app.modules.hubfile.models import Hubfile
+from core.storage.backends import get_storage
+from core.storage.blob_store import BlobStore
+from core.uploads.resumable import read_checksum_sidecar
+
+CONTENT = b"features\n    Benchmark\n"
+CHECKSUM = hashlib.md5(CONTENT).hexdigest()
+
+
+@pytest.fixture
+def blob_store_dir(test_app, tmp_path):
+    previous = test_app.config["BLOB_STORE_DIR"]
+    test_app.config["BLOB_STORE_DIR"] = str(tmp_path / "blobs")
+    yield str(tmp_path / "blobs")
+    test_app.config["BLOB_STORE_DIR"] = previous
+
+
+def _write(path, content=CONTENT):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    return str(path)
+
+
+def test_duplicate_files_share_one_blob(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    first = store.store(_write(tmp_path / "temp" / "a.uvl"), CHECKSUM, str(tmp_path / "dataset_1" / "a.uvl"))
+    second = store.store(_write(tmp_path / "temp" / "b.uvl"), CHECKSUM, str(tmp_path / "dataset_2" / "b.uvl"))
+
+    assert os.path.samefile(first, second)
+    assert store.references(CHECKSUM) == 2
+    assert os.listdir(tmp_path / "temp") == []
+    with open(second, "rb") as f:
+        assert f.read() == CONTENT
+
+
+def test_release_removes_blob_with_last_reference(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    first = store.store(_write(tmp_path / "temp" / "a.uvl"), CHECKSUM, str(tmp_path / "dataset_1" / "a.uvl"))
+    second = store.store(_write(tmp_path / "temp" / "b.uvl"), CHECKSUM, str(tmp_path / "dataset_2" / "b.uvl"))
+
+    assert store.release(first, CHECKSUM) is False
+    assert store.get(CHECKSUM) is not None
+    assert os.path.exists(second)
+
+    assert store.release(second, CHECKSUM) is True
+    assert store.get(CHECKSUM) is None
+
+
+def test_get_checks_size_and_rejects_bad_checksums(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    store.ingest(_write(tmp_path / "a.uvl"), CHECKSUM)
+
+    assert store.get(CHECKSUM, len(CONTENT)) is not None
+    assert store.get(CHECKSUM, len(CONTENT) + 1) is None
+    assert store.get("../../etc/passwd") is None
+
+
+def test_pre_upload_check_links_known_file(test_database_poblated, blob_store_dir):
+    client = test_database_poblated
+    login(client, "user1@example.com", "1234")
+    user = db.session.query(User).filter_by(email="user1@example.com").first()
+    hubfile = next(f for f in db.session.query(Hubfile).all() if f.get_dataset().user_id == user.id)
+    hubfile.checksum, hubfile.size = CHECKSUM, len(CONTENT)
+    db.session.commit()
+
+    with client.application.test_request_context():
+        blob_store = get_storage().blob_store
+    blob_store.ingest(_write(os.path.join(blob_store_dir, "incoming", "a.uvl")), CHECKSUM)
+
+    unknown = client.post(
+        "/dataset/file/upload/check", json={"filename": "other.uvl", "checksum": "0" * 32, "size": hubfile.size}
+    )
+    assert unknown.json == {"exists": False}
+
+    response = client.post(
+        "/dataset/file/upload/check",
+        json={"filename": "copy.uvl", "checksum": hubfile.checksum, "size": hubfile.size},
+    )
+    assert response.json["exists"] is True
+    linked = os.path.join(user.temp_folder(), response.json["filename"])
+    assert os.path.samefile(linked, blob_store.path_for(hubfile.checksum))
+    assert read_checksum_sidecar(linked) == (hubfile.checksum, hubfile.size)
+
+    logout(client)
+    shutil.rmtree(user.temp_folder(), ignore_errors=True)
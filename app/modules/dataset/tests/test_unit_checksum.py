@@ -0,0 +1,67 @@
+"""
+Unit tests for chunked and parallel checksum computation.
+"""
+
+import hashlib
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from app.modules.dataset.services import (
+    DataSetService,
+    calculate_checksum_and_size,
+    calculate_checksums_and_sizes,
+)
+
+
+@pytest.fixture
+def sample_files(tmp_path):
+    contents = {
+        "empty.uvl": b"",
+        "small.uvl": b"features\n    Root\n",
+        "large.png": os.urandom(3 * 1024 * 1024 + 17),
+    }
+    paths = {}
+    for name, content in contents.items():
+        path = tmp_path / name
+        path.write_bytes(content)
+        paths[str(path)] = content
+    return paths
+
+
+def test_chunked_checksum_matches_whole_file_md5(sample_files):
+    for path, content in sample_files.items():
+        assert calculate_checksum_and_size(path, chunk_size=4096) == (hashlib.md5(content).hexdigest(), len(content))
+
+
+def test_parallel_checksums_match_sequential(sample_files):
+    parallel = calculate_checksums_and_sizes(sample_files, max_workers=4)
+    sequential = calculate_checksums_and_sizes(sample_files, max_workers=1)
+
+    assert parallel == sequential
+    assert parallel == {path: calculate_checksum_and_size(path) for path in sample_files}
+
+
+def test_parallel_checksums_raise_on_missing_file(sample_files, tmp_path):
+    paths = list(sample_files) + [str(tmp_path / "missing.uvl")]
+
+    with pytest.raises(FileNotFoundError):
+        calculate_checksums_and_sizes(paths, max_workers=4)
+
+
+def test_form_checksums_skip_missing_images(test_app, tmp_path):
+    (tmp_path / "a.png").write_bytes(b"a")
+    (tmp_path / "b.png").write_bytes(b"bb")
+    user = SimpleNamespace(temp_folder=lambda: str(tmp_path))
+    form = SimpleNamespace(
+        images=[SimpleNamespace(filename=SimpleNamespace(data=name)) for name in ("a.png", "b.png", "gone.png")]
+    )
+
+    with test_app.app_context():
+        checksums = DataSetService().calculate_form_checksums(form, user)
+
+    assert checksums == {
+        str(tmp_path / "a.png"): (hashlib.md5(b"a").hexdigest(), 1),
+        str(tmp_path / "b.png"): (hashlib.md5(b"bb").hexdigest(), 2),
+    }
@@ -0,0 +1,104 @@
+"""
+Unit tests for the daily view/download rollups of datasets and files.
+"""
+
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.modules.dataset.models import DataSet, DSDailyStats, DSMetaData
+from app.modules.dataset.services import DataSetService
+from app.modules.hubfile.models import Hubfile, HubfileDailyStats
+from app.modules.hubfile.services import HubfileService
+from core.analytics.writer import AnalyticsWriter
+
+
+@pytest.fixture
+def dataset(test_database_poblated):
+    return db.session.query(DataSet).join(DSMetaData).filter(DSMetaData.title == "Sample dataset 1").one()
+
+
+@pytest.fixture
+def record(test_app):
+    writer = AnalyticsWriter(test_app, write_behind=False)
+
+    def record(kind, subject_id, moment=None):
+        writer.record(kind, subject_id, None, str(uuid.uuid4()), at=moment)
+
+    return record
+
+
+def _rollups(model):
+    db.session.expire_all()
+    return {row[:-2]: row[-2:] for row in db.session.query(*model.__table__.columns).all()}
+
+
+def test_records_are_counted_into_their_day(dataset, record):
+    yesterday = datetime.now(timezone.utc) - timedelta(days=1)
+    record("dataset_download", dataset.id, yesterday)
+    record("dataset_download", dataset.id, yesterday)
+    record("dataset_view", dataset.id, yesterday)
+    record("dataset_view", dataset.id)
+
+    stats = {row.day: (row.views, row.downloads) for row in DSDailyStats.query.filter_by(dataset_id=dataset.id)}
+    assert stats[yesterday.date()] == (1, 2)
+    assert stats[datetime.now(timezone.utc).date()][0] == 1
+
+
+def test_trending_and_stats_read_only_the_rollups(test_database_poblated, dataset, record):
+    for _ in range(3):
+        record("dataset_download", dataset.id)
+    record("dataset_view", dataset.id)
+    # Activity older than the trending window is left out
+    record("dataset_download", dataset.id, datetime.now(timezone.utc) - timedelta(days=40))
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        trending = DataSetService().get_trending_datasets(period="week", limit=3)
+        stats = test_database_poblated.get(f"/datasets/{dataset.id}/stats").json
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+    assert (trending[0]["id"], trending[0]["downloads"], trending[0]["views"]) == (dataset.id, 3, 1)
+    assert (stats["total_download_records"], stats["total_views"]) == (4, 1)
+    assert not any("_record" in statement for statement in statements)
+
+
+def test_rebuild_matches_the_raw_records(dataset, record):
+    record("dataset_download", dataset.id, datetime(2024, 5, 1, 23, 30))
+    record("dataset_download", dataset.id, datetime(2024, 5, 1, 8))
+    record("dataset_view", dataset.id, datetime(2024, 5, 2))
+    expected = _rollups(DSDailyStats)
+
+    db.session.query(DSDailyStats).delete()
+    db.session.commit()
+
+    assert DataSetService().rebuild_daily_stats() == len(expected)
+    assert _rollups(DSDailyStats) == expected
+    assert expected[(dataset.id, date(2024, 5, 1))] == (0, 2)
+
+
+def test_file_rollups_back_the_homepage_counters(dataset, record):
+    hubfile = Hubfile.query.filter_by(dataset_id=dataset.id).first()
+    hubfile_service = HubfileService()
+    views, downloads = hubfile_service.total_hubfile_views(), hubfile_service.total_hubfile_downloads()
+
+    record("file_view", hubfile.id)
+    record("file_download", hubfile.id)
+
+    assert hubfile_service.total_hubfile_views() == views + 1
+    assert hubfile_service.total_hubfile_downloads() == downloads + 1
+
+    expected = _rollups(HubfileDailyStats)
+    db.session.query(HubfileDailyStats).delete()
+    db.session.commit()
+    hubfile_service.rebuild_daily_stats()
+    assert _rollups(HubfileDailyStats) == expected
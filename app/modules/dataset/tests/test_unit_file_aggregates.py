@@ -0,0 +1,56 @@
+"""
+Unit tests for the materialized files_count/total_size of datasets.
+"""
+
+from sqlalchemy import func
+
+from app import db
+from app.modules.dataset.models import DataSet
+from app.modules.dataset.services import DataSetService
+from app.modules.hubfile.models import Hubfile
+
+
+def _actual_totals(dataset_id):
+    count, size = (
+        db.session.query(func.count(Hubfile.id), func.coalesce(func.sum(Hubfile.size), 0))
+        .filter(Hubfile.dataset_id == dataset_id)
+        .one()
+    )
+    return count, size
+
+
+def test_seeded_aggregates_match_files(test_database_poblated):
+    for dataset in db.session.query(DataSet).all():
+        assert (dataset.get_files_count(), dataset.get_file_total_size()) == _actual_totals(dataset.id)
+
+
+def test_aggregates_follow_inserts_and_deletes(test_database_poblated):
+    dataset = db.session.query(DataSet).first()
+    before = (dataset.files_count, dataset.total_size)
+
+    hubfile = Hubfile(name="extra.uvl", checksum="0" * 32, size=1234, dataset_id=dataset.id, user_id=dataset.user_id)
+    db.session.add(hubfile)
+    db.session.commit()
+    assert (dataset.files_count, dataset.total_size) == (before[0] + 1, before[1] + 1234)
+
+    hubfile.size = 34
+    db.session.commit()
+    assert (dataset.files_count, dataset.total_size) == (before[0] + 1, before[1] + 34)
+
+    db.session.delete(hubfile)
+    db.session.commit()
+    assert (dataset.files_count, dataset.total_size) == before
+
+
+def test_repair_fixes_drift(test_database_poblated):
+    dataset = db.session.query(DataSet).first()
+    expected = _actual_totals(dataset.id)
+    dataset.files_count, dataset.total_size = 999, 1
+    db.session.commit()
+
+    repaired = DataSetService().repair_file_aggregates()
+
+    assert (dataset.id, (999, 1), expected) in repaired
+    db.session.refresh(dataset)
+    assert (dataset.files_count, dataset.total_size) == expected
+    assert DataSetService().repair_file_aggregates() == []
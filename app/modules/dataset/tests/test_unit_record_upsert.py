@@ -0,0 +1,78 @@
+"""
+Unit tests for the idempotent storing of view and download records and the atomic download counter.
+"""
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.dataset.models import DataSet, DSDownloadRecord, DSMetaData
+from app.modules.dataset.services import DataSetService
+from app.modules.hubfile.models import Hubfile, HubfileViewRecord
+from core.analytics.writer import AnalyticsWriter
+
+
+@pytest.fixture
+def dataset(test_database_poblated):
+    return db.session.query(DataSet).join(DSMetaData).filter(DSMetaData.title == "Sample dataset 1").one()
+
+
+def _statements(action):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        action()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+    return statements
+
+
+def test_racing_workers_store_and_count_an_anonymous_download_once(test_app, dataset):
+    downloads = dataset.download_count
+    # Two workers, so neither sees the other's event in its in-process dedupe
+    workers = [AnalyticsWriter(test_app, write_behind=False) for _ in range(2)]
+
+    for worker in workers:
+        worker.record("dataset_download", dataset.id, None, "cookie-a")
+
+    db.session.refresh(dataset)
+    assert DSDownloadRecord.query.filter_by(dataset_id=dataset.id, download_cookie="cookie-a").count() == 1
+    assert dataset.download_count == downloads + 1
+
+
+def test_the_same_cookie_counts_once_per_user(test_app, dataset):
+    hubfile = Hubfile.query.filter_by(dataset_id=dataset.id).first()
+    user = User.query.first()
+    writer = AnalyticsWriter(test_app, write_behind=False)
+
+    for user_id in (None, user.id, None, user.id):
+        writer.record("file_view", hubfile.id, user_id, "cookie-a")
+
+    assert {record.user_id for record in HubfileViewRecord.query.filter_by(file_id=hubfile.id)} == {None, user.id}
+
+
+def test_duplicate_records_are_rejected_by_the_database(dataset):
+    for _ in range(2):
+        db.session.add(DSDownloadRecord(dataset_id=dataset.id, download_cookie="cookie-a"))
+
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+
+
+def test_download_counter_is_incremented_in_place(dataset):
+    downloads = dataset.download_count
+
+    statements = _statements(lambda: DataSetService().increment_download_count(dataset.id))
+
+    db.session.refresh(dataset)
+    assert dataset.download_count == downloads + 1
+    updates = [statement for statement in statements if statement.startswith("UPDATE data_set ")]
+    assert len(updates) == 1 and "download_count + " in updates[0]
+    assert statements.index(updates[0]) == 0
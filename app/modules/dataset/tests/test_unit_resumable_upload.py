@@ -0,0 +1,187 @@
+"""
+Unit tests for resumable chunked uploads into the temp folder.
+"""
+
+import base64
+import hashlib
+import io
+import os
+import shutil
+import uuid
+
+import pytest
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.conftest import login, logout
+from core.uploads.resumable import (
+    ResumableUploadStore,
+    UploadOffsetMismatch,
+    UploadTooLarge,
+    read_checksum_sidecar,
+    write_checksum_sidecar,
+)
+
+CONTENT = os.urandom(300 * 1024 + 5)
+
+
+@pytest.fixture
+def client(test_database_poblated):
+    login(test_database_poblated, "user1@example.com", "1234")
+    user = db.session.query(User).filter_by(email="user1@example.com").first()
+    yield test_database_poblated, user
+    logout(test_database_poblated)
+    shutil.rmtree(user.temp_folder(), ignore_errors=True)
+
+
+def _metadata(filename):
+    return f"filename {base64.b64encode(filename.encode()).decode()}"
+
+
+def _patch(client, location, offset, data):
+    return client.patch(
+        location,
+        data=data,
+        headers={"Upload-Offset": str(offset), "Content-Type": "application/offset+octet-stream"},
+    )
+
+
+def test_store_hashes_while_receiving(tmp_path):
+    store = ResumableUploadStore(str(tmp_path))
+    upload_id = store.create("song.mp3", len(CONTENT))
+
+    offset = store.append(upload_id, 0, io.BytesIO(CONTENT[:1000]))
+    with pytest.raises(UploadOffsetMismatch) as excinfo:
+        store.append(upload_id, 0, io.BytesIO(CONTENT[:1000]))
+    assert excinfo.value.offset == 1000
+
+    store.append(upload_id, offset, io.BytesIO(CONTENT[1000:]))
+    dest = str(tmp_path / "song.mp3")
+
+    assert store.finish(upload_id, dest) == (hashlib.md5(CONTENT).hexdigest(), len(CONTENT))
+    assert read_checksum_sidecar(dest) == (hashlib.md5(CONTENT).hexdigest(), len(CONTENT))
+    assert os.listdir(store.partial_dir) == []
+
+
+def test_store_resumes_in_a_fresh_process(tmp_path):
+    store = ResumableUploadStore(str(tmp_path))
+    upload_id = store.create("song.mp3", len(CONTENT))
+    store.append(upload_id, 0, io.BytesIO(CONTENT[:4096]))
+    ResumableUploadStore._hashers.clear()
+
+    store.append(upload_id, 4096, io.BytesIO(CONTENT[4096:]))
+
+    assert store.finish(upload_id, str(tmp_path / "song.mp3"))[0] == hashlib.md5(CONTENT).hexdigest()
+
+
+def test_store_rejects_bytes_past_declared_length(tmp_path):
+    store = ResumableUploadStore(str(tmp_path), max_bytes=len(CONTENT))
+    with pytest.raises(UploadTooLarge):
+        store.create("song.mp3", len(CONTENT) + 1)
+
+    upload_id = store.create("song.mp3", 10)
+    with pytest.raises(UploadTooLarge):
+        store.append(upload_id, 0, io.BytesIO(b"x" * 11))
+    assert store.status(upload_id)["offset"] == 0
+
+
+def test_sidecar_is_ignored_once_file_changes(tmp_path):
+    path = tmp_path / "model.uvl"
+    path.write_bytes(b"features")
+    write_checksum_sidecar(str(path), "not-a-real-checksum", 8)
+    assert read_checksum_sidecar(str(path)) == ("not-a-real-checksum", 8)
+
+    path.write_bytes(b"features\n    Root")
+    assert read_checksum_sidecar(str(path)) is None
+
+
+def test_tus_upload_with_resume(client):
+    test_client, user = client
+    response = test_client.post(
+        "/dataset/file/upload/resumable",
+        headers={"Upload-Length": str(len(CONTENT)), "Upload-Metadata": _metadata("song.mp3")},
+    )
+    assert response.status_code == 201
+    location = response.headers["Location"]
+
+    assert _patch(test_client, location, 0, CONTENT[:100000]).headers["Upload-Offset"] == "100000"
+
+    # The client lost the response and retries from a stale offset
+    conflict = _patch(test_client, location, 0, CONTENT[:100000])
+    assert conflict.status_code == 409
+    assert conflict.headers["Upload-Offset"] == "100000"
+
+    assert test_client.head(location).headers["Upload-Offset"] == "100000"
+
+    response = _patch(test_client, location, 100000, CONTENT[100000:])
+    assert response.status_code == 200
+    assert response.json["filename"] == "song.mp3"
+
+    path = os.path.join(user.temp_folder(), "song.mp3")
+    with open(path, "rb") as uploaded:
+        assert uploaded.read() == CONTENT
+    assert read_checksum_sidecar(path) == (hashlib.md5(CONTENT).hexdigest(), len(CONTENT))
+
+
+def test_tus_rejects_invalid_extension(client):
+    test_client, _ = client
+    response = test_client.post(
+        "/dataset/file/upload/resumable", headers={"Upload-Length": "10", "Upload-Metadata": _metadata("x.exe")}
+    )
+    assert response.status_code == 400
+
+
+def test_dropzone_chunks_with_retried_chunk(client):
+    test_client, user = client
+    dzuuid = str(uuid.uuid4())
+    chunk_size = 128 * 1024
+    chunks = [CONTENT[i : i + chunk_size] for i in range(0, len(CONTENT), chunk_size)]
+
+    def send(index):
+        return test_client.post(
+            "/dataset/file/upload",
+            data={
+                "file": (io.BytesIO(chunks[index]), "model.uvl"),
+                "dzuuid": dzuuid,
+                "dzchunkindex": str(index),
+                "dzchunkbyteoffset": str(index * chunk_size),
+                "dztotalfilesize": str(len(CONTENT)),
+                "dztotalchunkcount": str(len(chunks)),
+            },
+            content_type="multipart/form-data",
+        )
+
+    assert send(0).json["offset"] == chunk_size
+    assert send(0).json["offset"] == chunk_size
+    for index in range(1, len(chunks) - 1):
+        assert send(index).status_code == 200
+    response = send(len(chunks) - 1)
+
+    assert response.json["filename"] == "model.uvl"
+    path = os.path.join(user.temp_folder(), "model.uvl")
+    assert read_checksum_sidecar(path) == (hashlib.md5(CONTENT).hexdigest(), len(CONTENT))
+
+
+def test_single_request_upload_records_checksum_and_delete_clears_it(client):
+    test_client, user = client
+    response = test_client.post(
+        "/dataset/file/upload",
+        data={"file": (io.BytesIO(b"features\n    Root"), "model.uvl")},
+        content_type="multipart/form-data",
+    )
+    assert response.json["filename"] == "model.uvl"
+    path = os.path.join(user.temp_folder(), "model.uvl")
+    assert read_checksum_sidecar(path) == (hashlib.md5(b"features\n    Root").hexdigest(), 17)
+
+    test_client.post("/dataset/file/delete", json={"file": "model.uvl"})
+
+    assert not os.path.exists(path)
+    assert read_checksum_sidecar(path) is None
+
+
+def test_upload_form_allows_files_up_to_the_server_limit(client, test_app, monkeypatch):
+    test_client, _ = client
+    monkeypatch.setitem(test_app.config, "RESUMABLE_UPLOAD_MAX_BYTES", 50 * 1024 * 1024)
+
+    page = test_client.get("/dataset/upload").get_data(as_text=True)
+    assert "maxFilesize: 50.0," in page
@@ -0,0 +1,58 @@
+"""
+Unit tests for the streamed dataset ZIP download.
+"""
+
+import io
+import time
+from zipfile import ZipFile
+
+from app import db
+from app.modules.dataset.models import DataSet
+from core.archives.zip_stream import iter_directory, stream_zip
+
+
+def test_stream_zip_roundtrip(tmp_path):
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "a.uvl").write_bytes(b"features\n    Root")
+    (tmp_path / "nested" / "b.bin").write_bytes(b"\x00\x01" * 100_000)
+
+    chunks = list(stream_zip(iter_directory(str(tmp_path), arcname_prefix="dataset_1"), chunk_size=4096))
+
+    assert len(chunks) > 1, "The archive should be produced incrementally"
+    with ZipFile(io.BytesIO(b"".join(chunks))) as zipf:
+        assert zipf.testzip() is None
+        assert sorted(zipf.namelist()) == ["dataset_1/a.uvl", "dataset_1/nested/b.bin"]
+        assert zipf.read("dataset_1/nested/b.bin") == b"\x00\x01" * 100_000
+
+
+def test_generated_members_do_not_change_between_builds(monkeypatch):
+    entries = [(b"readme", "README.txt"), (lambda: io.BytesIO(b"remote object"), "dataset_1/a.uvl")]
+    first = b"".join(stream_zip(entries))
+
+    later = time.localtime(time.time() + 3600)
+    monkeypatch.setattr(time, "localtime", lambda *args: later)
+
+    assert b"".join(stream_zip(entries)) == first
+
+
+def test_iter_directory_missing_root_yields_nothing(tmp_path):
+    assert list(iter_directory(str(tmp_path / "missing"))) == []
+
+
+def test_download_dataset_streams_zip(test_database_poblated):
+    client = test_database_poblated
+    dataset = db.session.query(DataSet).first()
+
+    response = client.get(f"/dataset/download/{dataset.id}")
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == "application/zip"
+    assert f"dataset_{dataset.id}.zip" in response.headers["Content-Disposition"]
+
+    with ZipFile(io.BytesIO(response.get_data())) as zipf:
+        names = zipf.namelist()
+
+    assert names, "The archive should contain the dataset files"
+    assert all(name.startswith(f"dataset_{dataset.id}/") for name in names)
+    assert {f.name for f in dataset.files()} == {name.split("/", 1)[1] for name in names}
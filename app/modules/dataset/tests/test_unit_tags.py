@@ -0,0 +1,71 @@
+"""
+Unit tests for the normalized tag table mirrored from the tag strings.
+"""
+
+from app import db
+from app.modules.dataset.models import DSMetaData, PublicationType, Tag, split_tags
+from app.modules.dataset.services import TagService
+from app.modules.explore.services import ExploreService
+
+
+def _tag(name):
+    return db.session.query(Tag).filter_by(normalized_name=name).one_or_none()
+
+
+def test_split_tags_normalizes_and_deduplicates():
+    assert split_tags(" Rock, rock ,Música,, jazz  fusion") == [
+        ("Rock", "rock"),
+        ("Música", "musica"),
+        ("jazz  fusion", "jazz fusion"),
+    ]
+
+
+def test_seeded_tags_are_counted(test_database_poblated):
+    # Four datasets and twelve feature models carry "tag1, tag2"
+    assert _tag("tag1").usage_count == 16
+    assert _tag("tag2").usage_count == 16
+
+
+def test_tag_list_follows_the_tags_string(test_database_poblated):
+    ds_meta_data = db.session.query(DSMetaData).filter_by(title="Sample dataset 1").one()
+    ds_meta_data.tags = "Rock, tag1"
+    db.session.commit()
+
+    assert [tag.name for tag in ds_meta_data.tag_list] == ["Rock", "tag1"]
+    assert _tag("rock").usage_count == 1
+    assert _tag("tag2").usage_count == 15
+
+    db.session.add(DSMetaData(title="Other", description="Other", publication_type=PublicationType.NONE, tags="ROCK"))
+    db.session.commit()
+    assert _tag("rock").usage_count == 2
+
+
+def test_deleting_metadata_releases_its_tags(test_database_poblated):
+    ds_meta_data = DSMetaData(title="Short", description="Short", publication_type=PublicationType.NONE, tags="ska")
+    db.session.add(ds_meta_data)
+    db.session.commit()
+    assert _tag("ska").usage_count == 1
+
+    db.session.delete(ds_meta_data)
+    db.session.commit()
+    assert _tag("ska").usage_count == 0
+
+
+def test_explore_filters_by_normalized_tag(test_database_poblated):
+    ds_meta_data = db.session.query(DSMetaData).filter_by(title="Sample dataset 2").one()
+    ds_meta_data.tags = "Música"
+    db.session.commit()
+
+    results = ExploreService().filter_page(tags=["musica"])["datasets"]
+
+    assert [document.title for document in results] == ["Sample dataset 2"]
+
+
+def test_autocomplete_ranks_by_usage(test_client, test_database_poblated):
+    db.session.add(DSMetaData(title="T", description="T", publication_type=PublicationType.NONE, tags="tagalong"))
+    db.session.commit()
+
+    assert [tag.name for tag in TagService().autocomplete("tag")] == ["tag1", "tag2", "tagalong"]
+
+    response = test_client.get("/dataset/tags?q=taga")
+    assert response.get_json() == [{"name": "tagalong", "usage_count": 1}]
@@ -0,0 +1,117 @@
+"""
+Unit tests for the HyperLogLog sketches of distinct visitors of datasets and files.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.modules.dataset.models import DataSet, DSDailyStats, DSDownloadRecord, DSMetaData, DSMonthlySketch
+from app.modules.dataset.services import DataSetService
+from app.modules.hubfile.models import Hubfile
+from app.modules.hubfile.services import HubfileService
+from core.analytics.hyperloglog import HyperLogLog
+from core.analytics.writer import AnalyticsWriter
+
+
+@pytest.fixture
+def dataset(test_database_poblated):
+    return db.session.query(DataSet).join(DSMetaData).filter(DSMetaData.title == "Sample dataset 1").one()
+
+
+@pytest.fixture
+def writer(test_app):
+    return AnalyticsWriter(test_app, write_behind=False)
+
+
+def _days_ago(days):
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+
+def test_sketch_estimates_merges_and_stays_small():
+    first = HyperLogLog().update(f"visitor-{i}" for i in range(20000))
+    second = HyperLogLog().update(f"visitor-{i}" for i in range(10000, 30000))
+
+    assert first.count() == pytest.approx(20000, rel=0.05)
+    assert HyperLogLog.from_bytes(first.to_bytes()).registers == first.registers
+    assert first.merge(second).count() == pytest.approx(30000, rel=0.05)
+    assert len(HyperLogLog().update(["a", "b", "c"]).to_bytes()) < 100
+
+
+def test_merge_keeps_the_larger_register():
+    first, second = HyperLogLog(4, bytearray([0, 5, 7, 1] * 4)), HyperLogLog(4, bytearray([3, 5, 2, 0x7F] * 4))
+
+    assert first.merge(second).registers == bytearray([3, 5, 7, 0x7F] * 4)
+
+
+def test_daily_sketches_merge_into_week_month_and_all_time(dataset, writer):
+    for cookie, days in (("a", 0), ("a", 1), ("b", 1), ("c", 20), ("d", 40)):
+        writer.record("dataset_view", dataset.id, None, cookie, at=_days_ago(days))
+    writer.record("dataset_download", dataset.id, None, "a")
+
+    visitors = DataSetService().get_distinct_visitors(dataset.id)
+    assert visitors["week"] == {"views": 2, "downloads": 1}
+    assert visitors["month"]["views"] == 3
+    assert visitors["all"]["views"] == 4
+    assert DSMonthlySketch.query.filter_by(dataset_id=dataset.id).count() in (2, 3)
+
+
+def test_windows_are_read_in_a_single_pass(dataset, writer):
+    for days in range(40):
+        writer.record("dataset_view", dataset.id, None, f"cookie-{days}", at=_days_ago(days))
+    dataset_id = dataset.id
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        visitors = DataSetService().get_distinct_visitors(dataset_id)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+    assert [visitors[period]["views"] for period in ("week", "month", "all")] == [8, 31, 40]
+    assert [statement.split("FROM ")[1].split()[0] for statement in statements] == [
+        "ds_daily_sketch",
+        "ds_monthly_sketch",
+    ]
+
+
+def test_stats_and_trending_expose_distinct_visitors(test_database_poblated, dataset, writer):
+    for cookie in ("a", "b", "c"):
+        writer.record("dataset_view", dataset.id, None, cookie)
+    writer.record("dataset_download", dataset.id, None, "a")
+
+    stats = test_database_poblated.get(f"/datasets/{dataset.id}/stats").json
+    trending = DataSetService().get_trending_datasets(period="week", limit=1)[0]
+
+    assert stats["unique_visitors"]["week"] == {"views": 3, "downloads": 1}
+    assert (trending["id"], trending["unique_viewers"], trending["unique_downloaders"]) == (dataset.id, 3, 1)
+
+
+def test_without_audit_records_counting_comes_from_the_sketches(test_app, dataset, writer, monkeypatch):
+    monkeypatch.setitem(test_app.config, "ANALYTICS_AUDIT_RECORDS", False)
+    downloads = dataset.download_count
+
+    for cookie in ("a", "b", "c", "a"):
+        writer.record("dataset_download", dataset.id, None, cookie)
+
+    db.session.refresh(dataset)
+    assert DSDownloadRecord.query.count() == 0
+    assert dataset.download_count == downloads + 3
+    assert DSDailyStats.query.filter_by(dataset_id=dataset.id).one().downloads == 3
+    with pytest.raises(ValueError):
+        DataSetService().rebuild_daily_stats()
+
+
+def test_files_have_their_own_sketches(dataset, writer):
+    hubfile = Hubfile.query.filter_by(dataset_id=dataset.id).first()
+
+    for cookie in ("a", "b", "a"):
+        writer.record("file_view", hubfile.id, None, cookie)
+
+    assert HubfileService().get_distinct_visitors(hubfile.id, ["week"]) == {"week": {"views": 2, "downloads": 0}}
@@ -2,6 +2,13 @@ document.addEventListener('DOMContentLoaded', () => {
     send_query();
 });
 
+let nextCursor = null;
+let currentCriteria = null;
+
+// Only what the result cards render is requested
+const CARD_FIELDS = ['id', 'title', 'url', 'publication_type', 'created_at', 'description', 'authors', 'tags',
+    'total_size_in_human_format'];
+
 function send_query() {
 
     console.log("send query...")
@@ -16,127 +23,190 @@ function send_query() {
         filter.addEventListener('input', () => {
             const csrfToken = document.getElementById('csrf_token').value;
 
-            const searchCriteria = {
+            currentCriteria = {
                 csrf_token: csrfToken,
                 query: document.querySelector('#query').value,
                 publication_type: document.querySelector('#publication_type').value,
                 sorting: document.querySelector('[name="sorting"]:checked').value,
+                fields: CARD_FIELDS,
             };
 
             console.log(document.querySelector('#publication_type').value);
 
-            fetch('/explore', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(searchCriteria),
-            })
-                .then(response => response.json())
-                .then(data => {
-
-                    console.log(data);
-                    document.getElementById('results').innerHTML = '';
-
-                    // results counter
-                    const resultCount = data.length;
-                    const resultText = resultCount === 1 ? 'dataset' : 'datasets';
-                    document.getElementById('results_number').textContent = `${resultCount} ${resultText} found`;
-
-                    if (resultCount === 0) {
-                        console.log("show not found icon");
-                        document.getElementById("results_not_found").style.display = "block";
-                    } else {
-                        document.getElementById("results_not_found").style.display = "none";
-                    }
-
-
-                    data.forEach(dataset => {
-                        let card = document.createElement('div');
-                        card.className = 'col-12';
-                        card.innerHTML = `
-                            <div class="card">
-                                <div class="card-body">
-                                    <div class="d-flex align-items-center justify-content-between">
-                                        <h3><a href="${dataset.url}">${dataset.title}</a></h3>
-                                        <div>
-                                            <span class="badge bg-primary" style="cursor: pointer;" onclick="set_publication_type_as_query('${dataset.publication_type}')">${dataset.publication_type}</span>
-                                        </div>
-                                    </div>
-                                    <p class="text-secondary">${formatDate(dataset.created_at)}</p>
-
-                                    <div class="row mb-2">
-
-                                        <div class="col-md-4 col-12">
-                                            <span class=" text-secondary">
-                                                Description
-                                            </span>
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            <p class="card-text">${dataset.description}</p>
-                                        </div>
-
-                                    </div>
-
-                                    <div class="row mb-2">
-
-                                        <div class="col-md-4 col-12">
-                                            <span class=" text-secondary">
-                                                Authors
-                                            </span>
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            ${dataset.authors.map(author => `
-                                                <p class="p-0 m-0">${author.name}${author.affiliation ? ` (${author.affiliation})` : ''}${author.orcid ? ` (${author.orcid})` : ''}</p>
-                                            `).join('')}
-                                        </div>
-
-                                    </div>
-
-                                    <div class="row mb-2">
-
-                                        <div class="col-md-4 col-12">
-                                            <span class=" text-secondary">
-                                                Tags
-                                            </span>
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            ${dataset.tags.map(tag => `<span class="badge bg-primary me-1" style="cursor: pointer;" onclick="set_tag_as_query('${tag}')">${tag}</span>`).join('')}
-                                        </div>
-
-                                    </div>
-
-                                    <div class="row">
-
-                                        <div class="col-md-4 col-12">
-
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            <a href="${dataset.url}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
-                                                <i data-feather="eye"></i> View dataset
-                                            </a>
-                                            <a href="/dataset/download/${dataset.id}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
-                                                <i data-feather="download"></i> Download (${dataset.total_size_in_human_format})
-                                            </a>
-                                            ${dataset.feature_models && dataset.feature_models.length > 0 ? `
-                                                <button class="btn btn-outline-success btn-sm" onclick="addDatasetModelsToCart(${dataset.id}, ${dataset.feature_models.map(fm => fm.id).join(',')})" style="border-radius: 5px;">
-                                                    <i data-feather="shopping-cart"></i> Add models to cart (${dataset.feature_models.length})
-                                                </button>
-                                            ` : ''}
-                                        </div>
-
-
-                                    </div>
+            fetch_page(null);
+        });
+    });
+
+    document.getElementById('load_more').addEventListener('click', () => fetch_page(nextCursor));
+    document.getElementById('query').addEventListener('input', fetch_suggestions);
+}
 
+let suggestTimer = null;
+
+function fetch_suggestions(event) {
+    // Wait for a pause in typing before asking for completions
+    clearTimeout(suggestTimer);
+    const prefix = event.target.value.trim();
+    suggestTimer = setTimeout(() => {
+        const datalist = document.getElementById('query_suggestions');
+        if (!prefix) {
+            datalist.innerHTML = '';
+            return;
+        }
+        fetch(`/explore/suggest?q=${encodeURIComponent(prefix)}`)
+            .then(response => response.json())
+            .then(data => {
+                datalist.innerHTML = '';
+                data.suggestions.forEach(suggestion => {
+                    const option = document.createElement('option');
+                    option.value = suggestion.text;
+                    option.label = suggestion.kind;
+                    datalist.appendChild(option);
+                });
+            });
+    }, 150);
+}
+
+function fetch_page(cursor) {
+    const criteria = cursor ? { ...currentCriteria, cursor: cursor } : { ...currentCriteria, facets: true };
+
+    fetch('/explore', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(criteria),
+    })
+        .then(response => response.json())
+        .then(data => {
+
+            console.log(data);
+
+            if (!cursor) {
+                document.getElementById('results').innerHTML = '';
+
+                // results counter
+                const resultCount = data.total;
+                const resultText = resultCount === 1 ? 'dataset' : 'datasets';
+                const resultPrefix = data.total_is_estimate ? 'More than ' : '';
+                document.getElementById('results_number').textContent = `${resultPrefix}${resultCount} ${resultText} found`;
+
+                if (resultCount === 0) {
+                    console.log("show not found icon");
+                    document.getElementById("results_not_found").style.display = "block";
+                } else {
+                    document.getElementById("results_not_found").style.display = "none";
+                }
+            }
+
+            if (data.facets) {
+                render_facets(data.facets);
+            }
+
+            nextCursor = data.next_cursor;
+            document.getElementById('load_more').style.display = nextCursor ? 'inline-block' : 'none';
+
+            data.datasets.forEach(dataset => {
+                let card = document.createElement('div');
+                card.className = 'col-12';
+                card.innerHTML = `
+                    <div class="card">
+                        <div class="card-body">
+                            <div class="d-flex align-items-center justify-content-between">
+                                <h3><a href="${dataset.url}">${dataset.title}</a></h3>
+                                <div>
+                                    <span class="badge bg-primary" style="cursor: pointer;" onclick="set_publication_type_as_query('${dataset.publication_type}')">${dataset.publication_type}</span>
                                 </div>
                             </div>
-                        `;
+                            <p class="text-secondary">${formatDate(dataset.created_at)}</p>
 
-                        document.getElementById('results').appendChild(card);
-                    });
-                });
+                            <div class="row mb-2">
+
+                                <div class="col-md-4 col-12">
+                                    <span class=" text-secondary">
+                                        Description
+                                    </span>
+                                </div>
+                                <div class="col-md-8 col-12">
+                                    <p class="card-text">${dataset.description}</p>
+                                </div>
+
+                            </div>
+
+                            <div class="row mb-2">
+
+                                <div class="col-md-4 col-12">
+                                    <span class=" text-secondary">
+                                        Authors
+                                    </span>
+                                </div>
+                                <div class="col-md-8 col-12">
+                                    ${dataset.authors.map(author => `
+                                        <p class="p-0 m-0">${author.name}${author.affiliation ? ` (${author.affiliation})` : ''}${author.orcid ? ` (${author.orcid})` : ''}</p>
+                                    `).join('')}
+                                </div>
+
+                            </div>
+
+                            <div class="row mb-2">
+
+                                <div class="col-md-4 col-12">
+                                    <span class=" text-secondary">
+                                        Tags
+                                    </span>
+                                </div>
+                                <div class="col-md-8 col-12">
+                                    ${dataset.tags.map(tag => `<span class="badge bg-primary me-1" style="cursor: pointer;" onclick="set_tag_as_query('${tag}')">${tag}</span>`).join('')}
+                                </div>
+
+                            </div>
+
+                            <div class="row">
+
+                                <div class="col-md-4 col-12">
+
+                                </div>
+                                <div class="col-md-8 col-12">
+                                    <a href="${dataset.url}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
+                                        <i data-feather="eye"></i> View dataset
+                                    </a>
+                                    <a href="/dataset/download/${dataset.id}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
+                                        <i data-feather="download"></i> Download (${dataset.total_size_in_human_format})
+                                    </a>
+                                    ${dataset.feature_models && dataset.feature_models.length > 0 ? `
+                                        <button class="btn btn-outline-success btn-sm" onclick="addDatasetModelsToCart(${dataset.id}, ${dataset.feature_models.map(fm => fm.id).join(',')})" style="border-radius: 5px;">
+                                            <i data-feather="shopping-cart"></i> Add models to cart (${dataset.feature_models.length})
+                                        </button>
+                                    ` : ''}
+                                </div>
+
+
+                            </div>
+
+                        </div>
+                    </div>
+                `;
+
+                document.getElementById('results').appendChild(card);
+            });
         });
+}
+
+function render_facets(facets) {
+    // Show how many results each publication type holds
+    document.querySelectorAll('#publication_type option').forEach(option => {
+        if (!option.dataset.label) {
+            option.dataset.label = option.text;
+        }
+        const count = facets.publication_type[option.value];
+        option.text = count ? `${option.dataset.label} (${count})` : option.dataset.label;
     });
+
+    const tags = Object.entries(facets.tags);
+    document.getElementById('facet_tags').innerHTML = tags.length === 0 ? '' : `
+        <span class="text-secondary me-2">Popular tags</span>
+        ${tags.map(([tag, count]) => `<span class="badge bg-secondary me-1" style="cursor: pointer;" onclick="set_tag_as_query('${tag}')">${tag} (${count})</span>`).join('')}
+    `;
 }
 
 function formatDate(dateString) {
@@ -180,7 +250,7 @@ function clearFilters() {
     // Reset the sorting option
     let sortingOptions = document.querySelectorAll('[name="sorting"]');
     sortingOptions.forEach(option => {
-        option.checked = option.value == "newest"; // replace "default" with whatever your default value is
+        option.checked = option.value == "relevance"; // replace "default" with whatever your default value is
         // option.dispatchEvent(new Event('input', {bubbles: true}));
     });
 
@@ -0,0 +1,152 @@
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from flask import has_request_context, request
+from sqlalchemy import DDL
+from sqlalchemy import Enum as SQLAlchemyEnum
+from sqlalchemy import event
+
+from app import db
+from app.modules.dataset.models import PublicationType
+
+
+class DataSetSearchDocument(db.Model):
+    """
+    Denormalized projection of one published dataset: its normalized search text (the metadata, its
+    authors and the metadata of its feature models, images or audios) plus everything Explore filters,
+    sorts and lists by, so that searching never reaches the metadata tables. ``body`` carries a
+    FULLTEXT index on MariaDB/MySQL and is mirrored into an FTS5 table on SQLite.
+    """
+
+    __tablename__ = "dataset_search_document"
+
+    data_set_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="CASCADE"), primary_key=True)
+    ds_meta_data_id = db.Column(db.Integer, nullable=False)
+    body = db.Column(db.Text, nullable=False, default="")
+    dataset_type = db.Column(db.String(50))
+    title = db.Column(db.String(120), nullable=False, default="")
+    description = db.Column(db.Text)
+    authors = db.Column(db.JSON)
+    publication_type = db.Column(SQLAlchemyEnum(PublicationType))
+    publication_doi = db.Column(db.String(120))
+    dataset_doi = db.Column(db.String(120))
+    tags = db.Column(db.String(120))
+    files_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    total_size = db.Column(db.BigInteger, nullable=False, default=0, server_default="0")
+    download_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    id = db.synonym("data_set_id")
+
+    __table_args__ = (db.Index("ix_dataset_search_document_created_at_id", "created_at", "data_set_id"),)
+
+    def to_dict(self, fields=None):
+        """Explore list card, the listing fields of DataSet.to_dict without the per-file details"""
+        return card_serializer(fields)([self])[0]
+
+    def __repr__(self):
+        return f"DataSetSearchDocument<{self.data_set_id}>"
+
+
+# Card field -> (search document columns it needs, value from a row holding them and the page context)
+CARD_FIELDS = {
+    "title": (("title",), lambda row, page: row.title),
+    "id": (("data_set_id",), lambda row, page: row.data_set_id),
+    "dataset_type": (("dataset_type",), lambda row, page: row.dataset_type),
+    "created_at": (("created_at",), lambda row, page: row.created_at),
+    "created_at_timestamp": (("created_at",), lambda row, page: int(row.created_at.timestamp())),
+    "description": (("description",), lambda row, page: row.description),
+    "authors": (("authors",), lambda row, page: row.authors or []),
+    "publication_type": (
+        ("publication_type",),
+        lambda row, page: row.publication_type.name.replace("_", " ").title() if row.publication_type else None,
+    ),
+    "publication_doi": (("publication_doi",), lambda row, page: row.publication_doi),
+    "dataset_doi": (("dataset_doi",), lambda row, page: row.dataset_doi),
+    "tags": (("tags",), lambda row, page: row.tags.split(",") if row.tags else []),
+    "url": (("dataset_doi",), lambda row, page: page["doi_url"](row.dataset_doi)),
+    "download": (("data_set_id",), lambda row, page: f'{page["host"]}/dataset/download/{row.data_set_id}'),
+    "download_count": (("download_count",), lambda row, page: row.download_count),
+    "files_count": (("files_count",), lambda row, page: row.files_count),
+    "total_size_in_bytes": (("total_size",), lambda row, page: row.total_size),
+    "total_size_in_human_format": (("total_size",), lambda row, page: page["human_size"](row.total_size)),
+}
+
+
+class CardSerializer:
+    """
+    Builds Explore cards with a fixed set of fields from search documents or from plain rows holding
+    just the ``columns`` those fields need, so listing never loads models or their relationships.
+    """
+
+    def __init__(self, fields: Tuple[str, ...]):
+        self.fields = fields
+        self.columns = tuple(dict.fromkeys(column for field in fields for column in CARD_FIELDS[field][0]))
+        self._values = [(field, CARD_FIELDS[field][1]) for field in fields]
+
+    def __call__(self, rows) -> list:
+        from app.modules.dataset.services import DataSetService, SizeService
+
+        page = {
+            "host": request.host_url.rstrip("/") if has_request_context() else "",
+            "doi_url": DataSetService().get_uvlhub_doi_url,
+            "human_size": SizeService().get_human_readable_size,
+        }
+        return [{field: value(row, page) for field, value in self._values} for row in rows]
+
+
+def parse_card_fields(fields) -> Optional[Tuple[str, ...]]:
+    """
+    Card fields asked for as a list or a comma-separated string, None for all of them.
+    Raises ValueError for unknown fields.
+    """
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    fields = tuple(dict.fromkeys(field.strip() for field in fields if field and field.strip()))
+    unknown = [field for field in fields if field not in CARD_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields or None
+
+
+@lru_cache(maxsize=128)
+def _card_serializer(fields: Tuple[str, ...]) -> CardSerializer:
+    return CardSerializer(fields)
+
+
+def card_serializer(fields=None) -> CardSerializer:
+    """The compiled serializer of a field set, shared by every request asking for the same fields"""
+    return _card_serializer(parse_card_fields(fields) or tuple(CARD_FIELDS))
+
+
+SQLITE_FTS_TABLE = "dataset_search_fts"
+
+_table = DataSetSearchDocument.__table__
+
+event.listen(
+    _table,
+    "after_create",
+    DDL("CREATE FULLTEXT INDEX ix_dataset_search_document_body ON dataset_search_document (body)").execute_if(
+        dialect=("mysql", "mariadb")
+    ),
+)
+
+# External-content FTS5 table kept in step with dataset_search_document by triggers
+for _statement in (
+    f"CREATE VIRTUAL TABLE {SQLITE_FTS_TABLE} USING fts5("
+    f"body, content='dataset_search_document', content_rowid='data_set_id')",
+    f"CREATE TRIGGER dataset_search_document_ai AFTER INSERT ON dataset_search_document BEGIN "
+    f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, body) VALUES (new.data_set_id, new.body); END",
+    f"CREATE TRIGGER dataset_search_document_ad AFTER DELETE ON dataset_search_document BEGIN "
+    f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, body) "
+    f"VALUES ('delete', old.data_set_id, old.body); END",
+    f"CREATE TRIGGER dataset_search_document_au AFTER UPDATE OF body ON dataset_search_document BEGIN "
+    f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, body) "
+    f"VALUES ('delete', old.data_set_id, old.body); "
+    f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, body) VALUES (new.data_set_id, new.body); END",
+):
+    event.listen(_table, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+event.listen(_table, "before_drop", DDL(f"DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}").execute_if(dialect="sqlite"))
@@ -1,44 +1,233 @@
+import base64
+import json
+import os
 import re
+from collections import Counter
+from datetime import datetime
+from typing import Optional, Tuple
 
 import unidecode
-from sqlalchemy import any_, or_
+from flask import current_app
+from sqlalchemy import and_, column, exists, extract, func, literal_column, null, or_, select, table, union_all
+from sqlalchemy.dialects.mysql import match
 
-from app.modules.dataset.models import Author, DataSet, DSMetaData, PublicationType
-from app.modules.featuremodel.models import FeatureModel, FMMetaData
+from app.modules.dataset.models import DataSet, DSMetaData, PublicationType, Tag, ds_meta_data_tag, normalize_tag
+from app.modules.explore.models import SQLITE_FTS_TABLE, DataSetSearchDocument
+from core.managers.cache_manager import bump_namespace_version, namespace_version
 from core.repositories.BaseRepository import BaseRepository
+from core.search.inverted_index import InvertedIndex
+from core.search.prefix_index import PrefixIndex
+
+# Cached Explore pages live under this namespace and go stale whenever a dataset is (re)indexed
+CACHE_NAMESPACE = "explore"
+
+
+def normalize_search_text(text) -> str:
+    """Unaccented, lower-cased text without punctuation, as both documents and queries are indexed"""
+    normalized = unidecode.unidecode(text or "").lower()
+    return re.sub(r'[,.":\'()\[\]^;!¡¿?]', "", normalized)
+
+
+def search_terms(query) -> list:
+    return re.findall(r"\w+", normalize_search_text(query))
+
+
+def encode_cursor(position: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> dict:
+    """Position encoded by ``encode_cursor``; raises ValueError for cursors that were not issued by it"""
+    if not cursor:
+        return {}
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if isinstance(position, dict):
+        if isinstance(position.get("offset"), int) and position["offset"] >= 0:
+            return position
+        if isinstance(position.get("created_at"), str) and isinstance(position.get("id"), int):
+            datetime.fromisoformat(position["created_at"])
+            return position
+    raise ValueError("Invalid cursor")
 
 
 class ExploreRepository(BaseRepository):
     def __init__(self):
         super().__init__(DataSet)
 
-    def filter(self, query="", sorting="newest", publication_type="any", tags=[], **kwargs):
-        # Normalize and remove unwanted characters
-        normalized_query = unidecode.unidecode(query).lower()
-        cleaned_query = re.sub(r'[,.":\'()\[\]^;!¡¿?]', "", normalized_query)
-
-        filters = []
-        for word in cleaned_query.split():
-            filters.append(DSMetaData.title.ilike(f"%{word}%"))
-            filters.append(DSMetaData.description.ilike(f"%{word}%"))
-            filters.append(Author.name.ilike(f"%{word}%"))
-            filters.append(Author.affiliation.ilike(f"%{word}%"))
-            filters.append(Author.orcid.ilike(f"%{word}%"))
-            filters.append(FMMetaData.uvl_filename.ilike(f"%{word}%"))
-            filters.append(FMMetaData.title.ilike(f"%{word}%"))
-            filters.append(FMMetaData.description.ilike(f"%{word}%"))
-            filters.append(FMMetaData.publication_doi.ilike(f"%{word}%"))
-            filters.append(FMMetaData.tags.ilike(f"%{word}%"))
-            filters.append(DSMetaData.tags.ilike(f"%{word}%"))
-
-        datasets = (
-            self.model.query.join(DataSet.ds_meta_data)
-            .join(DSMetaData.authors)
-            .join(DataSet.feature_models)
-            .join(FeatureModel.fm_meta_data)
-            .filter(or_(*filters))
-            .filter(DSMetaData.dataset_doi.isnot(None))  # Exclude datasets with empty dataset_doi
-        )
+    def filter_page(
+        self,
+        query="",
+        sorting="newest",
+        publication_type="any",
+        tags=[],
+        cursor=None,
+        limit=20,
+        columns=None,
+        **kwargs,
+    ) -> Tuple[list, Optional[str]]:
+        """
+        One page of the search documents of the filtered datasets and the cursor of the next page (None on
+        the last one). Date orderings page by keyset on (created_at, id), so deep pages cost the same as the
+        first; relevance orderings page by offset within the ranking.
+        With ``columns`` (names of search document columns) the page holds plain rows of those columns.
+        """
+        position = decode_cursor(cursor)
+        documents, matches, scores = self._filtered_query(query, publication_type, tags)
+        if documents is None:
+            return [], None
+        if columns:
+            # The keyset cursor is built from (created_at, data_set_id), so they are always selected
+            names = dict.fromkeys(("data_set_id", "created_at", *columns))
+            documents = documents.with_entities(*[getattr(DataSetSearchDocument, name) for name in names])
+
+        if sorting == "relevance" and (matches is not None or scores is not None):
+            offset = position.get("offset", 0)
+            if scores is not None:
+                candidates = {
+                    data_set_id for data_set_id, in documents.with_entities(DataSetSearchDocument.data_set_id)
+                }
+                ranked = [data_set_id for data_set_id in scores if data_set_id in candidates][
+                    offset : offset + limit + 1
+                ]
+                page = {
+                    document.data_set_id: document
+                    for document in documents.filter(DataSetSearchDocument.data_set_id.in_(ranked[:limit]))
+                }
+                results = [page[data_set_id] for data_set_id in ranked[:limit] if data_set_id in page]
+                has_more = len(ranked) > limit
+            else:
+                results = self._ordered(documents, sorting, matches).offset(offset).limit(limit + 1).all()
+                has_more = len(results) > limit
+                results = results[:limit]
+            return results, encode_cursor({"offset": offset + limit}) if has_more else None
+
+        oldest_first = sorting == "oldest"
+        if "created_at" in position:
+            created_at, last_id = datetime.fromisoformat(position["created_at"]), position["id"]
+            if oldest_first:
+                documents = documents.filter(
+                    or_(
+                        DataSetSearchDocument.created_at > created_at,
+                        and_(
+                            DataSetSearchDocument.created_at == created_at, DataSetSearchDocument.data_set_id > last_id
+                        ),
+                    )
+                )
+            else:
+                documents = documents.filter(
+                    or_(
+                        DataSetSearchDocument.created_at < created_at,
+                        and_(
+                            DataSetSearchDocument.created_at == created_at, DataSetSearchDocument.data_set_id < last_id
+                        ),
+                    )
+                )
+
+        results = self._ordered(documents, "oldest" if oldest_first else "newest").limit(limit + 1).all()
+        if len(results) <= limit:
+            return results, None
+        last = results[limit - 1]
+        return results[:limit], encode_cursor({"created_at": last.created_at.isoformat(), "id": last.data_set_id})
+
+    def latest(self, limit=5, columns=None) -> list:
+        """Search documents (or rows of ``columns``) of the most recently created published datasets"""
+        documents = self.session.query(DataSetSearchDocument)
+        if columns:
+            documents = documents.with_entities(*[getattr(DataSetSearchDocument, name) for name in columns])
+        return documents.order_by(DataSetSearchDocument.data_set_id.desc()).limit(limit).all()
+
+    def count_estimate(self, query="", publication_type="any", tags=[], cap=1000, **kwargs) -> Tuple[int, bool]:
+        """
+        Number of datasets matching the criteria, counting at most ``cap + 1`` rows.
+        Returns (total, is_estimate); past the cap the total is reported as the cap.
+        """
+        documents, _, _ = self._filtered_query(query, publication_type, tags)
+        if documents is None:
+            return 0, False
+        capped = documents.with_entities(DataSetSearchDocument.data_set_id).order_by(None).limit(cap + 1).subquery()
+        total = self.session.query(func.count()).select_from(capped).scalar()
+        return (cap, True) if total > cap else (total, False)
+
+    def facet_counts(self, query="", publication_type="any", tags=[], tag_limit=10, **kwargs) -> dict:
+        """
+        Result counts per publication type, dataset type, year and (top ``tag_limit``) tag over the
+        datasets matching the criteria, from a single statement: the document groups followed by the
+        tag groups, counted over the tag association as the tag filter reads it.
+        """
+        facets = {"publication_type": Counter(), "dataset_type": Counter(), "year": Counter(), "tags": {}}
+        documents, _, _ = self._filtered_query(query, publication_type, tags)
+        if documents is not None:
+            documents = documents.order_by(None)
+            year = extract("year", DataSetSearchDocument.created_at)
+            tag_count = func.count(DataSetSearchDocument.data_set_id)
+            tag_groups = (
+                documents.join(
+                    ds_meta_data_tag, ds_meta_data_tag.c.ds_meta_data_id == DataSetSearchDocument.ds_meta_data_id
+                )
+                .join(Tag, Tag.id == ds_meta_data_tag.c.tag_id)
+                .with_entities(Tag.name.label("tag"), tag_count.label("count"))
+                .group_by(Tag.id, Tag.name)
+                .order_by(tag_count.desc(), Tag.name)
+                .limit(tag_limit)
+                .subquery()
+            )
+            document_groups = documents.with_entities(
+                DataSetSearchDocument.publication_type,
+                DataSetSearchDocument.dataset_type,
+                year,
+                null().label("tag"),
+                func.count(DataSetSearchDocument.data_set_id),
+            ).group_by(DataSetSearchDocument.publication_type, DataSetSearchDocument.dataset_type, year)
+            groups = self.session.execute(
+                union_all(
+                    document_groups.statement,
+                    select(null(), null(), null(), tag_groups.c.tag, tag_groups.c.count),
+                )
+            )
+            for group_publication_type, dataset_type, group_year, tag, count in groups:
+                if tag is not None:
+                    facets["tags"][tag] = count
+                    continue
+                if group_publication_type is not None:
+                    facets["publication_type"][group_publication_type.value] += count
+                facets["dataset_type"][dataset_type] += count
+                facets["year"][int(group_year)] += count
+
+        return {
+            "publication_type": dict(facets["publication_type"].most_common()),
+            "dataset_type": dict(facets["dataset_type"].most_common()),
+            "year": dict(sorted(facets["year"].items(), reverse=True)),
+            "tags": dict(sorted(facets["tags"].items(), key=lambda item: (-item[1], item[0]))),
+        }
+
+    def _filtered_query(self, query, publication_type, tags):
+        """
+        (search documents query, full-text match subquery, in-process scores) for the criteria.
+        Only published datasets have a search document. The query is None when the in-process index
+        already knows nothing matches.
+        """
+        terms = search_terms(query)
+
+        documents = self.session.query(DataSetSearchDocument)
+
+        matches = scores = None
+        engine = self.get_search_engine() if terms else None
+        if engine is not None:
+            # The in-process index ranks the candidates; the database only filters them
+            scores = dict(engine.search(terms))
+            if not scores:
+                return None, None, scores
+            documents = documents.filter(DataSetSearchDocument.data_set_id.in_(scores))
+        elif terms:
+            matches = self._match_subquery(terms)
+            if matches is not None:
+                documents = documents.join(matches, matches.c.data_set_id == DataSetSearchDocument.data_set_id)
+            else:
+                # Databases without a full-text index fall back to scanning the normalized text
+                documents = documents.filter(or_(*[DataSetSearchDocument.body.like(f"%{term}%") for term in terms]))
 
         if publication_type != "any":
             matching_type = None
@@ -48,15 +237,231 @@ class ExploreRepository(BaseRepository):
                     break
 
             if matching_type is not None:
-                datasets = datasets.filter(DSMetaData.publication_type == matching_type.name)
+                documents = documents.filter(DataSetSearchDocument.publication_type == matching_type)
 
         if tags:
-            datasets = datasets.filter(DSMetaData.tags.ilike(any_(f"%{tag}%" for tag in tags)))
+            # Index lookups on the normalized tag table instead of substring matches on the tags string
+            documents = documents.filter(
+                exists()
+                .where(
+                    ds_meta_data_tag.c.ds_meta_data_id == DataSetSearchDocument.ds_meta_data_id,
+                    Tag.id == ds_meta_data_tag.c.tag_id,
+                    Tag.normalized_name.in_([normalize_tag(tag) for tag in tags]),
+                )
+                .correlate(DataSetSearchDocument)
+            )
+
+        return documents, matches, scores
 
-        # Order by created_at
+    def _ordered(self, documents, sorting, matches=None):
+        # Order by relevance when there is something to rank, by created_at otherwise (id breaks ties)
+        if sorting == "relevance" and matches is not None:
+            return documents.order_by(
+                matches.c.score.desc(),
+                DataSetSearchDocument.created_at.desc(),
+                DataSetSearchDocument.data_set_id.desc(),
+            )
         if sorting == "oldest":
-            datasets = datasets.order_by(self.model.created_at.asc())
+            return documents.order_by(DataSetSearchDocument.created_at.asc(), DataSetSearchDocument.data_set_id.asc())
+        return documents.order_by(DataSetSearchDocument.created_at.desc(), DataSetSearchDocument.data_set_id.desc())
+
+    def _match_subquery(self, terms):
+        """
+        (data_set_id, score) of the datasets matching any of the terms, higher scores first.
+        Returns None on databases without a full-text index.
+        """
+        dialect = self.session.get_bind().dialect.name
+        if dialect == "sqlite":
+            fts = literal_column(SQLITE_FTS_TABLE)
+            expression = " OR ".join(f'"{term}"*' for term in terms)
+            return (
+                select(
+                    column("rowid").label("data_set_id"),
+                    # bm25() is lower for better matches
+                    (-func.bm25(fts)).label("score"),
+                )
+                .select_from(table(SQLITE_FTS_TABLE))
+                .where(fts.op("MATCH")(expression))
+                .subquery()
+            )
+        if dialect in ("mysql", "mariadb"):
+            score = match(DataSetSearchDocument.body, against=" ".join(f"{term}*" for term in terms)).in_boolean_mode()
+            return select(DataSetSearchDocument.data_set_id, score.label("score")).where(score).subquery()
+        return None
+
+    def index_dataset(self, dataset: DataSet, commit: bool = True) -> Optional[DataSetSearchDocument]:
+        """
+        Refresh the search document of a dataset, dropping it while the dataset is unpublished, and
+        bring the in-process indexes and the Explore cache along.
+        """
+        published = bool(dataset.ds_meta_data.dataset_doi)
+        if published:
+            document = self.session.merge(self.build_search_document(dataset))
         else:
-            datasets = datasets.order_by(self.model.created_at.desc())
+            document = None
+            self.session.query(DataSetSearchDocument).filter_by(data_set_id=dataset.id).delete(
+                synchronize_session=False
+            )
+        if commit:
+            self.session.commit()
+
+        engine = self.get_search_engine()
+        if engine is not None:
+            if published:
+                engine.add(dataset.id, document.body.split())
+            else:
+                engine.remove(dataset.id)
+            engine.save(self._search_snapshot_path())
+
+        suggest_index = current_app.extensions.get("suggest_index")
+        # Updated in place only when no other worker changed the catalogue since it was built
+        current = suggest_index is not None and suggest_index.version == namespace_version(CACHE_NAMESPACE)
+        bump_namespace_version(CACHE_NAMESPACE)
+
+        if current:
+            if published:
+                suggest_index.add(dataset.id, self.build_suggestions(dataset), weight=dataset.download_count or 0)
+            else:
+                suggest_index.remove(dataset.id)
+            suggest_index.version = namespace_version(CACHE_NAMESPACE)
+        return document
+
+    def unindex_dataset(self, data_set_id: int):
+        """Drop the search document of a dataset that is being deleted; committed with the deletion"""
+        self.session.query(DataSetSearchDocument).filter_by(data_set_id=data_set_id).delete(synchronize_session=False)
+
+        engine = self.get_search_engine()
+        if engine is not None:
+            engine.remove(data_set_id)
+            engine.save(self._search_snapshot_path())
+
+        bump_namespace_version(CACHE_NAMESPACE)
+        current_app.extensions.pop("suggest_index", None)
+
+    def rebuild_search_index(self) -> int:
+        self.session.query(DataSetSearchDocument).delete(synchronize_session=False)
+        datasets = self.model.query.join(DataSet.ds_meta_data).filter(DSMetaData.dataset_doi.isnot(None)).all()
+        for dataset in datasets:
+            self.session.add(self.build_search_document(dataset))
+        self.session.commit()
+
+        if current_app.config.get("SEARCH_ENGINE") == "memory":
+            current_app.extensions["search_engine"] = self._build_search_engine()
+
+        bump_namespace_version(CACHE_NAMESPACE)
+        current_app.extensions.pop("suggest_index", None)
+        return len(datasets)
+
+    def get_search_engine(self) -> Optional[InvertedIndex]:
+        """
+        The in-process BM25 index when SEARCH_ENGINE is "memory", None otherwise. It is loaded from its
+        snapshot (built from dataset_search_document the first time) and reloaded when another process
+        rewrites the snapshot.
+        """
+        if current_app.config.get("SEARCH_ENGINE") != "memory":
+            return None
+
+        snapshot_path = self._search_snapshot_path()
+        engine = current_app.extensions.get("search_engine")
+        if engine is None or engine.is_stale(snapshot_path):
+            engine = InvertedIndex.load(snapshot_path) or self._build_search_engine()
+            current_app.extensions["search_engine"] = engine
+        return engine
+
+    def _build_search_engine(self) -> InvertedIndex:
+        engine = InvertedIndex()
+        for data_set_id, body in self.session.query(DataSetSearchDocument.data_set_id, DataSetSearchDocument.body):
+            engine.add(data_set_id, body.split())
+        engine.save(self._search_snapshot_path())
+        return engine
+
+    def get_suggest_index(self) -> PrefixIndex:
+        """
+        Completion index of the published datasets. Datasets indexed by this process update it in
+        place; it is rebuilt from the database when another worker changed the catalogue, which shows
+        as a new version of the explore cache namespace (shared by all the workers).
+        """
+        version = namespace_version(CACHE_NAMESPACE)
+        suggest_index = current_app.extensions.get("suggest_index")
+        if suggest_index is None or suggest_index.version != version:
+            suggest_index = self._build_suggest_index()
+            suggest_index.version = version
+            current_app.extensions["suggest_index"] = suggest_index
+        return suggest_index
+
+    def _build_suggest_index(self) -> PrefixIndex:
+        suggest_index = PrefixIndex(normalize=normalize_search_text)
+        published = self.model.query.join(DataSet.ds_meta_data).filter(DSMetaData.dataset_doi.isnot(None))
+        for dataset in published:
+            suggest_index.add(dataset.id, self.build_suggestions(dataset), weight=dataset.download_count or 0)
+        return suggest_index
+
+    def build_suggestions(self, dataset: DataSet) -> list:
+        """(kind, text) completions offered for a dataset: its title, tags, authors and file names"""
+        ds_meta_data = dataset.ds_meta_data
+        suggestions = [("title", ds_meta_data.title)]
+        suggestions += [("tag", tag.name) for tag in ds_meta_data.tag_list]
+        suggestions += [("author", author.name) for author in ds_meta_data.authors]
+
+        child_meta_data = (
+            [fm.fm_meta_data for fm in getattr(dataset, "feature_models", [])]
+            + [image.image_meta_data for image in getattr(dataset, "images", [])]
+            + [audio.audio_meta_data for audio in getattr(dataset, "audios", [])]
+        )
+        for meta_data in filter(None, child_meta_data):
+            suggestions.append(
+                ("file", getattr(meta_data, "uvl_filename", None) or getattr(meta_data, "filename", None))
+            )
+        return suggestions
+
+    def _search_snapshot_path(self) -> str:
+        return os.path.abspath(os.path.join(os.getenv("WORKING_DIR", ""), current_app.config["SEARCH_SNAPSHOT_PATH"]))
+
+    def build_search_document(self, dataset: DataSet) -> DataSetSearchDocument:
+        ds_meta_data = dataset.ds_meta_data
+        return DataSetSearchDocument(
+            data_set_id=dataset.id,
+            ds_meta_data_id=ds_meta_data.id,
+            body=self.build_document(dataset),
+            dataset_type=dataset.dataset_type,
+            title=ds_meta_data.title,
+            description=ds_meta_data.description,
+            authors=[author.to_dict() for author in ds_meta_data.authors],
+            publication_type=ds_meta_data.publication_type,
+            publication_doi=ds_meta_data.publication_doi,
+            dataset_doi=ds_meta_data.dataset_doi,
+            tags=ds_meta_data.tags,
+            files_count=dataset.get_files_count(),
+            total_size=dataset.get_file_total_size(),
+            download_count=dataset.download_count or 0,
+            created_at=dataset.created_at,
+        )
+
+    def build_document(self, dataset: DataSet) -> str:
+        ds_meta_data = dataset.ds_meta_data
+        parts = [
+            ds_meta_data.title,
+            ds_meta_data.description,
+            ds_meta_data.tags,
+            ds_meta_data.publication_doi,
+            ds_meta_data.dataset_doi,
+        ]
+        for author in ds_meta_data.authors:
+            parts += [author.name, author.affiliation, author.orcid]
+
+        # Per-file metadata of whichever kind of dataset this is
+        child_meta_data = (
+            [fm.fm_meta_data for fm in getattr(dataset, "feature_models", [])]
+            + [image.image_meta_data for image in getattr(dataset, "images", [])]
+            + [audio.audio_meta_data for audio in getattr(dataset, "audios", [])]
+        )
+        for meta_data in filter(None, child_meta_data):
+            parts += [
+                getattr(meta_data, "uvl_filename", None) or getattr(meta_data, "filename", None),
+                meta_data.title,
+                meta_data.description,
+                meta_data.publication_doi,
+                meta_data.tags,
+            ]
 
-        return datasets.all()
+        return " ".join(normalize_search_text(part) for part in parts if part)
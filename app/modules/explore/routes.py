@@ -13,6 +13,15 @@ def index():
         return render_template("explore/index.html", form=form, query=query)
 
     if request.method == "POST":
-        criteria = request.get_json()
-        datasets = ExploreService().filter(**criteria)
-        return jsonify([dataset.to_dict() for dataset in datasets])
+        criteria = request.get_json() or {}
+        try:
+            page = ExploreService().search(**criteria)
+        except ValueError as exc:
+            return jsonify({"message": str(exc)}), 400
+        return jsonify(page)
+
+
+@explore_bp.route("/explore/suggest", methods=["GET"])
+def suggest():
+    prefix = request.args.get("q", "")
+    return jsonify({"query": prefix, "suggestions": ExploreService().suggest(prefix, request.args.get("limit"))})
@@ -1,4 +1,12 @@
-from app.modules.explore.repositories import ExploreRepository
+import hashlib
+import json
+
+from flask import current_app, has_request_context, request
+
+from app.modules.dataset.models import DataSet, normalize_tag
+from app.modules.explore.models import card_serializer
+from app.modules.explore.repositories import CACHE_NAMESPACE, ExploreRepository, search_terms
+from core.managers.cache_manager import get_cache, namespace_version
 from core.services.BaseService import BaseService
 
 
@@ -6,5 +14,127 @@ class ExploreService(BaseService):
     def __init__(self):
         super().__init__(ExploreRepository())
 
-    def filter(self, query="", sorting="newest", publication_type="any", tags=[], **kwargs):
-        return self.repository.filter(query, sorting, publication_type, tags, **kwargs)
+    def filter_page(
+        self,
+        query="",
+        sorting="newest",
+        publication_type="any",
+        tags=[],
+        cursor=None,
+        limit=None,
+        facets=False,
+        columns=None,
+        **kwargs,
+    ) -> dict:
+        """
+        A page of results capped at EXPLORE_MAX_PAGE_SIZE, the cursor of the next one and, on the first
+        page only, the number of matches (an estimate past EXPLORE_COUNT_LIMIT) and, when asked for,
+        the facet counts of the whole result set.
+        Raises ValueError for malformed cursors.
+        """
+        config = current_app.config
+        datasets, next_cursor = self.repository.filter_page(
+            query, sorting, publication_type, tags, cursor=cursor, limit=self.page_size(limit), columns=columns
+        )
+
+        page = {"datasets": datasets, "next_cursor": next_cursor, "total": None, "total_is_estimate": False}
+        if cursor:
+            return page
+
+        if facets:
+            page["facets"] = self.repository.facet_counts(
+                query, publication_type, tags, tag_limit=config["EXPLORE_FACET_TAG_LIMIT"]
+            )
+            # Every matching dataset has exactly one type, so the facet pass yields the exact total as well
+            page["total"] = sum(page["facets"]["dataset_type"].values())
+        elif next_cursor is None:
+            page["total"] = len(datasets)
+        else:
+            page["total"], page["total_is_estimate"] = self.repository.count_estimate(
+                query, publication_type, tags, cap=config["EXPLORE_COUNT_LIMIT"]
+            )
+        return page
+
+    def page_size(self, limit=None) -> int:
+        """``limit`` as a page size: EXPLORE_PAGE_SIZE when missing or malformed, at most EXPLORE_MAX_PAGE_SIZE"""
+        config = current_app.config
+        try:
+            limit = int(limit or config["EXPLORE_PAGE_SIZE"])
+        except (TypeError, ValueError):
+            limit = config["EXPLORE_PAGE_SIZE"]
+        return max(1, min(limit, config["EXPLORE_MAX_PAGE_SIZE"]))
+
+    def search(
+        self,
+        query="",
+        sorting="newest",
+        publication_type="any",
+        tags=[],
+        cursor=None,
+        limit=None,
+        facets=False,
+        fields=None,
+        **kwargs,
+    ) -> dict:
+        """
+        ``filter_page`` serialised as cards holding ``fields`` (all card fields by default), built from
+        rows of just the columns they need. Served from the cache when the same normalized criteria were
+        asked for since the catalogue last changed. Raises ValueError for malformed cursors or unknown fields.
+        """
+        serializer = card_serializer(fields)
+        criteria = {
+            "query": " ".join(search_terms(query)),
+            "sorting": sorting if sorting in ("newest", "oldest", "relevance") else "newest",
+            "publication_type": (publication_type or "any").lower(),
+            "tags": sorted({normalize_tag(tag) for tag in tags or []}),
+            "cursor": cursor or None,
+            "limit": self.page_size(limit),
+            "facets": bool(facets),
+            "fields": serializer.fields,
+            # Serialised datasets carry absolute URLs
+            "host": request.host_url if has_request_context() else None,
+        }
+        digest = hashlib.sha1(json.dumps(criteria, sort_keys=True, default=str).encode()).hexdigest()
+        cache_key = f"{CACHE_NAMESPACE}:{namespace_version(CACHE_NAMESPACE)}:{digest}"
+
+        cache = get_cache()
+        page = cache.get(cache_key)
+        if page is None:
+            page = self.filter_page(
+                query,
+                sorting,
+                publication_type,
+                tags,
+                cursor=cursor,
+                limit=limit,
+                facets=facets,
+                columns=serializer.columns,
+            )
+            page["datasets"] = serializer(page["datasets"])
+            cache.set(cache_key, page, timeout=current_app.config["EXPLORE_CACHE_TIMEOUT"])
+        return page
+
+    def latest(self, limit=5, fields=None) -> list:
+        """Cards of the most recently created published datasets"""
+        serializer = card_serializer(fields)
+        return serializer(self.repository.latest(limit, columns=serializer.columns))
+
+    def suggest(self, prefix: str, limit=None) -> list:
+        """Completions for the Explore search box, served from the in-memory prefix index"""
+        config = current_app.config
+        try:
+            limit = int(limit or config["EXPLORE_SUGGEST_LIMIT"])
+        except (TypeError, ValueError):
+            limit = config["EXPLORE_SUGGEST_LIMIT"]
+        limit = max(1, min(limit, config["EXPLORE_SUGGEST_MAX_LIMIT"]))
+        return self.repository.get_suggest_index().complete(prefix, limit)
+
+    def index_dataset(self, dataset: DataSet, commit: bool = True):
+        """Refresh the search document of a dataset after it was created, published or edited"""
+        return self.repository.index_dataset(dataset, commit=commit)
+
+    def unindex_dataset(self, data_set_id: int):
+        return self.repository.unindex_dataset(data_set_id)
+
+    def rebuild_search_index(self) -> int:
+        return self.repository.rebuild_search_index()
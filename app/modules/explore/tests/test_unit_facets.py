@@ -0,0 +1,76 @@
+"""
+Unit tests for the Explore facet counts.
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.modules.dataset.models import DSMetaData
+from app.modules.dataset.services import DataSetService
+from app.modules.explore.services import ExploreService
+
+
+@pytest.fixture
+def query_counter():
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    yield statements
+    event.remove(db.engine, "before_cursor_execute", count)
+
+
+def test_facets_cover_the_result_set(test_database_poblated):
+    dataset_meta_data = db.session.query(DSMetaData).filter(DSMetaData.title == "Sample dataset 1").one()
+    DataSetService().update_dsmetadata(dataset_meta_data.id, tags="tag1, rock")
+
+    facets = ExploreService().filter_page(facets=True)["facets"]
+
+    assert facets["publication_type"] == {"datamanagementplan": 4}
+    assert facets["dataset_type"] == {"uvl_dataset": 4}
+    assert facets["year"] == {datetime.now().year: 4}
+    assert facets["tags"] == {"tag1": 4, "tag2": 3, "rock": 1}
+
+
+def test_tag_facets_count_the_normalized_tags(test_database_poblated):
+    service = DataSetService()
+    for title, tags in (("Sample dataset 1", "Rock, tag1"), ("Sample dataset 2", "rock ")):
+        dataset_meta_data = db.session.query(DSMetaData).filter(DSMetaData.title == title).one()
+        service.update_dsmetadata(dataset_meta_data.id, tags=tags)
+
+    facets = ExploreService().filter_page(facets=True, tags=["ROCK"])["facets"]
+
+    assert facets["tags"] == {"Rock": 2, "tag1": 1}
+
+
+def test_facets_follow_the_query(test_database_poblated):
+    page = ExploreService().filter_page(query="file10", facets=True)
+
+    assert page["facets"]["dataset_type"] == {"uvl_dataset": 1}
+    assert page["total"] == 1
+
+
+def test_facets_take_one_grouped_query(test_database_poblated, query_counter):
+    service = ExploreService()
+    service.filter_page(limit=1)
+    without_facets = len(query_counter)
+    query_counter.clear()
+
+    service.filter_page(limit=1, facets=True)
+
+    # The facet pass replaces the capped count, so asking for facets adds no round trip
+    assert len(query_counter) == without_facets
+    assert sum("GROUP BY" in statement for statement in query_counter) == 1
+
+
+def test_endpoint_returns_facets_on_request(test_client, test_database_poblated):
+    with_facets = test_client.post("/explore", json={"facets": True}).get_json()
+    without_facets = test_client.post("/explore", json={}).get_json()
+
+    assert with_facets["facets"]["dataset_type"] == {"uvl_dataset": 4}
+    assert "facets" not in without_facets
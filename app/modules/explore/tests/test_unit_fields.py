@@ -0,0 +1,54 @@
+"""
+Unit tests for the sparse fieldsets of Explore cards.
+"""
+
+from sqlalchemy import event
+
+from app import db
+from app.modules.explore.models import CARD_FIELDS, card_serializer
+
+
+def test_cards_hold_only_the_requested_fields(test_client, test_database_poblated):
+    response = test_client.post("/explore", json={"query": "file10", "fields": ["id", "title", "authors"]})
+
+    assert response.status_code == 200
+    [card] = response.get_json()["datasets"]
+    assert set(card) == {"id", "title", "authors"}
+    assert card["title"] == "Sample dataset 4"
+
+
+def test_all_fields_by_default(test_client, test_database_poblated):
+    response = test_client.post("/explore", json={"query": "file10"})
+
+    assert set(response.get_json()["datasets"][0]) == set(CARD_FIELDS)
+
+
+def test_unknown_fields_are_rejected(test_client, test_database_poblated):
+    response = test_client.post("/explore", json={"fields": "title,files"})
+
+    assert response.status_code == 400
+    assert "files" in response.get_json()["message"]
+
+
+def test_only_the_needed_columns_are_selected(test_client, test_database_poblated):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        test_client.post("/explore", json={"fields": "title"})
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+    page_query = next(statement for statement in statements if "LIMIT" in statement)
+    assert "dataset_search_document.title" in page_query
+    assert "dataset_search_document.description" not in page_query
+    assert "dataset_search_document.authors" not in page_query
+
+
+def test_serializers_are_compiled_once_per_field_set():
+    assert card_serializer("title, id") is card_serializer(["title", "id"])
+    assert card_serializer("title").columns == ("title",)
+    assert card_serializer("url,download").columns == ("dataset_doi", "data_set_id")
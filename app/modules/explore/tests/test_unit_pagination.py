@@ -0,0 +1,74 @@
+"""
+Unit tests for the keyset pagination of Explore results.
+"""
+
+import pytest
+
+from app import db
+from app.modules.dataset.models import DataSet, DSMetaData
+from app.modules.explore.services import ExploreService
+
+
+def _walk(service, **criteria):
+    ids, cursor = [], None
+    while True:
+        page = service.filter_page(cursor=cursor, **criteria)
+        ids += [dataset.id for dataset in page["datasets"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def _published_ids(newest_first=True):
+    order = (DataSet.created_at.desc(), DataSet.id.desc()) if newest_first else (DataSet.created_at, DataSet.id)
+    datasets = db.session.query(DataSet).join(DSMetaData).filter(DSMetaData.dataset_doi.isnot(None)).order_by(*order)
+    return [dataset.id for dataset in datasets]
+
+
+@pytest.mark.parametrize("sorting", ["newest", "oldest"])
+def test_pages_cover_every_dataset_once(test_database_poblated, sorting):
+    assert _walk(ExploreService(), sorting=sorting, limit=1) == _published_ids(newest_first=sorting == "newest")
+
+
+def test_relevance_pages_follow_the_ranking(test_database_poblated):
+    service = ExploreService()
+    ranked = [document.data_set_id for document in service.filter_page("dataset", sorting="relevance")["datasets"]]
+
+    assert _walk(service, query="dataset", sorting="relevance", limit=3) == ranked
+
+
+def test_first_page_reports_the_total(test_database_poblated):
+    page = ExploreService().filter_page(limit=1)
+
+    assert len(page["datasets"]) == 1
+    assert (page["total"], page["total_is_estimate"]) == (len(_published_ids()), False)
+    assert ExploreService().filter_page(cursor=page["next_cursor"], limit=1)["total"] is None
+
+
+def test_total_is_capped(test_app, test_database_poblated):
+    previous = test_app.config["EXPLORE_COUNT_LIMIT"]
+    test_app.config["EXPLORE_COUNT_LIMIT"] = 2
+    try:
+        page = ExploreService().filter_page(limit=1)
+    finally:
+        test_app.config["EXPLORE_COUNT_LIMIT"] = previous
+
+    assert (page["total"], page["total_is_estimate"]) == (2, True)
+
+
+def test_page_size_is_capped(test_app, test_database_poblated):
+    previous = test_app.config["EXPLORE_MAX_PAGE_SIZE"]
+    test_app.config["EXPLORE_MAX_PAGE_SIZE"] = 2
+    try:
+        page = ExploreService().filter_page(limit=500)
+    finally:
+        test_app.config["EXPLORE_MAX_PAGE_SIZE"] = previous
+
+    assert len(page["datasets"]) == 2
+    assert page["next_cursor"] is not None
+
+
+def test_invalid_cursor_is_rejected(test_client, test_database_poblated):
+    response = test_client.post("/explore", json={"cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
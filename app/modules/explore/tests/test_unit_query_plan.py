@@ -0,0 +1,105 @@
+"""
+Query-plan regression tests for Explore: child tables are only reached through semi-joins (searches
+now read the search documents alone), and every kind of dataset is searchable.
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from app import db
+from app.modules.audiodataset.models import Audio, AudioDataset, AudioMetaData
+from app.modules.auth.models import User
+from app.modules.dataset.models import DSMetaData, PublicationType
+from app.modules.explore.models import DataSetSearchDocument
+from app.modules.explore.repositories import ExploreRepository
+from app.modules.explore.services import ExploreService
+from app.modules.imagedataset.models import Image, ImageDataset, ImageMetaData
+
+CHILD_TABLES = ("author", "feature_model", "fm_meta_data", "image", "image_meta_data", "audio", "audio_meta_data")
+METADATA_TABLES = ("data_set", "ds_meta_data") + CHILD_TABLES
+
+
+def _add_dataset(dataset_class, child_class, child_meta_data_class, title, doi, filename, child_title):
+    user = User.query.filter_by(email="user1@example.com").first()
+    ds_meta_data = DSMetaData(
+        title=title, description=title, publication_type=PublicationType.OTHER, dataset_doi=doi, tags="media"
+    )
+    db.session.add(ds_meta_data)
+    db.session.flush()
+    dataset = dataset_class(user_id=user.id, ds_meta_data_id=ds_meta_data.id, created_at=datetime.now(timezone.utc))
+    db.session.add(dataset)
+    db.session.flush()
+    child_meta_data = child_meta_data_class(
+        filename=filename, title=child_title, description=child_title, publication_type=PublicationType.NONE
+    )
+    db.session.add(child_meta_data)
+    db.session.flush()
+    meta_data_key = "image_meta_data_id" if child_class is Image else "audio_meta_data_id"
+    db.session.add(child_class(data_set_id=dataset.id, **{meta_data_key: child_meta_data.id}))
+    db.session.commit()
+    ExploreRepository().index_dataset(dataset)
+
+
+@pytest.fixture
+def mixed_catalogue(test_database_poblated):
+    _add_dataset(ImageDataset, Image, ImageMetaData, "Landscape photographs", "10.1234/images1", "glacier.png", "Ice")
+    _add_dataset(AudioDataset, Audio, AudioMetaData, "Groove pack", "10.1234/audio1", "groove.mp3", "Sneaky latin")
+    yield
+
+
+@pytest.fixture(params=["full_text", "fallback"])
+def search_path(request, monkeypatch):
+    if request.param == "fallback":
+        monkeypatch.setattr(ExploreRepository, "_match_subquery", lambda self, terms: None)
+    return request.param
+
+
+def _plan(query):
+    statement = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True})
+    return db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}").fetchall()
+
+
+def _tables_outside_subqueries(plan, tables=CHILD_TABLES):
+    details = {row[0]: (row[1], row[3]) for row in plan}
+
+    def inside_subquery(node_id):
+        while node_id in details:
+            parent, detail = details[node_id]
+            if "SUBQUERY" in detail:
+                return True
+            node_id = parent
+        return False
+
+    return {
+        table
+        for node_id, (_, detail) in details.items()
+        for table in tables
+        if f" {table} " in f" {detail} " and not inside_subquery(node_id)
+    }
+
+
+def test_every_dataset_type_is_searchable(mixed_catalogue, search_path):
+    service = ExploreService()
+
+    def titles(query):
+        return [document.title for document in service.filter_page(query)["datasets"]]
+
+    assert titles("glacier") == ["Landscape photographs"]
+    assert titles("latin") == ["Groove pack"]
+    assert "Sample dataset 4" in titles("file10")
+
+
+def test_child_tables_are_only_semi_joined(mixed_catalogue, search_path):
+    datasets, _, _ = ExploreRepository()._filtered_query("sample latin glacier author", "any", [])
+
+    assert _tables_outside_subqueries(_plan(datasets)) == set()
+
+    rows = db.session.execute(datasets.with_entities(DataSetSearchDocument.data_set_id).statement).fetchall()
+    assert len(rows) == len(set(rows))
+
+
+def test_search_reads_only_the_search_documents(mixed_catalogue, search_path):
+    documents, _, _ = ExploreRepository()._filtered_query("sample latin glacier author", "any", ["media"])
+
+    assert _tables_outside_subqueries(_plan(documents), METADATA_TABLES) == set()
@@ -0,0 +1,112 @@
+"""
+Unit tests for the Explore result cache and its invalidation.
+"""
+
+import time
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.modules.dataset.models import DSMetaData
+from app.modules.dataset.services import DataSetService
+from app.modules.explore.services import ExploreService
+from core.managers.cache_manager import LRUCache, bump_namespace_version, namespace_version
+
+
+@pytest.fixture
+def cache(test_app):
+    previous = test_app.extensions["cache"]
+    test_app.extensions["cache"] = LRUCache()
+    # Serialised datasets carry absolute URLs, so searches run inside a request
+    with test_app.test_request_context():
+        yield test_app.extensions["cache"]
+    test_app.extensions["cache"] = previous
+
+
+@pytest.fixture
+def query_counter():
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    yield statements
+    event.remove(db.engine, "before_cursor_execute", count)
+
+
+def test_repeated_search_is_served_from_cache(test_database_poblated, cache, query_counter):
+    service = ExploreService()
+    first = service.search(query="Sample", facets=True)
+    query_counter.clear()
+
+    second = service.search(query="Sample", facets=True)
+
+    assert second == first
+    assert query_counter == []
+
+
+def test_equivalent_criteria_share_an_entry(test_database_poblated, cache, query_counter):
+    service = ExploreService()
+    service.search(query="Sample  Dataset", tags=["Tag1", "tag2"])
+    query_counter.clear()
+
+    service.search(query="sample dataset", tags=["tag2", "TAG1"])
+
+    assert query_counter == []
+
+
+def test_equivalent_page_sizes_share_an_entry(test_database_poblated, cache, query_counter):
+    service = ExploreService()
+    service.search(query="Sample", limit=None)
+    query_counter.clear()
+
+    service.search(query="Sample", limit="20")
+    service.search(query="Sample", limit=20)
+
+    assert query_counter == []
+
+
+def test_namespace_versions_are_shared_by_workers(test_app, cache, tmp_path, monkeypatch):
+    monkeypatch.setitem(test_app.config, "CACHE_VERSION_DIR", str(tmp_path))
+    version = namespace_version("explore")
+    assert namespace_version("explore") == version
+
+    # Another worker has a cache of its own but the same version file
+    test_app.extensions["cache"] = LRUCache()
+    bump_namespace_version("explore")
+
+    test_app.extensions["cache"] = cache
+    assert namespace_version("explore") > version
+
+
+def test_metadata_update_invalidates_cached_pages(test_database_poblated, cache):
+    service = ExploreService()
+    assert service.search(query="refreshed")["total"] == 0
+
+    dataset_meta_data = db.session.query(DSMetaData).filter(DSMetaData.title == "Sample dataset 1").one()
+    DataSetService().update_dsmetadata(dataset_meta_data.id, title="Refreshed dataset")
+
+    assert service.search(query="refreshed")["total"] == 1
+
+
+def test_lru_cache_evicts_least_recently_used():
+    lru = LRUCache(threshold=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+
+    assert lru.get("a") == 1
+    assert lru.get("b") is None
+    assert lru.get("c") == 3
+
+
+def test_lru_cache_expires_entries(monkeypatch):
+    lru = LRUCache()
+    lru.set("a", 1, timeout=10)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+
+    assert lru.get("a") is None
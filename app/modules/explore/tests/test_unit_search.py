@@ -0,0 +1,61 @@
+"""
+Unit tests for the Explore full-text search index.
+"""
+
+from app import db
+from app.modules.dataset.models import DataSet, DSMetaData
+from app.modules.explore.models import DataSetSearchDocument
+from app.modules.explore.repositories import normalize_search_text, search_terms
+from app.modules.explore.services import ExploreService
+
+
+def _titles(documents):
+    return [document.title for document in documents]
+
+
+def test_normalization_strips_accents_and_punctuation():
+    assert normalize_search_text("Canción, ¿Música?") == "cancion musica"
+    assert search_terms("Feature-Model (v2)") == ["feature", "model", "v2"]
+
+
+def test_seeded_datasets_are_indexed(test_database_poblated):
+    published = db.session.query(DataSet).join(DSMetaData).filter(DSMetaData.dataset_doi.isnot(None))
+    assert db.session.query(DataSetSearchDocument).count() == published.count()
+
+
+def test_search_matches_metadata_authors_and_feature_models(test_database_poblated):
+    service = ExploreService()
+
+    assert _titles(service.filter_page("sample dataset 3")["datasets"]) != []
+    assert "Sample dataset 1" in _titles(service.filter_page("affiliation 1")["datasets"])
+    # file10.uvl belongs to the fourth dataset (three feature models per dataset)
+    assert _titles(service.filter_page("file10")["datasets"]) == ["Sample dataset 4"]
+    assert service.filter_page("nonexistentword")["datasets"] == []
+
+
+def test_search_is_ranked_by_relevance(test_database_poblated):
+    results = ExploreService().filter_page("dataset 2", sorting="relevance")["datasets"]
+    assert _titles(results)[0] == "Sample dataset 2"
+
+
+def test_index_follows_metadata_updates(test_database_poblated):
+    from app.modules.dataset.services import DataSetService
+
+    dataset = db.session.query(DataSet).join(DSMetaData).filter(DSMetaData.title == "Sample dataset 1").one()
+    DataSetService().update_dsmetadata(dataset.ds_meta_data_id, title="Orchestral harmonies")
+
+    assert _titles(ExploreService().filter_page("harmonies")["datasets"]) == ["Orchestral harmonies"]
+
+
+def test_explore_endpoint_uses_the_index(test_client, test_database_poblated):
+    response = test_client.post("/explore", json={"query": "file10", "sorting": "relevance"})
+
+    assert response.status_code == 200
+    assert [dataset["title"] for dataset in response.get_json()["datasets"]] == ["Sample dataset 4"]
+
+
+def test_fallback_without_full_text_index(test_database_poblated, monkeypatch):
+    service = ExploreService()
+    monkeypatch.setattr(service.repository, "_match_subquery", lambda terms: None)
+
+    assert _titles(service.filter_page("file10")["datasets"]) == ["Sample dataset 4"]
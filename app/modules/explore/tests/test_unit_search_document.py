@@ -0,0 +1,76 @@
+"""
+Unit tests for the denormalized search documents Explore reads published datasets from.
+"""
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.modules.dataset.models import DataSet, DSMetaData
+from app.modules.dataset.services import DataSetService
+from app.modules.explore.models import DataSetSearchDocument
+from app.modules.explore.services import ExploreService
+from app.modules.hubfile.models import Hubfile
+
+
+@pytest.fixture
+def dataset(test_database_poblated):
+    return db.session.query(DataSet).join(DSMetaData).filter(DSMetaData.title == "Sample dataset 1").one()
+
+
+def _document(dataset_id):
+    db.session.expire_all()
+    return db.session.get(DataSetSearchDocument, dataset_id)
+
+
+def test_only_published_datasets_have_a_document(dataset):
+    doi = dataset.ds_meta_data.dataset_doi
+
+    DataSetService().update_dsmetadata(dataset.ds_meta_data_id, dataset_doi=None)
+    assert _document(dataset.id) is None
+
+    DataSetService().update_dsmetadata(dataset.ds_meta_data_id, dataset_doi=doi)
+    assert _document(dataset.id).dataset_doi == doi
+
+
+def test_document_follows_file_and_download_writes(dataset):
+    before = _document(dataset.id)
+    files_count, total_size, downloads = before.files_count, before.total_size, before.download_count
+
+    db.session.add(
+        Hubfile(name="extra.uvl", checksum="0" * 32, size=100, dataset_id=dataset.id, user_id=dataset.user_id)
+    )
+    db.session.commit()
+    DataSetService().increment_download_count(dataset.id)
+
+    after = _document(dataset.id)
+    assert (after.files_count, after.total_size) == (files_count + 1, total_size + 100)
+    assert after.download_count == downloads + 1
+
+
+def test_cards_are_served_from_the_document_alone(test_app, dataset):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with test_app.test_request_context():
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            cards = [document.to_dict() for document in ExploreService().filter_page(query="sample")["datasets"]]
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+
+    card = next(card for card in cards if card["id"] == dataset.id)
+    assert card["title"] == "Sample dataset 1"
+    assert card["authors"][0]["name"] == "Author 1"
+    assert card["total_size_in_bytes"] == dataset.total_size
+    assert not any(" ds_meta_data" in statement or " author" in statement for statement in statements)
+
+
+def test_rebuild_restores_the_documents(dataset):
+    db.session.query(DataSetSearchDocument).delete()
+    db.session.commit()
+
+    assert ExploreService().rebuild_search_index() == 4
+    assert _document(dataset.id).title == "Sample dataset 1"
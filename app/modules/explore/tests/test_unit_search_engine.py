@@ -0,0 +1,91 @@
+"""
+Unit tests for the in-process BM25 search engine.
+"""
+
+import pytest
+
+from app import db
+from app.modules.dataset.models import DataSet, DSMetaData
+from app.modules.explore.services import ExploreService
+from core.search.inverted_index import InvertedIndex
+
+
+@pytest.fixture
+def memory_search(test_app, tmp_path):
+    previous = test_app.config["SEARCH_ENGINE"], test_app.config["SEARCH_SNAPSHOT_PATH"]
+    test_app.config["SEARCH_ENGINE"] = "memory"
+    test_app.config["SEARCH_SNAPSHOT_PATH"] = str(tmp_path / "explore.idx")
+    test_app.extensions.pop("search_engine", None)
+    yield tmp_path / "explore.idx"
+    test_app.config["SEARCH_ENGINE"], test_app.config["SEARCH_SNAPSHOT_PATH"] = previous
+    test_app.extensions.pop("search_engine", None)
+
+
+def test_bm25_prefers_rarer_and_denser_matches():
+    index = InvertedIndex()
+    index.add(1, "guitar loops for rock".split())
+    index.add(2, "guitar guitar solo".split())
+    index.add(3, "piano loops".split())
+
+    assert [doc_id for doc_id, _ in index.search(["guitar"])] == [2, 1]
+    assert index.search(["solo"])[0][0] == 2
+    assert index.search(["drums"]) == []
+
+
+def test_prefix_matching_can_be_disabled():
+    index = InvertedIndex()
+    index.add(1, ["orchestral"])
+
+    assert index.search(["orch"]) != []
+    assert index.search(["orch"], prefix=False) == []
+
+
+def test_updates_replace_previous_versions():
+    index = InvertedIndex()
+    index.add(1, ["old", "title"])
+    index.add(1, ["new", "title"])
+    index.add(2, ["other"])
+    index.remove(2)
+
+    assert index.search(["old"]) == []
+    assert [doc_id for doc_id, _ in index.search(["new"])] == [1]
+    assert len(index) == 1
+
+    index.compact()
+    assert [doc_id for doc_id, _ in index.search(["title"])] == [1]
+
+
+def test_snapshot_round_trip(tmp_path):
+    index = InvertedIndex()
+    index.add(7, ["feature", "model"])
+    index.add(8, ["feature", "audio"])
+    path = str(tmp_path / "snapshot.idx")
+    index.save(path)
+
+    loaded = InvertedIndex.load(path)
+
+    assert loaded.search(["feature", "audio"]) == index.search(["feature", "audio"])
+    assert not loaded.is_stale(path)
+    assert InvertedIndex.load(str(tmp_path / "missing.idx")) is None
+
+
+def test_explore_is_served_from_the_memory_index(test_database_poblated, memory_search):
+    service = ExploreService()
+
+    results = service.filter_page("file10", sorting="relevance")["datasets"]
+
+    assert [document.title for document in results] == ["Sample dataset 4"]
+    assert memory_search.exists()
+
+
+def test_memory_index_follows_updates(test_database_poblated, memory_search):
+    from app.modules.dataset.services import DataSetService
+
+    service = ExploreService()
+    assert service.filter_page("harmonies")["datasets"] == []
+
+    dataset = db.session.query(DataSet).join(DSMetaData).filter(DSMetaData.title == "Sample dataset 2").one()
+    DataSetService().update_dsmetadata(dataset.ds_meta_data_id, title="Orchestral harmonies")
+
+    assert [document.title for document in service.filter_page("harmonies")["datasets"]] == ["Orchestral harmonies"]
+    assert InvertedIndex.load(str(memory_search)).search(["harmonies"])[0][0] == dataset.id
@@ -0,0 +1,110 @@
+"""
+Unit tests for the Explore typeahead suggestions.
+"""
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.modules.dataset.models import DataSet, DSMetaData
+from app.modules.dataset.services import DataSetService
+from app.modules.explore.repositories import CACHE_NAMESPACE
+from core.managers.cache_manager import bump_namespace_version
+from core.search.prefix_index import PrefixIndex
+
+
+@pytest.fixture
+def suggest_index(test_app):
+    test_app.extensions.pop("suggest_index", None)
+    yield
+    test_app.extensions.pop("suggest_index", None)
+
+
+def test_completions_match_word_starts_and_rank_by_weight():
+    index = PrefixIndex()
+    index.add(1, [("title", "Rock guitar loops"), ("tag", "rock")], weight=1)
+    index.add(2, [("title", "Classic rock anthems"), ("tag", "rock")], weight=10)
+
+    assert [s["text"] for s in index.complete("ro")] == ["rock", "Classic rock anthems", "Rock guitar loops"]
+    assert index.complete("gui") == [{"text": "Rock guitar loops", "kind": "title", "count": 1}]
+    assert index.complete("rock", limit=1)[0] == {"text": "rock", "kind": "tag", "count": 2}
+
+
+def test_removing_a_document_drops_its_suggestions():
+    index = PrefixIndex()
+    index.add(1, [("tag", "jazz")], weight=3)
+    index.add(2, [("tag", "jazz"), ("title", "Jam session")])
+    index.complete("ja")
+
+    index.remove(1)
+    assert index.complete("ja") == [
+        {"text": "jazz", "kind": "tag", "count": 1},
+        {"text": "Jam session", "kind": "title", "count": 1},
+    ]
+
+    index.remove(2)
+    assert index.complete("ja") == []
+
+
+def test_endpoint_covers_titles_tags_authors_and_files(test_database_poblated, suggest_index):
+    client = test_database_poblated
+
+    def kinds(prefix):
+        response = client.get("/explore/suggest", query_string={"q": prefix})
+        assert response.status_code == 200
+        return {(s["kind"], s["text"]) for s in response.json["suggestions"]}
+
+    assert ("title", "Sample dataset 1") in kinds("sample")
+    assert ("tag", "tag1") in kinds("tag")
+    assert ("author", "Author 1") in kinds("author")
+    assert ("file", "file10.uvl") in kinds("file1")
+
+
+def test_downloads_rank_suggestions(test_database_poblated, suggest_index):
+    popular = db.session.query(DataSet).join(DSMetaData).filter(DSMetaData.title == "Sample dataset 3").one()
+    popular.download_count = 50
+    db.session.commit()
+
+    response = test_database_poblated.get("/explore/suggest", query_string={"q": "sample", "limit": 2})
+
+    assert [s["text"] for s in response.json["suggestions"]][0] == "Sample dataset 3"
+    assert len(response.json["suggestions"]) == 2
+
+
+def test_publishing_updates_suggestions_without_queries(test_database_poblated, suggest_index):
+    client = test_database_poblated
+    client.get("/explore/suggest", query_string={"q": "sample"})
+
+    dataset_meta_data = db.session.query(DSMetaData).filter(DSMetaData.title == "Sample dataset 2").one()
+    DataSetService().update_dsmetadata(dataset_meta_data.id, title="Orchestral stems")
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    try:
+        response = client.get("/explore/suggest", query_string={"q": "orch"})
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count)
+
+    assert [s["text"] for s in response.json["suggestions"]] == ["Orchestral stems"]
+    assert statements == []
+
+
+def test_catalogue_changes_of_other_workers_rebuild_the_index(
+    test_app, test_database_poblated, suggest_index, tmp_path, monkeypatch
+):
+    monkeypatch.setitem(test_app.config, "CACHE_VERSION_DIR", str(tmp_path))
+    client = test_database_poblated
+    client.get("/explore/suggest", query_string={"q": "sample"})
+
+    # Another worker renames a dataset: the database and the shared version change, this index does not
+    dataset_meta_data = db.session.query(DSMetaData).filter(DSMetaData.title == "Sample dataset 2").one()
+    dataset_meta_data.title = "Orchestral stems"
+    db.session.commit()
+    bump_namespace_version(CACHE_NAMESPACE)
+
+    response = client.get("/explore/suggest", query_string={"q": "orch"})
+    assert [s["text"] for s in response.json["suggestions"]] == ["Orchestral stems"]
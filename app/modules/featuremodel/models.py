@@ -1,7 +1,7 @@
 from sqlalchemy import Enum as SQLAlchemyEnum
 
 from app import db
-from app.modules.dataset.models import Author, DataSet, PublicationType
+from app.modules.dataset.models import Author, DataSet, PublicationType, sync_tags, tag_association
 
 
 class UVLDataset(DataSet):
@@ -15,12 +15,6 @@ class UVLDataset(DataSet):
     def files(self):
         return [file for fm in self.feature_models for file in fm.files]
 
-    def get_files_count(self):
-        return sum(len(fm.files) for fm in self.feature_models)
-
-    def get_file_total_size(self):
-        return sum(file.size for fm in self.feature_models for file in fm.files)
-
 
 class FeatureModel(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -33,6 +27,9 @@ class FeatureModel(db.Model):
         return f"FeatureModel<{self.id}>"
 
 
+fm_meta_data_tag = tag_association("fm_meta_data")
+
+
 class FMMetaData(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     uvl_filename = db.Column(db.String(120), nullable=False)
@@ -41,6 +38,9 @@ class FMMetaData(db.Model):
     publication_type = db.Column(SQLAlchemyEnum(PublicationType), nullable=False)
     publication_doi = db.Column(db.String(120))
     tags = db.Column(db.String(120))
+    tag_list = db.relationship(
+        "Tag", secondary=fm_meta_data_tag, order_by=fm_meta_data_tag.c.position, lazy=True, viewonly=True
+    )
     uvl_version = db.Column(db.String(120))
     fm_metrics_id = db.Column(db.Integer, db.ForeignKey("fm_metrics.id"))
     fm_metrics = db.relationship("FMMetrics", uselist=False, backref="fm_meta_data")
@@ -52,6 +52,9 @@ class FMMetaData(db.Model):
         return f"FMMetaData<{self.title}"
 
 
+sync_tags(FMMetaData, fm_meta_data_tag)
+
+
 class FMMetrics(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     solver = db.Column(db.Text)
@@ -37,7 +37,8 @@ def check_uvl(file_id):
 
     try:
         hubfile = HubfileService().get_by_id(file_id)
-        input_stream = FileStream(hubfile.get_path())
+        with HubfileService().local_file_by_hubfile(hubfile) as file_path:
+            input_stream = FileStream(file_path)
         lexer = UVLCustomLexer(input_stream)
 
         error_listener = CustomErrorListener()
@@ -75,7 +76,8 @@ def to_glencoe(file_id):
     temp_file = tempfile.NamedTemporaryFile(suffix=".json", delete=False)
     try:
         hubfile = HubfileService().get_or_404(file_id)
-        fm = UVLReader(hubfile.get_path()).transform()
+        with HubfileService().local_file_by_hubfile(hubfile) as file_path:
+            fm = UVLReader(file_path).transform()
         GlencoeWriter(temp_file.name, fm).transform()
 
         # Return the file in the response
@@ -90,7 +92,8 @@ def to_splot(file_id):
     temp_file = tempfile.NamedTemporaryFile(suffix=".splx", delete=False)
     try:
         hubfile = HubfileService().get_by_id(file_id)
-        fm = UVLReader(hubfile.get_path()).transform()
+        with HubfileService().local_file_by_hubfile(hubfile) as file_path:
+            fm = UVLReader(file_path).transform()
         SPLOTWriter(temp_file.name, fm).transform()
 
         # Return the file in the response
@@ -105,7 +108,8 @@ def to_cnf(file_id):
     temp_file = tempfile.NamedTemporaryFile(suffix=".cnf", delete=False)
     try:
         hubfile = HubfileService().get_by_id(file_id)
-        fm = UVLReader(hubfile.get_path()).transform()
+        with HubfileService().local_file_by_hubfile(hubfile) as file_path:
+            fm = UVLReader(file_path).transform()
         sat = FmToPysat(fm).transform()
         DimacsWriter(temp_file.name, sat).transform()
 
@@ -1,10 +1,13 @@
 from datetime import datetime, timezone
 
 from flask import request
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
 
 from app import db
 from app.modules.auth.models import User
 from app.modules.dataset.models import DataSet
+from app.modules.explore.models import DataSetSearchDocument
 
 
 class Hubfile(db.Model):
@@ -12,10 +15,17 @@ class Hubfile(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
     checksum = db.Column(db.String(120), nullable=False)
-    size = db.Column(db.Integer, nullable=False)
+    # active_history keeps the previous size/dataset around so the dataset aggregates can be moved on update
+    size = db.column_property(db.Column(db.Integer, nullable=False), active_history=True)
     feature_model_id = db.Column(db.Integer, db.ForeignKey("feature_model.id"), nullable=True)
     image_id = db.Column(db.Integer, db.ForeignKey("image.id"), nullable=True)
     audio_id = db.Column(db.Integer, db.ForeignKey("audio.id"), nullable=True)
+    # Denormalized from the owning feature model / image / audio so the file can be located without joins
+    dataset_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="CASCADE"), nullable=True, index=True),
+        active_history=True,
+    )
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
 
     def get_formatted_size(self):
         from app.modules.dataset.services import SizeService
@@ -51,6 +61,60 @@ class Hubfile(db.Model):
         return f"File<{self.id}>"
 
 
+def _adjust_dataset_totals(connection, dataset_id, files, size):
+    if dataset_id is None:
+        return
+    # The search document of a published dataset repeats its totals for the Explore cards
+    for totals, key in ((DataSet.__table__, "id"), (DataSetSearchDocument.__table__, "data_set_id")):
+        connection.execute(
+            totals.update()
+            .where(totals.c[key] == dataset_id)
+            .values(files_count=totals.c.files_count + files, total_size=totals.c.total_size + size)
+        )
+
+
+@event.listens_for(Hubfile, "after_insert")
+def _count_inserted_file(mapper, connection, target):
+    _adjust_dataset_totals(connection, target.dataset_id, 1, target.size or 0)
+
+
+@event.listens_for(Hubfile, "before_delete")
+def _count_deleted_file(mapper, connection, target):
+    _adjust_dataset_totals(connection, target.dataset_id, -1, -(target.size or 0))
+
+
+@event.listens_for(Hubfile, "after_update")
+def _count_moved_or_resized_file(mapper, connection, target):
+    state = inspect(target)
+    dataset_history, size_history = state.attrs.dataset_id.history, state.attrs.size.history
+    if not dataset_history.has_changes() and not size_history.has_changes():
+        return
+    old_dataset_id = dataset_history.deleted[0] if dataset_history.deleted else target.dataset_id
+    old_size = size_history.deleted[0] if size_history.deleted else target.size
+    _adjust_dataset_totals(connection, old_dataset_id, -1, -(old_size or 0))
+    _adjust_dataset_totals(connection, target.dataset_id, 1, target.size or 0)
+
+
+@event.listens_for(Hubfile, "after_update")
+@event.listens_for(Hubfile, "after_delete")
+def _mark_file_metadata_stale(mapper, connection, target):
+    # Invalidated once committed: before that, a concurrent request could cache the old row again
+    object_session(target).info["file_metadata_stale"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_file_metadata(session):
+    if session.info.pop("file_metadata_stale", False):
+        from app.modules.hubfile.services import HubfileService
+
+        HubfileService().invalidate_file_metadata()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_file_metadata_changes(session):
+    session.info.pop("file_metadata_stale", None)
+
+
 class HubfileViewRecord(db.Model):
     __tablename__ = "file_view_record"
     id = db.Column(db.Integer, primary_key=True)
@@ -58,6 +122,10 @@ class HubfileViewRecord(db.Model):
     file_id = db.Column(db.Integer, db.ForeignKey("file.id"), nullable=False)
     view_date = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     view_cookie = db.Column(db.String(36))
+    # user_id with anonymous visitors as 0, so that they are covered by the unique key too
+    user_key = db.Column(db.Integer, db.Computed("coalesce(user_id, 0)", persisted=True))
+
+    __table_args__ = (db.UniqueConstraint("file_id", "user_key", "view_cookie", name="uq_file_view_record_visitor"),)
 
     def __repr__(self):
         return "<FileViewRecord {}>".format(self.id)
@@ -70,6 +138,11 @@ class HubfileDownloadRecord(db.Model):
     file_id = db.Column(db.Integer, db.ForeignKey("file.id"))
     download_date = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
     download_cookie = db.Column(db.String(36), nullable=False)
+    user_key = db.Column(db.Integer, db.Computed("coalesce(user_id, 0)", persisted=True))
+
+    __table_args__ = (
+        db.UniqueConstraint("file_id", "user_key", "download_cookie", name="uq_file_download_record_visitor"),
+    )
 
     def __repr__(self):
         return (
@@ -78,3 +151,49 @@ class HubfileDownloadRecord(db.Model):
             f"date={self.download_date} "
             f"cookie={self.download_cookie}>"
         )
+
+
+class HubfileDailyStats(db.Model):
+    """Views and downloads of a file per day, counted as the records are inserted"""
+
+    __tablename__ = "file_daily_stats"
+
+    file_id = db.Column(db.Integer, db.ForeignKey("file.id", ondelete="CASCADE"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    views = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    downloads = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (db.Index("ix_file_daily_stats_day", "day"),)
+
+    def __repr__(self):
+        return f"HubfileDailyStats<{self.file_id} {self.day}>"
+
+
+class HubfileDailySketch(db.Model):
+    """HyperLogLog sketches of the distinct visitors that viewed and downloaded a file on a day"""
+
+    __tablename__ = "file_daily_sketch"
+
+    file_id = db.Column(db.Integer, db.ForeignKey("file.id", ondelete="CASCADE"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    views = db.Column(db.LargeBinary)
+    downloads = db.Column(db.LargeBinary)
+
+    __table_args__ = (db.Index("ix_file_daily_sketch_day", "day"),)
+
+    def __repr__(self):
+        return f"HubfileDailySketch<{self.file_id} {self.day}>"
+
+
+class HubfileMonthlySketch(db.Model):
+    """The daily sketches of a file merged per month, so all-time counts read one row per month"""
+
+    __tablename__ = "file_monthly_sketch"
+
+    file_id = db.Column(db.Integer, db.ForeignKey("file.id", ondelete="CASCADE"), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)
+    views = db.Column(db.LargeBinary)
+    downloads = db.Column(db.LargeBinary)
+
+    def __repr__(self):
+        return f"HubfileMonthlySketch<{self.file_id} {self.month}>"
@@ -1,11 +1,24 @@
+from typing import List
+
 from sqlalchemy import func
 
 from app import db
 from app.modules.auth.models import User
 from app.modules.dataset.models import DataSet
 from app.modules.featuremodel.models import FeatureModel
-from app.modules.hubfile.models import Hubfile, HubfileDownloadRecord, HubfileViewRecord
+from app.modules.hubfile.models import (
+    Hubfile,
+    HubfileDailySketch,
+    HubfileDailyStats,
+    HubfileDownloadRecord,
+    HubfileMonthlySketch,
+    HubfileViewRecord,
+)
+from core.analytics.records import count_daily, store_events
+from core.analytics.sketches import distinct_visitors
+from core.analytics.writer import register_event_writer
 from core.repositories.BaseRepository import BaseRepository
+from core.repositories.counters import daily_counts
 
 
 class HubfileRepository(BaseRepository):
@@ -13,6 +26,8 @@ class HubfileRepository(BaseRepository):
         super().__init__(Hubfile)
 
     def get_owner_user_by_hubfile(self, hubfile: Hubfile) -> User:
+        if hubfile.user_id is not None:
+            return db.session.get(User, hubfile.user_id)
         if hubfile.feature_model_id:
             return (
                 db.session.query(User)
@@ -48,7 +63,12 @@ class HubfileRepository(BaseRepository):
             )
         return None
 
+    def get_by_checksum(self, checksum: str, limit: int = 20):
+        return Hubfile.query.filter(Hubfile.checksum == checksum.lower()).limit(limit).all()
+
     def get_dataset_by_hubfile(self, hubfile: Hubfile) -> DataSet:
+        if hubfile.dataset_id is not None:
+            return db.session.get(DataSet, hubfile.dataset_id)
         if hubfile.feature_model_id:
             return db.session.query(DataSet).join(FeatureModel).join(Hubfile).filter(Hubfile.id == hubfile.id).first()
         elif hubfile.image_id:
@@ -81,8 +101,21 @@ class HubfileViewRecordRepository(BaseRepository):
         super().__init__(HubfileViewRecord)
 
     def total_hubfile_views(self) -> int:
-        max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
-        return max_id if max_id is not None else 0
+        return self.session.query(func.coalesce(func.sum(HubfileDailyStats.views), 0)).scalar()
+
+    def write_events(self, events: List[dict]):
+        """Store a batch of view events, counting the new ones into the rollups"""
+        inserted = store_events(
+            self.session,
+            events,
+            HubfileViewRecord,
+            (HubfileDailySketch, HubfileMonthlySketch),
+            "file_id",
+            "view_date",
+            "view_cookie",
+            "views",
+        )
+        count_daily(self.session, HubfileDailyStats.__table__, "file_id", inserted, "views")
 
 
 class HubfileDownloadRecordRepository(BaseRepository):
@@ -90,5 +123,51 @@ class HubfileDownloadRecordRepository(BaseRepository):
         super().__init__(HubfileDownloadRecord)
 
     def total_hubfile_downloads(self) -> int:
-        max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
-        return max_id if max_id is not None else 0
+        return self.session.query(func.coalesce(func.sum(HubfileDailyStats.downloads), 0)).scalar()
+
+    def write_events(self, events: List[dict]):
+        """Store a batch of download events, counting the new ones into the rollups"""
+        inserted = store_events(
+            self.session,
+            events,
+            HubfileDownloadRecord,
+            (HubfileDailySketch, HubfileMonthlySketch),
+            "file_id",
+            "download_date",
+            "download_cookie",
+            "downloads",
+        )
+        count_daily(self.session, HubfileDailyStats.__table__, "file_id", inserted, "downloads")
+
+
+class HubfileDailySketchRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(HubfileDailySketch)
+
+    def distinct_visitors(self, file_ids, periods) -> dict:
+        """Distinct viewers and downloaders per file and period, merged from the daily and monthly sketches"""
+        return distinct_visitors(self.session, (HubfileDailySketch, HubfileMonthlySketch), "file_id", file_ids, periods)
+
+
+class HubfileDailyStatsRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(HubfileDailyStats)
+
+    def rebuild(self) -> int:
+        """Recount every day from the raw view and download records; returns the number of rollup rows"""
+        views = daily_counts(self.session, HubfileViewRecord.file_id, HubfileViewRecord.view_date)
+        downloads = daily_counts(self.session, HubfileDownloadRecord.file_id, HubfileDownloadRecord.download_date)
+
+        self.session.query(HubfileDailyStats).delete(synchronize_session=False)
+        rows = [
+            {"file_id": file_id, "day": day, "views": views.get(key, 0), "downloads": downloads.get(key, 0)}
+            for key in views.keys() | downloads.keys()
+            for file_id, day in [key]
+        ]
+        self.session.bulk_insert_mappings(HubfileDailyStats, rows)
+        self.session.commit()
+        return len(rows)
+
+
+register_event_writer("file_view", lambda events: HubfileViewRecordRepository().write_events(events))
+register_event_writer("file_download", lambda events: HubfileDownloadRecordRepository().write_events(events))
@@ -1,4 +1,4 @@
-import os
+from typing import Dict, Iterable, Optional, Tuple
 
 from flask import current_app
 
@@ -6,11 +6,19 @@ from app.modules.auth.models import User
 from app.modules.dataset.models import DataSet
 from app.modules.hubfile.models import Hubfile
 from app.modules.hubfile.repositories import (
+    HubfileDailySketchRepository,
+    HubfileDailyStatsRepository,
     HubfileDownloadRecordRepository,
     HubfileRepository,
     HubfileViewRecordRepository,
 )
+from core.analytics.sketches import PERIODS
+from core.managers.analytics_manager import get_analytics
+from core.managers.cache_manager import bump_namespace_version, get_cache, namespace_version
 from core.services.BaseService import BaseService
+from core.storage.backends import get_storage
+
+CACHE_NAMESPACE = "hubfile"
 
 
 class HubfileService(BaseService):
@@ -25,18 +33,60 @@ class HubfileService(BaseService):
     def get_dataset_by_hubfile(self, hubfile: Hubfile) -> DataSet:
         return self.repository.get_dataset_by_hubfile(hubfile)
 
-    def get_path_by_hubfile(self, hubfile: Hubfile) -> str:
-
-        hubfile_user = self.get_owner_user_by_hubfile(hubfile)
+    def get_location_by_hubfile(self, hubfile: Hubfile) -> Tuple[int, int]:
+        """(user_id, dataset_id) of the file, from its denormalized columns when they are filled in"""
+        if hubfile.dataset_id is not None and hubfile.user_id is not None:
+            return hubfile.user_id, hubfile.dataset_id
         hubfile_dataset = self.get_dataset_by_hubfile(hubfile)
-        # Default to parent directory of app if WORKING_DIR is not set
-        working_dir = os.getenv("WORKING_DIR") or os.path.dirname(current_app.root_path)
+        return hubfile_dataset.user_id, hubfile_dataset.id
+
+    @staticmethod
+    def get_storage_key(user_id: int, dataset_id: int, name: str) -> str:
+        """Key of a dataset file in the storage backend"""
+        return f"user_{user_id}/dataset_{dataset_id}/{name}"
+
+    def get_storage_key_by_hubfile(self, hubfile: Hubfile) -> str:
+        user_id, dataset_id = self.get_location_by_hubfile(hubfile)
+        return self.get_storage_key(user_id, dataset_id, hubfile.name)
+
+    def get_file_metadata(self, file_id: int) -> Optional[dict]:
+        """
+        Read-through cache of what is needed to locate and serve a file, so that resolving it
+        costs no queries once cached. Entries go stale, in every worker, once a change to a Hubfile row
+        is committed.
+        """
+        cache = get_cache()
+        cache_key = f"{CACHE_NAMESPACE}:{namespace_version(CACHE_NAMESPACE)}:{file_id}"
+        metadata = cache.get(cache_key)
+        if metadata is None:
+            hubfile = self.repository.get_by_id(file_id)
+            if hubfile is None:
+                return None
+            user_id, dataset_id = self.get_location_by_hubfile(hubfile)
+            metadata = {
+                "id": hubfile.id,
+                "name": hubfile.name,
+                "checksum": hubfile.checksum,
+                "size": hubfile.size,
+                "dataset_id": dataset_id,
+                "user_id": user_id,
+            }
+            cache.set(cache_key, metadata)
+        return metadata
+
+    def invalidate_file_metadata(self):
+        bump_namespace_version(CACHE_NAMESPACE)
+
+    def get_path_by_hubfile(self, hubfile: Hubfile) -> Optional[str]:
+        """Local filesystem path of the file, or None when the storage backend has no local paths"""
+        return get_storage().local_path(self.get_storage_key_by_hubfile(hubfile))
 
-        path = os.path.join(
-            working_dir, "uploads", f"user_{hubfile_user.id}", f"dataset_{hubfile_dataset.id}", hubfile.name
-        )
+    def open_hubfile(self, hubfile: Hubfile):
+        return get_storage().open(self.get_storage_key_by_hubfile(hubfile))
 
-        return os.path.abspath(path)
+    def local_file_by_hubfile(self, hubfile: Hubfile):
+        """Context manager yielding a local path to the file (a temp copy for remote backends)"""
+        return get_storage().local_file(self.get_storage_key_by_hubfile(hubfile))
 
     def total_hubfile_views(self) -> int:
         return self.hubfile_view_record_repository.total_hubfile_views()
@@ -45,7 +95,29 @@ class HubfileService(BaseService):
         hubfile_download_record_repository = HubfileDownloadRecordRepository()
         return hubfile_download_record_repository.total_hubfile_downloads()
 
+    def get_distinct_visitors(self, file_id: int, periods: Iterable[str] = PERIODS) -> Dict[str, Dict[str, int]]:
+        """Estimated distinct viewers and downloaders of a file per period: the last "week", "month" or "all" time"""
+        return HubfileDailySketchRepository().distinct_visitors([file_id], periods)[file_id]
+
+    def rebuild_daily_stats(self) -> int:
+        if not current_app.config["ANALYTICS_AUDIT_RECORDS"]:
+            raise ValueError(
+                "The daily stats can only be rebuilt from the per-visitor records (ANALYTICS_AUDIT_RECORDS)"
+            )
+        return HubfileDailyStatsRepository().rebuild()
+
 
 class HubfileDownloadRecordService(BaseService):
     def __init__(self):
         super().__init__(HubfileDownloadRecordRepository())
+
+    def record_download(self, file_id: int, user_id: Optional[int], user_cookie: str):
+        get_analytics().record("file_download", file_id, user_id, user_cookie)
+
+
+class HubfileViewRecordService(BaseService):
+    def __init__(self):
+        super().__init__(HubfileViewRecordRepository())
+
+    def record_view(self, file_id: int, user_id: Optional[int], user_cookie: str):
+        get_analytics().record("file_view", file_id, user_id, user_cookie)
@@ -0,0 +1,133 @@
+"""
+Unit tests for ETag, conditional GET and byte-range support on file-serving endpoints.
+"""
+
+import pytest
+from flask import Flask
+
+from app import db
+from app.modules.hubfile.models import Hubfile
+from core.delivery.file_delivery import parse_byte_ranges, send_file_conditional
+
+
+def test_parse_byte_ranges():
+    assert parse_byte_ranges(None, 100) is None
+    assert parse_byte_ranges("items=0-1", 100) is None
+    assert parse_byte_ranges("bytes=0-9", 100) == [(0, 10)]
+    assert parse_byte_ranges("bytes=90-", 100) == [(90, 100)]
+    assert parse_byte_ranges("bytes=-5", 100) == [(95, 100)]
+    assert parse_byte_ranges("bytes=0-4, 3-9, 50-59", 100) == [(0, 10), (50, 60)]
+    assert parse_byte_ranges("bytes=0-200", 100) == [(0, 100)]
+    assert parse_byte_ranges("bytes=100-200", 100) == []
+    assert parse_byte_ranges("bytes=5-1", 100) is None
+
+
+@pytest.fixture
+def sample_file(tmp_path):
+    path = tmp_path / "sample.mp3"
+    path.write_bytes(bytes(range(256)) * 4)
+    return str(path)
+
+
+@pytest.fixture
+def bare_app():
+    return Flask(__name__)
+
+
+def test_full_response_carries_strong_etag(bare_app, sample_file):
+    with bare_app.test_request_context("/"):
+        response = send_file_conditional(sample_file, etag="abc123")
+        response.direct_passthrough = False
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"abc123"'
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.mimetype == "audio/mpeg"
+
+
+def test_if_none_match_returns_304(bare_app, sample_file):
+    with bare_app.test_request_context("/", headers={"If-None-Match": '"abc123"'}):
+        response = send_file_conditional(sample_file, etag="abc123")
+
+    assert response.status_code == 304
+
+
+def test_single_range_returns_206(bare_app, sample_file):
+    with bare_app.test_request_context("/", headers={"Range": "bytes=10-19"}):
+        response = send_file_conditional(sample_file, etag="abc123")
+        body = response.get_data()
+
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == "bytes 10-19/1024"
+    assert body == bytes(range(10, 20))
+
+
+def test_multi_range_returns_multipart_byteranges(bare_app, sample_file):
+    with bare_app.test_request_context("/", headers={"Range": "bytes=0-3,-4"}):
+        response = send_file_conditional(sample_file, etag="abc123")
+        body = response.get_data()
+
+    assert response.status_code == 206
+    assert response.mimetype == "multipart/byteranges"
+    assert int(response.headers["Content-Length"]) == len(body)
+    assert b"Content-Range: bytes 0-3/1024\r\n\r\n\x00\x01\x02\x03\r\n" in body
+    assert b"Content-Range: bytes 1020-1023/1024\r\n\r\n\xfc\xfd\xfe\xff\r\n" in body
+
+
+def test_if_range_mismatch_sends_full_body(bare_app, sample_file):
+    with bare_app.test_request_context("/", headers={"Range": "bytes=0-3", "If-Range": '"stale"'}):
+        response = send_file_conditional(sample_file, etag="abc123")
+
+    assert response.status_code == 200
+
+
+def test_unsatisfiable_range_returns_416(bare_app, sample_file):
+    with bare_app.test_request_context("/", headers={"Range": "bytes=5000-"}):
+        response = send_file_conditional(sample_file, etag="abc123")
+
+    assert response.status_code == 416
+
+
+def test_hubfile_download_supports_etag_and_ranges(test_database_poblated):
+    client = test_database_poblated
+    hubfile = db.session.query(Hubfile).first()
+
+    full = client.get(f"/file/download/{hubfile.id}")
+    assert full.status_code == 200
+    assert full.headers["ETag"] == f'"{hubfile.checksum}"'
+
+    cached = client.get(f"/file/download/{hubfile.id}", headers={"If-None-Match": f'"{hubfile.checksum}"'})
+    assert cached.status_code == 304
+
+    partial = client.get(f"/file/download/{hubfile.id}", headers={"Range": "bytes=0-7"})
+    assert partial.status_code == 206
+    assert partial.get_data() == full.get_data()[:8]
+
+
+def test_hubfile_view_returns_304_for_known_etag(test_database_poblated):
+    client = test_database_poblated
+    hubfile = db.session.query(Hubfile).first()
+
+    first = client.get(f"/file/view/{hubfile.id}")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    second = client.get(f"/file/view/{hubfile.id}", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+
+
+def test_dataset_download_supports_etag_and_resume(test_database_poblated):
+    client = test_database_poblated
+    hubfile = db.session.query(Hubfile).first()
+    dataset = hubfile.get_dataset()
+
+    full = client.get(f"/dataset/download/{dataset.id}")
+    assert full.status_code == 200
+    etag = full.headers["ETag"]
+    body = full.get_data()
+
+    assert client.get(f"/dataset/download/{dataset.id}", headers={"If-None-Match": etag}).status_code == 304
+
+    resumed = client.get(f"/dataset/download/{dataset.id}", headers={"Range": "bytes=100-", "If-Range": etag})
+    assert resumed.status_code == 206
+    assert resumed.get_data() == body[100:]
@@ -0,0 +1,84 @@
+"""
+Unit tests for offloading file delivery to the front-end server.
+"""
+
+import os
+
+import pytest
+
+from app import db
+from app.modules.hubfile.models import Hubfile
+
+
+@pytest.fixture
+def delivery_mode(test_app):
+    previous = test_app.config["FILE_DELIVERY_MODE"]
+
+    def set_mode(mode):
+        test_app.config["FILE_DELIVERY_MODE"] = mode
+
+    yield set_mode
+    test_app.config["FILE_DELIVERY_MODE"] = previous
+
+
+def test_x_accel_redirect_points_at_internal_location(test_database_poblated, delivery_mode):
+    client = test_database_poblated
+    hubfile = db.session.query(Hubfile).first()
+    dataset = hubfile.get_dataset()
+    delivery_mode("x-accel")
+
+    response = client.get(f"/file/download/{hubfile.id}")
+
+    assert response.status_code == 200
+    assert response.headers["X-Accel-Redirect"] == (
+        f"/protected/uploads/user_{dataset.user_id}/dataset_{dataset.id}/{hubfile.name}"
+    )
+    assert response.get_data() == b""
+    assert hubfile.name in response.headers["Content-Disposition"]
+    assert "file_download_cookie" in response.headers.get("Set-Cookie", "")
+
+
+def test_x_accel_still_answers_conditional_requests(test_database_poblated, delivery_mode):
+    client = test_database_poblated
+    hubfile = db.session.query(Hubfile).first()
+    delivery_mode("x-accel")
+
+    response = client.get(f"/file/download/{hubfile.id}", headers={"If-None-Match": f'"{hubfile.checksum}"'})
+
+    assert response.status_code == 304
+    assert "X-Accel-Redirect" not in response.headers
+
+
+def test_x_sendfile_uses_absolute_path(test_database_poblated, delivery_mode):
+    client = test_database_poblated
+    hubfile = db.session.query(Hubfile).first()
+    delivery_mode("x-sendfile")
+
+    response = client.get(f"/file/download/{hubfile.id}")
+
+    assert response.status_code == 200
+    assert os.path.isabs(response.headers["X-Sendfile"])
+    assert response.headers["X-Sendfile"].endswith(hubfile.name)
+
+
+def test_dataset_download_is_offloaded_from_archive_cache(test_database_poblated, delivery_mode):
+    client = test_database_poblated
+    dataset = db.session.query(Hubfile).first().get_dataset()
+    delivery_mode("x-accel")
+
+    response = client.get(f"/dataset/download/{dataset.id}")
+
+    assert response.status_code == 200
+    assert response.headers["X-Accel-Redirect"].startswith(f"/protected/uploads/.archive_cache/dataset_{dataset.id}-")
+    assert response.mimetype == "application/zip"
+
+
+def test_app_mode_sends_bytes(test_database_poblated):
+    client = test_database_poblated
+    hubfile = db.session.query(Hubfile).first()
+
+    response = client.get(f"/file/download/{hubfile.id}")
+
+    assert response.status_code == 200
+    assert "X-Accel-Redirect" not in response.headers
+    assert len(response.get_data()) == hubfile.size
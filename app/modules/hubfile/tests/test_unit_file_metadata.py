@@ -0,0 +1,106 @@
+"""
+Unit tests for denormalized hubfile location and the file metadata cache.
+"""
+
+import pytest
+from cachelib import SimpleCache
+from sqlalchemy import event
+
+from app import db
+from app.modules.hubfile.models import Hubfile
+from app.modules.hubfile.services import HubfileService
+
+
+@pytest.fixture
+def metadata_cache(test_app):
+    previous = test_app.extensions["cache"]
+    test_app.extensions["cache"] = SimpleCache()
+    yield test_app.extensions["cache"]
+    test_app.extensions["cache"] = previous
+
+
+@pytest.fixture
+def query_counter():
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    yield statements
+    event.remove(db.engine, "before_cursor_execute", count)
+
+
+def test_seeded_files_carry_their_location(test_database_poblated):
+    for hubfile in db.session.query(Hubfile).all():
+        dataset = hubfile.get_dataset()
+        assert (hubfile.dataset_id, hubfile.user_id) == (dataset.id, dataset.user_id)
+
+
+def test_cached_path_resolution_runs_no_queries(test_database_poblated, metadata_cache, query_counter):
+    hubfile = db.session.query(Hubfile).first()
+    service = HubfileService()
+    expected = f"user_{hubfile.user_id}/dataset_{hubfile.dataset_id}/{hubfile.name}"
+    db.session.expunge_all()
+
+    metadata = service.get_file_metadata(hubfile.id)
+    assert service.get_storage_key(metadata["user_id"], metadata["dataset_id"], metadata["name"]) == expected
+    query_counter.clear()
+
+    metadata = service.get_file_metadata(hubfile.id)
+    assert service.get_storage_key(metadata["user_id"], metadata["dataset_id"], metadata["name"]) == expected
+    assert query_counter == []
+
+
+def test_metadata_is_invalidated_when_file_changes(test_database_poblated, metadata_cache):
+    hubfile = db.session.query(Hubfile).first()
+    service = HubfileService()
+    assert service.get_file_metadata(hubfile.id)["checksum"] == hubfile.checksum
+
+    hubfile.checksum = "0" * 32
+    db.session.commit()
+
+    assert service.get_file_metadata(hubfile.id)["checksum"] == "0" * 32
+
+
+def test_metadata_is_invalidated_only_once_committed(test_database_poblated, metadata_cache):
+    hubfile = db.session.query(Hubfile).first()
+    service = HubfileService()
+    checksum = service.get_file_metadata(hubfile.id)["checksum"]
+
+    hubfile.checksum = "0" * 32
+    db.session.flush()
+    assert service.get_file_metadata(hubfile.id)["checksum"] == checksum
+
+    db.session.rollback()
+    assert service.get_file_metadata(hubfile.id)["checksum"] == checksum
+
+
+def test_metadata_is_invalidated_in_every_worker(test_database_poblated, test_app, tmp_path, monkeypatch):
+    monkeypatch.setitem(test_app.config, "CACHE_VERSION_DIR", str(tmp_path))
+    workers = [SimpleCache(), SimpleCache()]
+    hubfile = db.session.query(Hubfile).first()
+    service = HubfileService()
+
+    test_app.extensions["cache"], previous = workers[0], test_app.extensions["cache"]
+    try:
+        assert service.get_file_metadata(hubfile.id)["checksum"] == hubfile.checksum
+
+        test_app.extensions["cache"] = workers[1]
+        hubfile.checksum = "0" * 32
+        db.session.commit()
+
+        test_app.extensions["cache"] = workers[0]
+        assert service.get_file_metadata(hubfile.id)["checksum"] == "0" * 32
+    finally:
+        test_app.extensions["cache"] = previous
+
+
+def test_rows_without_location_fall_back_to_joins(test_database_poblated):
+    hubfile = db.session.query(Hubfile).first()
+    expected = HubfileService().get_storage_key_by_hubfile(hubfile)
+    hubfile.dataset_id = hubfile.user_id = None
+    db.session.commit()
+
+    assert HubfileService().get_storage_key_by_hubfile(hubfile) == expected
+    assert HubfileService().get_file_metadata(hubfile.id)["dataset_id"] == hubfile.get_dataset().id
@@ -0,0 +1,115 @@
+"""
+Unit tests for the pluggable storage backends.
+"""
+
+import io
+import os
+import zipfile
+
+import pytest
+
+from app import db
+from app.modules.auth.seeders import AuthSeeder
+from app.modules.dataset.seeders import DataSetSeeder
+from app.modules.hubfile.models import Hubfile
+from core.storage.backends import LocalStorage, S3Storage, ShardedLocalStorage, get_storage
+from core.storage.blob_store import BlobStore
+
+BUCKET = "songhub-test"
+
+
+@pytest.fixture
+def s3_client():
+    moto = pytest.importorskip("moto")
+    boto3 = pytest.importorskip("boto3")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture(params=["local", "sharded", "s3"])
+def storage(request, tmp_path):
+    if request.param == "local":
+        return LocalStorage(str(tmp_path / "uploads"), BlobStore(str(tmp_path / "blobs")))
+    if request.param == "sharded":
+        return ShardedLocalStorage(str(tmp_path / "uploads"), BlobStore(str(tmp_path / "blobs")))
+    return S3Storage(BUCKET, prefix="uploads", client=request.getfixturevalue("s3_client"))
+
+
+def test_streaming_round_trip(storage, tmp_path):
+    content = os.urandom(200 * 1024)
+    storage.write("user_1/dataset_1/song.mp3", io.BytesIO(content))
+    source = tmp_path / "model.uvl"
+    source.write_bytes(b"features")
+    storage.put_file("user_1/dataset_1/model.uvl", str(source))
+
+    assert not source.exists()
+    assert storage.exists("user_1/dataset_1/song.mp3")
+    assert not storage.exists("user_1/dataset_1/missing.uvl")
+    assert storage.size("user_1/dataset_1/song.mp3") == len(content)
+    assert b"".join(storage.iter_chunks("user_1/dataset_1/song.mp3", chunk_size=4096)) == content
+    assert storage.list("user_1/dataset_1") == ["user_1/dataset_1/model.uvl", "user_1/dataset_1/song.mp3"]
+
+    with storage.local_file("user_1/dataset_1/model.uvl") as path:
+        with open(path, "rb") as f:
+            assert f.read() == b"features"
+
+    storage.delete("user_1/dataset_1/song.mp3")
+    assert not storage.exists("user_1/dataset_1/song.mp3")
+
+
+def test_keys_cannot_escape_the_root(storage):
+    with pytest.raises(ValueError):
+        storage.exists("user_1/../../etc/passwd")
+
+
+def test_sharded_layout_keeps_dataset_files_together(tmp_path):
+    storage = ShardedLocalStorage(str(tmp_path))
+    storage.write("user_1/dataset_1/a.uvl", io.BytesIO(b"a"))
+    storage.write("user_1/dataset_1/b.uvl", io.BytesIO(b"b"))
+    storage.write("user_1/dataset_2/a.uvl", io.BytesIO(b"a"))
+
+    first, second = storage.local_path("user_1/dataset_1/a.uvl"), storage.local_path("user_1/dataset_1/b.uvl")
+    assert os.path.dirname(first) == os.path.dirname(second)
+    assert os.path.relpath(first, str(tmp_path)).split(os.sep)[2:] == ["user_1", "dataset_1", "a.uvl"]
+    assert storage.local_path("user_1/dataset_2/a.uvl") != first
+
+
+@pytest.fixture
+def s3_app(test_app, s3_client):
+    previous = {name: test_app.config[name] for name in ("STORAGE_BACKEND", "S3_BUCKET", "S3_PRESIGNED_DOWNLOADS")}
+    test_app.config.update(STORAGE_BACKEND="s3", S3_BUCKET=BUCKET, S3_PRESIGNED_DOWNLOADS=False)
+    with test_app.test_client() as client:
+        with test_app.app_context():
+            db.drop_all()
+            db.create_all()
+            AuthSeeder().run()
+            DataSetSeeder().run()
+            yield client
+            db.session.remove()
+            db.drop_all()
+    test_app.config.update(previous)
+
+
+def test_downloads_are_served_from_s3(s3_app, test_app):
+    hubfile = db.session.query(Hubfile).first()
+    dataset = hubfile.get_dataset()
+    with open(os.path.join("app", "modules", "dataset", "uvl_examples", hubfile.name), "rb") as f:
+        expected = f.read()
+
+    assert isinstance(get_storage(), S3Storage)
+    response = s3_app.get(f"/file/download/{hubfile.id}")
+    assert response.status_code == 200
+    assert response.get_data() == expected
+
+    archive = s3_app.get(f"/dataset/download/{dataset.id}")
+    with zipfile.ZipFile(io.BytesIO(archive.get_data())) as zipf:
+        assert zipf.read(f"dataset_{dataset.id}/{hubfile.name}") == expected
+
+    test_app.config["S3_PRESIGNED_DOWNLOADS"] = True
+    redirect = s3_app.get(f"/file/download/{hubfile.id}")
+    assert redirect.status_code == 302
+    assert BUCKET in redirect.headers["Location"]
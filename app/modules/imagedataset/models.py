@@ -1,7 +1,7 @@
 from sqlalchemy import Enum as SQLAlchemyEnum
 
 from app import db
-from app.modules.dataset.models import DataSet, PublicationType
+from app.modules.dataset.models import DataSet, PublicationType, sync_tags, tag_association
 
 
 class ImageDataset(DataSet):
@@ -15,12 +15,6 @@ class ImageDataset(DataSet):
     def files(self):
         return [file for img in self.images for file in img.files]
 
-    def get_files_count(self):
-        return sum(len(img.files) for img in self.images)
-
-    def get_file_total_size(self):
-        return sum(file.size for img in self.images for file in img.files)
-
 
 class Image(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -38,6 +32,9 @@ class Image(db.Model):
         return f"Image<{self.id}>"
 
 
+image_meta_data_tag = tag_association("image_meta_data")
+
+
 class ImageMetaData(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(120), nullable=False)
@@ -46,6 +43,9 @@ class ImageMetaData(db.Model):
     publication_type = db.Column(SQLAlchemyEnum(PublicationType), nullable=False)
     publication_doi = db.Column(db.String(120))
     tags = db.Column(db.String(120))
+    tag_list = db.relationship(
+        "Tag", secondary=image_meta_data_tag, order_by=image_meta_data_tag.c.position, lazy=True, viewonly=True
+    )
 
     authors = db.relationship(
         "Author", backref="image_metadata", lazy=True, cascade="all, delete", foreign_keys="Author.image_meta_data_id"
@@ -53,3 +53,6 @@ class ImageMetaData(db.Model):
 
     def __repr__(self):
         return f"ImageMetaData<{self.title}>"
+
+
+sync_tags(ImageMetaData, image_meta_data_tag)
@@ -0,0 +1,100 @@
+import logging
+import threading
+import time
+
+from flask import current_app
+
+from app import db
+from app.modules.dataset.services import DataSetService
+from app.modules.explore.services import ExploreService
+from app.modules.featuremodel.services import FeatureModelService
+from core.managers.cache_manager import get_cache
+
+logger = logging.getLogger(__name__)
+
+LATEST_DATASET_FIELDS = (
+    "id",
+    "title",
+    "url",
+    "publication_type",
+    "created_at",
+    "description",
+    "authors",
+    "tags",
+    "total_size_in_human_format",
+)
+
+
+class HomepageStatsService:
+    """
+    Snapshot of everything the homepage shows, computed in one place and kept in the cache so that
+    rendering it costs no queries. A snapshot older than HOMEPAGE_STATS_TTL is still served while a
+    single worker, holding a short lock, recomputes it in the background; snapshots are only dropped
+    after twice the TTL, so a steadily visited homepage never waits for them.
+    """
+
+    cache_key = "public:homepage_stats"
+    lock_key = "public:homepage_stats:refreshing"
+
+    def get_snapshot(self) -> dict:
+        entry = get_cache().get(self.cache_key)
+        if entry is None:
+            return self.refresh()
+
+        if time.time() - entry["computed_at"] >= current_app.config["HOMEPAGE_STATS_TTL"]:
+            self._schedule_refresh()
+        return entry["stats"]
+
+    def refresh(self) -> dict:
+        stats = self.compute()
+        ttl = current_app.config["HOMEPAGE_STATS_TTL"]
+        get_cache().set(self.cache_key, {"computed_at": time.time(), "stats": stats}, timeout=2 * ttl)
+        return stats
+
+    def compute(self) -> dict:
+        dataset_service = DataSetService()
+        feature_model_service = FeatureModelService()
+
+        trending_datasets = dataset_service.get_trending_datasets(period="week", limit=3)
+        for item in trending_datasets:
+            # The snapshot holds plain values only
+            del item["dataset"]
+
+        return {
+            "datasets_counter": dataset_service.count_synchronized_datasets(),
+            "feature_models_counter": feature_model_service.count_feature_models(),
+            "total_dataset_downloads": dataset_service.total_dataset_downloads(),
+            "total_feature_model_downloads": feature_model_service.total_feature_model_downloads(),
+            "total_dataset_views": dataset_service.total_dataset_views(),
+            "total_feature_model_views": feature_model_service.total_feature_model_views(),
+            "datasets": ExploreService().latest(limit=5, fields=LATEST_DATASET_FIELDS),
+            "trending_datasets": trending_datasets,
+        }
+
+    def _schedule_refresh(self):
+        ttl = current_app.config["HOMEPAGE_STATS_TTL"]
+        # Only the worker that takes the lock recomputes; the others keep serving the current snapshot
+        if not get_cache().add(self.lock_key, True, timeout=ttl):
+            return
+
+        if not current_app.config["HOMEPAGE_STATS_BACKGROUND_REFRESH"]:
+            self._refresh_and_unlock()
+            return
+
+        app = current_app._get_current_object()
+        threading.Thread(target=self._refresh_in_background, args=(app,), daemon=True).start()
+
+    def _refresh_in_background(self, app):
+        with app.app_context():
+            try:
+                self._refresh_and_unlock()
+            except Exception:
+                logger.exception("Could not refresh the homepage statistics")
+            finally:
+                db.session.remove()
+
+    def _refresh_and_unlock(self):
+        try:
+            self.refresh()
+        finally:
+            get_cache().delete(self.lock_key)
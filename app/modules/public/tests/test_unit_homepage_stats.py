@@ -0,0 +1,73 @@
+"""
+Unit tests for the cached homepage statistics snapshot.
+"""
+
+import time
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.modules.public.services import HomepageStatsService
+from core.managers.cache_manager import LRUCache
+
+
+@pytest.fixture
+def cache(test_app):
+    previous = test_app.extensions["cache"]
+    test_app.extensions["cache"] = LRUCache()
+    yield test_app.extensions["cache"]
+    test_app.extensions["cache"] = previous
+
+
+@pytest.fixture
+def query_counter():
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    yield statements
+    event.remove(db.engine, "before_cursor_execute", count)
+
+
+def test_snapshot_holds_the_homepage_figures(test_database_poblated, cache):
+    stats = HomepageStatsService().get_snapshot()
+
+    assert stats["datasets_counter"] == 4
+    assert stats["feature_models_counter"] == 12
+    assert [dataset["title"] for dataset in stats["datasets"]][0] == "Sample dataset 4"
+    assert stats["datasets"][0]["authors"]
+
+
+def test_cached_homepage_renders_without_queries(test_database_poblated, cache, query_counter):
+    client = test_database_poblated
+    assert client.get("/").status_code == 200
+    query_counter.clear()
+
+    response = client.get("/")
+
+    assert response.status_code == 200
+    assert b"Sample dataset 4" in response.data
+    assert query_counter == []
+
+
+def test_stale_snapshot_is_served_and_refreshed_once(test_database_poblated, cache, monkeypatch):
+    service = HomepageStatsService()
+    service.get_snapshot()
+    computations = []
+    monkeypatch.setattr(HomepageStatsService, "compute", lambda self: computations.append(1) or {"fresh": True})
+
+    # Past the TTL a request still gets the snapshot it finds, then one refresh replaces it
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    cache.add(service.lock_key, True)
+    assert "datasets_counter" in service.get_snapshot()
+    assert computations == []
+
+    cache.delete(service.lock_key)
+    service.get_snapshot()
+    assert computations == [1]
+    assert service.get_snapshot() == {"fresh": True}
+    assert not cache.has(service.lock_key)
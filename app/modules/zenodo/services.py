@@ -199,14 +199,10 @@ class ZenodoService(BaseService):
         """
         data = {"name": hubfile.name}
 
-        # Resolve file path using HubfileService to support both UVL and image datasets.
-        file_path = HubfileService().get_path_by_hubfile(hubfile)
-        if not file_path:
-            raise Exception(f"Failed to resolve path for hubfile id={hubfile.id}")
-
+        # Stream the file from the storage backend (works for UVL, image and audio datasets).
         publish_url = f"{self.ZENODO_API_URL}/{deposition_id}/files"
-        with open(file_path, "rb") as file_handle:
-            files = {"file": file_handle}
+        with HubfileService().open_hubfile(hubfile) as file_handle:
+            files = {"file": (hubfile.name, file_handle)}
             response = requests.post(publish_url, params=self.params, data=data, files=files)
 
         if response.status_code != 201:
@@ -0,0 +1,94 @@
+/*
+ * Incremental MD5 of ArrayBuffers, used to look up files the hub already stores before uploading
+ * them again: `let md5 = new IncrementalMD5(); md5.append(buffer); ...; md5.end()` gives the hex digest.
+ */
+(function (global) {
+    'use strict';
+
+    const SHIFTS = [
+        7, 12, 17, 22, 7, 12, 17, 22, 7, 12, 17, 22, 7, 12, 17, 22,
+        5, 9, 14, 20, 5, 9, 14, 20, 5, 9, 14, 20, 5, 9, 14, 20,
+        4, 11, 16, 23, 4, 11, 16, 23, 4, 11, 16, 23, 4, 11, 16, 23,
+        6, 10, 15, 21, 6, 10, 15, 21, 6, 10, 15, 21, 6, 10, 15, 21
+    ];
+    const CONSTANTS = new Int32Array(64);
+    for (let i = 0; i < 64; i++) {
+        CONSTANTS[i] = Math.floor(Math.abs(Math.sin(i + 1)) * 0x100000000) | 0;
+    }
+
+    function IncrementalMD5() {
+        this.state = new Int32Array([0x67452301, 0xefcdab89 | 0, 0x98badcfe | 0, 0x10325476]);
+        this.buffer = new Uint8Array(64);
+        this.buffered = 0;
+        this.length = 0;
+        this.words = new Int32Array(16);
+    }
+
+    IncrementalMD5.prototype.append = function (arrayBuffer) {
+        let bytes = new Uint8Array(arrayBuffer);
+        let offset = 0;
+        this.length += bytes.length;
+        while (offset < bytes.length) {
+            let count = Math.min(64 - this.buffered, bytes.length - offset);
+            this.buffer.set(bytes.subarray(offset, offset + count), this.buffered);
+            this.buffered += count;
+            offset += count;
+            if (this.buffered === 64) {
+                this.transform(this.buffer);
+                this.buffered = 0;
+            }
+        }
+        return this;
+    };
+
+    IncrementalMD5.prototype.end = function () {
+        let bits = this.length * 8;
+        let padding = new Uint8Array((this.buffered < 56 ? 56 : 120) - this.buffered + 8);
+        padding[0] = 0x80;
+        let tail = new DataView(padding.buffer, padding.length - 8);
+        tail.setUint32(0, bits >>> 0, true);
+        tail.setUint32(4, Math.floor(bits / 0x100000000), true);
+        this.append(padding.buffer);
+
+        let hex = '';
+        for (let i = 0; i < 16; i++) {
+            hex += ((this.state[i >> 2] >>> ((i % 4) * 8)) & 0xff).toString(16).padStart(2, '0');
+        }
+        return hex;
+    };
+
+    IncrementalMD5.prototype.transform = function (block) {
+        let words = this.words;
+        for (let i = 0; i < 16; i++) {
+            words[i] = block[i * 4] | (block[i * 4 + 1] << 8) | (block[i * 4 + 2] << 16) | (block[i * 4 + 3] << 24);
+        }
+        let [a, b, c, d] = this.state;
+        for (let i = 0; i < 64; i++) {
+            let f, g;
+            if (i < 16) {
+                f = (b & c) | (~b & d);
+                g = i;
+            } else if (i < 32) {
+                f = (d & b) | (~d & c);
+                g = (5 * i + 1) % 16;
+            } else if (i < 48) {
+                f = b ^ c ^ d;
+                g = (3 * i + 5) % 16;
+            } else {
+                f = c ^ (b | ~d);
+                g = (7 * i) % 16;
+            }
+            let sum = (a + f + CONSTANTS[i] + words[g]) | 0;
+            a = d;
+            d = c;
+            c = b;
+            b = (b + ((sum << SHIFTS[i]) | (sum >>> (32 - SHIFTS[i])))) | 0;
+        }
+        this.state[0] += a;
+        this.state[1] += b;
+        this.state[2] += c;
+        this.state[3] += d;
+    };
+
+    global.IncrementalMD5 = IncrementalMD5;
+})(typeof window !== 'undefined' ? window : globalThis);
@@ -0,0 +1,57 @@
+from collections import Counter, defaultdict
+from typing import List
+
+from flask import current_app
+
+from core.analytics.sketches import add_to_sketches
+from core.repositories.counters import increment_counters, insert_ignoring_duplicates
+
+
+def store_events(
+    session, events: List[dict], record_model, sketch_models, subject: str, moment: str, cookie: str, counter: str
+) -> Counter:
+    """
+    Store a batch of events of one kind and return how many of them count, per (subject id, day).
+    Their visitors go into the daily sketches; with ANALYTICS_AUDIT_RECORDS they are also stored one
+    row per visitor and count once ever, otherwise nothing but the sketch is kept and an event counts
+    when it is a new visitor of that day according to the sketch.
+    """
+    config = current_app.config
+    audit_records = config.get("ANALYTICS_AUDIT_RECORDS", False)
+
+    added = Counter()
+    if config.get("ANALYTICS_SKETCHES", True) or not audit_records:
+        added = add_to_sketches(session, sketch_models, subject, counter, events)
+    if not audit_records:
+        return added
+    return insert_new_records(session, record_model, subject, moment, cookie, events)
+
+
+def insert_new_records(session, model, subject: str, moment: str, cookie: str, events: List[dict]) -> Counter:
+    """
+    Store the events as rows of ``model``, skipping those whose (subject, user, cookie) is already
+    recorded, and return how many rows went in per (subject id, day). ``subject``, ``moment`` and
+    ``cookie`` name the columns holding the event's subject id, time and cookie. There is one
+    statement per (subject, day), so what was inserted is known without reading the table.
+    """
+    groups = defaultdict(list)
+    for event in events:
+        groups[(event["subject_id"], event["at"].date())].append(
+            {subject: event["subject_id"], "user_id": event["user_id"], cookie: event["cookie"], moment: event["at"]}
+        )
+
+    connection = session.connection()
+    inserted = Counter()
+    for key, rows in groups.items():
+        count = insert_ignoring_duplicates(connection, model.__table__, rows)
+        if count:
+            inserted[key] = count
+    return inserted
+
+
+def count_daily(session, table, key: str, inserted: Counter, counter: str):
+    """Add the rows inserted per (``key``, day) to the daily rollup ``table``, one upsert per day"""
+    connection = session.connection()
+    for (value, day), amount in inserted.items():
+        if value is not None:
+            increment_counters(connection, table, {key: value, "day": day}, {counter: amount})
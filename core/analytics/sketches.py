@@ -0,0 +1,118 @@
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+
+from core.analytics.hyperloglog import HyperLogLog
+from core.repositories.counters import insert_ignoring_duplicates
+
+PERIOD_DAYS = {"week": 7, "month": 30}
+PERIODS = ("week", "month", "all")
+
+
+def period_start(period: Optional[str]) -> Optional[date]:
+    """First day of a "week" or "month" window ending today; None (every day) for any other period"""
+    if period not in PERIOD_DAYS:
+        return None
+    return (datetime.now(timezone.utc) - timedelta(days=PERIOD_DAYS[period])).date()
+
+
+def visitor_id(event: dict) -> str:
+    return f"{event['user_id'] or 0}:{event['cookie']}"
+
+
+def add_to_sketches(session, sketch_models, key: str, column: str, events: List[dict]) -> Counter:
+    """
+    Add the visitors of the events to the ``column`` sketch of their (``key``, day) row of the daily
+    model and (``key``, month) row of the monthly model of ``sketch_models``, and return, per
+    (subject id, day), how many distinct visitors the daily sketch gained (an estimate).
+    """
+    daily_model, monthly_model = sketch_models
+    days, months = defaultdict(set), defaultdict(set)
+    for event in events:
+        if event["subject_id"] is not None:
+            day = event["at"].date()
+            days[(event["subject_id"], day)].add(visitor_id(event))
+            months[(event["subject_id"], day.replace(day=1))].add(visitor_id(event))
+
+    connection = session.connection()
+    added = Counter()
+    for (subject_id, day), visitors in days.items():
+        gained = _merge_visitors(connection, daily_model.__table__, {key: subject_id, "day": day}, column, visitors)
+        if gained > 0:
+            added[(subject_id, day)] = gained
+    for (subject_id, month), visitors in months.items():
+        _merge_visitors(connection, monthly_model.__table__, {key: subject_id, "month": month}, column, visitors)
+    return added
+
+
+def _merge_visitors(connection, table, keys: dict, column: str, visitors) -> int:
+    """Add visitors to the ``column`` sketch of the row of ``table`` at ``keys``; returns the estimated gain"""
+    condition = [table.c[name] == value for name, value in keys.items()]
+
+    # Created when missing and locked, so concurrent flushes merge into the sketch instead of overwriting it
+    insert_ignoring_duplicates(connection, table, [keys])
+    stored = connection.execute(select(table.c[column]).where(*condition).with_for_update()).scalar()
+
+    sketch = HyperLogLog.from_bytes(stored)
+    before = bytes(sketch.registers)
+    previous_count = sketch.count()
+    sketch.update(visitors)
+    if bytes(sketch.registers) == before:
+        return 0
+
+    connection.execute(table.update().where(*condition).values({column: sketch.to_bytes()}))
+    return sketch.count() - previous_count
+
+
+def distinct_visitors(
+    session, sketch_models, key: str, subject_ids: Iterable[int], periods: Iterable[str] = PERIODS
+) -> Dict[int, Dict[str, Dict[str, int]]]:
+    """
+    Distinct viewers and downloaders of each subject per period: "week" and "month" windows are merged
+    from the daily sketches in a single pass over the rows of the longest window, any other period
+    ("all") from the monthly sketches.
+    """
+    daily_model, monthly_model = sketch_models
+    subject_ids = list(subject_ids)
+    starts = {period: period_start(period) for period in periods}
+    merged = {
+        subject_id: {period: {"views": HyperLogLog(), "downloads": HyperLogLog()} for period in starts}
+        for subject_id in subject_ids
+    }
+    if not subject_ids:
+        return {}
+
+    windows = {period: start for period, start in starts.items() if start is not None}
+    if windows:
+        subject_column = getattr(daily_model, key)
+        rows = session.query(subject_column, daily_model.day, daily_model.views, daily_model.downloads).filter(
+            subject_column.in_(subject_ids), daily_model.day >= min(windows.values())
+        )
+        for subject_id, day, views, downloads in rows:
+            sketches = {"views": HyperLogLog.from_bytes(views), "downloads": HyperLogLog.from_bytes(downloads)}
+            for period, start in windows.items():
+                if day >= start:
+                    for name, sketch in sketches.items():
+                        merged[subject_id][period][name].merge(sketch)
+
+    lifetime = [period for period, start in starts.items() if start is None]
+    if lifetime:
+        subject_column = getattr(monthly_model, key)
+        rows = session.query(subject_column, monthly_model.views, monthly_model.downloads).filter(
+            subject_column.in_(subject_ids)
+        )
+        for subject_id, views, downloads in rows:
+            sketches = {"views": HyperLogLog.from_bytes(views), "downloads": HyperLogLog.from_bytes(downloads)}
+            for period in lifetime:
+                for name, sketch in sketches.items():
+                    merged[subject_id][period][name].merge(sketch)
+
+    return {
+        subject_id: {
+            period: {name: sketch.count() for name, sketch in sketches.items()}
+            for period, sketches in by_period.items()
+        }
+        for subject_id, by_period in merged.items()
+    }
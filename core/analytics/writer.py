@@ -0,0 +1,244 @@
+import atexit
+import fcntl
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from flask import has_app_context
+
+logger = logging.getLogger(__name__)
+
+# Event kind -> callable writing a batch of events of that kind through db.session (without committing)
+_event_writers: Dict[str, Callable[[List[dict]], None]] = {}
+
+
+def register_event_writer(kind: str, writer: Callable[[List[dict]], None]):
+    """
+    Declare how events of ``kind`` are stored. Writers must be idempotent: an event may be written
+    again after a crash, so rows that already exist are skipped and counters only move for new rows.
+    """
+    _event_writers[kind] = writer
+
+
+class AnalyticsWriter:
+    """
+    Write-behind buffer for view and download events. ``record`` only appends the event to memory and
+    to this worker's journal in the spool directory; the buffer is written in one transaction of batched
+    INSERTs once it holds ``batch_size`` events or ``flush_interval`` seconds after the last write.
+    Events repeated within the process (same kind, subject, user, cookie and day) are dropped on arrival.
+
+    A journal that could not be written stays in the spool and is retried on every flush by whichever
+    worker gets to it first. Journals are locked while in use, so those of dead workers are picked up
+    as well. Without write-behind every event is written as soon as it is recorded.
+    """
+
+    def __init__(
+        self,
+        app,
+        write_behind: bool = True,
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+        dedupe_size: int = 100_000,
+        spool_dir: Optional[str] = None,
+    ):
+        self.app = app
+        self.write_behind = write_behind
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dedupe_size = dedupe_size
+        self.spool_dir = spool_dir if write_behind else None
+
+        self._pending: List[dict] = []
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._token = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._journal = None
+        self._segments = 0
+
+    def record(self, kind: str, subject_id: int, user_id: Optional[int], cookie: str, at: Optional[datetime] = None):
+        at = at or datetime.now(timezone.utc)
+        event = {"kind": kind, "subject_id": subject_id, "user_id": user_id, "cookie": cookie, "at": at.isoformat()}
+
+        if not self.write_behind:
+            self._write([event])
+            return
+
+        # Per day: the daily rollups and sketches count a returning visitor again on each new day
+        key = (kind, subject_id, user_id, cookie, at.date())
+        with self._lock:
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                return
+            self._seen[key] = True
+            while len(self._seen) > self.dedupe_size:
+                self._seen.popitem(last=False)
+
+            self._pending.append(event)
+            if self.spool_dir:
+                journal = self._journal_file()
+                journal.write(json.dumps(event) + "\n")
+                journal.flush()
+            full = len(self._pending) >= self.batch_size
+
+        self._ensure_flusher()
+        if full:
+            self._wake.set()
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """Write everything buffered, plus journals left in the spool; returns the number of events written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                segment = self._rotate_journal() if batch else None
+
+            try:
+                if batch:
+                    try:
+                        self._write(batch)
+                    except Exception:
+                        logger.exception("Could not write %d analytics event(s); they stay in the spool", len(batch))
+                        return 0
+                    if segment is not None:
+                        os.unlink(segment[1])
+            finally:
+                if segment is not None:
+                    segment[0].close()
+
+            return len(batch) + self.replay()
+
+    def replay(self) -> int:
+        """Write the journals left in the spool by failed flushes and by workers that are gone"""
+        if not self.spool_dir or not os.path.isdir(self.spool_dir):
+            return 0
+
+        written = 0
+        for name in sorted(os.listdir(self.spool_dir)):
+            if not name.endswith((".journal", ".segment")) or name == f"{self._token}.journal":
+                continue
+            path = os.path.join(self.spool_dir, name)
+            try:
+                journal = open(path)
+            except FileNotFoundError:
+                continue
+
+            with journal:
+                try:
+                    fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Still being appended to or written by its worker
+                    continue
+                if not os.path.exists(path):
+                    continue
+
+                events, torn = [], 0
+                for line in journal:
+                    if not line.strip():
+                        continue
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        # A line cut short by a crash (or otherwise unreadable) is dropped, not the journal
+                        torn += 1
+                try:
+                    self._write(events)
+                except Exception:
+                    logger.exception("Could not replay the analytics journal %s", name)
+                    continue
+
+                if torn:
+                    # Kept aside for inspection, out of the replay
+                    logger.warning("Skipped %d unreadable line(s) of the analytics journal %s", torn, name)
+                    os.rename(path, f"{path}.bad")
+                else:
+                    os.unlink(path)
+                written += len(events)
+        return written
+
+    def close(self):
+        """Stop the background flusher and write what is left"""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._wake.set()
+            thread.join(timeout=self.flush_interval + 5)
+        try:
+            with nullcontext() if has_app_context() else self.app.app_context():
+                self.flush()
+        finally:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    def _write(self, events: List[dict]):
+        from app import db
+
+        by_kind = defaultdict(list)
+        for event in events:
+            by_kind[event["kind"]].append({**event, "at": datetime.fromisoformat(event["at"])})
+
+        # Within a request the events are committed with its session, elsewhere with a session of their own
+        with nullcontext() if has_app_context() else self.app.app_context():
+            try:
+                for kind, kind_events in by_kind.items():
+                    _event_writers[kind](kind_events)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def _ensure_flusher(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="analytics-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        from app import db
+
+        while self._thread is threading.current_thread():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception("Analytics flush failed")
+                finally:
+                    db.session.remove()
+
+    # Spool files: <token>.journal is being appended to, <token>.<n>.segment is being (or failed to be)
+    # written. Each is locked while a worker appends to or writes it. Replayed journals that had
+    # unreadable lines are left as <name>.bad.
+
+    def _journal_file(self):
+        if self._journal is None:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._journal = open(os.path.join(self.spool_dir, f"{self._token}.journal"), "a")
+            fcntl.flock(self._journal, fcntl.LOCK_EX)
+        return self._journal
+
+    def _rotate_journal(self):
+        """Rename the journal to a segment; returns it (still open and locked) with its new path"""
+        if self._journal is None:
+            return None
+        journal, self._journal = self._journal, None
+        self._segments += 1
+        path = os.path.join(self.spool_dir, f"{self._token}.{time.time_ns()}-{self._segments}.segment")
+        os.rename(journal.name, path)
+        return journal, path
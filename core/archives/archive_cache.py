@@ -0,0 +1,122 @@
+import hashlib
+import logging
+import os
+import uuid
+from typing import Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def archive_key(archive_name: str, members: Iterable[Tuple[str, str]]) -> str:
+    """
+    Content address of an archive: its root folder plus the sorted (checksum, name) pairs of
+    its members. Any change to a file checksum or name yields a different key.
+    """
+    digest = hashlib.sha256(archive_name.encode("utf-8"))
+    for checksum, name in sorted(members):
+        digest.update(b"\0")
+        digest.update(checksum.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(name.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ArchiveCache:
+    """
+    On-disk cache of prebuilt archives with a total size cap and LRU eviction.
+
+    Entries are named ``<archive_name>-<key>.zip``; the mtime of an entry is bumped on every
+    hit, so eviction removes the least recently used archives first.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def path_for(self, archive_name: str, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{archive_name}-{key}.zip")
+
+    def get(self, archive_name: str, key: str) -> Optional[str]:
+        path = self.path_for(archive_name, key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def store(self, archive_name: str, key: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Pass ``chunks`` through while writing them to the cache. The entry only becomes visible
+        once the whole archive has been produced; an interrupted stream leaves nothing behind, and
+        neither does an archive larger than the whole cache.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        final_path = self.path_for(archive_name, key)
+        temp_path = os.path.join(self.cache_dir, f".tmp-{uuid.uuid4().hex}")
+        completed = False
+
+        try:
+            with open(temp_path, "wb") as temp_file:
+                for chunk in chunks:
+                    temp_file.write(chunk)
+                    yield chunk
+            size = os.path.getsize(temp_path)
+            if size > self.max_bytes:
+                logger.info(f"Not caching {final_path}: its {size} bytes exceed the cache size")
+                return
+            os.replace(temp_path, final_path)
+            completed = True
+        finally:
+            if not completed and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        self.evict(keep=final_path)
+
+    def build(self, archive_name: str, key: str, chunks: Iterable[bytes]) -> Optional[str]:
+        """Write the archive to the cache; returns its path, or None when it is too large to be cached"""
+        for _ in self.store(archive_name, key, chunks):
+            pass
+        return self.get(archive_name, key)
+
+    def invalidate(self, archive_name: str) -> int:
+        """Remove every cached version of ``archive_name``, whatever its key."""
+        removed = 0
+        for entry in self._entries():
+            if entry.name.rsplit("-", 1)[0] == archive_name:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def evict(self, keep: Optional[str] = None):
+        """Remove the least recently used entries until the cache fits its size cap, sparing ``keep``"""
+        entries = []
+        for entry in self._entries():
+            if entry.path == keep:
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+        if keep is not None and os.path.exists(keep):
+            total_size += os.path.getsize(keep)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total_size -= size
+                logger.info(f"Evicted cached archive {path}")
+            except FileNotFoundError:
+                pass
+
+    def _entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        with os.scandir(self.cache_dir) as entries:
+            return [entry for entry in entries if entry.is_file() and entry.name.endswith(".zip")]
@@ -0,0 +1,108 @@
+import io
+import os
+import time
+from typing import BinaryIO, Callable, Iterable, Iterator, Tuple, Union
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
+
+CHUNK_SIZE = 64 * 1024
+# Timestamp of members without a file of their own, so rebuilding an archive yields the same bytes
+EPOCH_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink that ZipFile writes into and the generator drains."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if data:
+            self._chunks.append(bytes(data))
+            self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_directory(root: str, arcname_prefix: str = "") -> Iterator[Tuple[str, str]]:
+    """Lazily yield (absolute path, arcname) pairs for every file below ``root``."""
+    if not os.path.isdir(root):
+        return
+
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        with os.scandir(current) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    relative_path = os.path.relpath(entry.path, root)
+                    yield entry.path, os.path.join(arcname_prefix, relative_path)
+
+
+Source = Union[str, bytes, Callable[[], BinaryIO]]
+
+
+def _copy_member(source_file, dest, sink, chunk_size):
+    while True:
+        chunk = source_file.read(chunk_size)
+        if not chunk:
+            break
+        dest.write(chunk)
+        data = sink.drain()
+        if data:
+            yield data
+
+
+def stream_zip(entries: Iterable[Tuple[Source, str]], compress: bool = False, chunk_size: int = CHUNK_SIZE):
+    """
+    Generate a ZIP archive on the fly from (source, arcname) pairs, where source is a file path,
+    a callable returning a readable binary stream (e.g. an object in remote storage) or, for small
+    generated members such as a README, the member's bytes.
+
+    Only one chunk of one file is held in memory at a time. Because the output is not
+    seekable, ZipFile writes sizes and CRCs in data descriptors after each member.
+    """
+    sink = _ZipStreamBuffer()
+    compression = ZIP_DEFLATED if compress else ZIP_STORED
+
+    with ZipFile(sink, mode="w", compression=compression, allowZip64=True) as zipf:
+        for source, arcname in entries:
+            if isinstance(source, bytes):
+                zinfo = ZipInfo(arcname, date_time=EPOCH_DATE_TIME)
+                zinfo.compress_type = compression
+                zipf.writestr(zinfo, source)
+            elif callable(source):
+                zinfo = ZipInfo(arcname, date_time=EPOCH_DATE_TIME)
+                zinfo.compress_type = compression
+
+                with source() as source_file, zipf.open(zinfo, mode="w", force_zip64=True) as dest:
+                    yield from _copy_member(source_file, dest, sink, chunk_size)
+            elif os.path.isfile(source):
+                zinfo = ZipInfo(arcname, date_time=time.localtime(os.path.getmtime(source))[:6])
+                zinfo.compress_type = compression
+
+                with open(source, "rb") as source_file, zipf.open(zinfo, mode="w", force_zip64=True) as dest:
+                    yield from _copy_member(source_file, dest, sink, chunk_size)
+            else:
+                continue
+
+            data = sink.drain()
+            if data:
+                yield data
+
+    # Central directory is written when the ZipFile is closed
+    data = sink.drain()
+    if data:
+        yield data
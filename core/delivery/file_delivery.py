@@ -0,0 +1,267 @@
+import mimetypes
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+
+from flask import Response, current_app, redirect, request, send_file
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from werkzeug.http import http_date, is_resource_modified
+
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_byte_ranges(header: Optional[str], length: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse a ``Range: bytes=...`` header into sorted, coalesced, half-open (start, stop) ranges.
+
+    Returns ``None`` when the header is absent or malformed (the full body should be sent) and
+    an empty list when it is well formed but no range can be satisfied.
+    """
+    if not header:
+        return None
+
+    units, _, spec = header.partition("=")
+    if units.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        first, sep, last = part.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if not first:
+                suffix = int(last)
+                if suffix <= 0:
+                    continue
+                start, stop = max(length - suffix, 0), length
+            else:
+                start = int(first)
+                if last and int(last) < start:
+                    return None
+                stop = min(int(last) + 1, length) if last else length
+        except ValueError:
+            return None
+
+        if start < length:
+            ranges.append((start, stop))
+
+    merged = []
+    for start, stop in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def _if_range_matches(etag: Optional[str], last_modified: datetime) -> bool:
+    if "If-Range" not in request.headers:
+        return True
+    if_range = request.if_range
+    if if_range.etag:
+        return etag is not None and if_range.etag == etag
+    if if_range.date:
+        return int(last_modified.timestamp()) <= int(if_range.date.timestamp())
+    return False
+
+
+def _iter_file_ranges(path: str, parts: List[Tuple[bytes, int, int]], closing: bytes):
+    with open(path, "rb") as source:
+        for head, start, stop in parts:
+            if head:
+                yield head
+            source.seek(start)
+            remaining = stop - start
+            while remaining > 0:
+                chunk = source.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+            if head:
+                yield b"\r\n"
+        if closing:
+            yield closing
+
+
+def _range_response(path, ranges, length, mimetype, etag, last_modified, as_attachment, download_name):
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        response = Response(_iter_file_ranges(path, [(b"", start, stop)], b""), status=206, mimetype=mimetype)
+        response.headers["Content-Range"] = f"bytes {start}-{stop - 1}/{length}"
+        response.headers["Content-Length"] = str(stop - start)
+    else:
+        boundary = uuid.uuid4().hex
+        parts = []
+        content_length = 0
+        for start, stop in ranges:
+            head = (
+                f"--{boundary}\r\nContent-Type: {mimetype}\r\n"
+                f"Content-Range: bytes {start}-{stop - 1}/{length}\r\n\r\n"
+            ).encode("latin-1")
+            parts.append((head, start, stop))
+            content_length += len(head) + (stop - start) + 2
+        closing = f"--{boundary}--\r\n".encode("latin-1")
+        content_length += len(closing)
+
+        response = Response(
+            _iter_file_ranges(path, parts, closing),
+            status=206,
+            content_type=f"multipart/byteranges; boundary={boundary}",
+        )
+        response.headers["Content-Length"] = str(content_length)
+
+    response.headers["Accept-Ranges"] = "bytes"
+    response.headers["Last-Modified"] = http_date(last_modified)
+    if etag:
+        response.set_etag(etag)
+    if as_attachment:
+        response.headers.set("Content-Disposition", "attachment", filename=download_name or os.path.basename(path))
+    return response
+
+
+def send_file_conditional(
+    path: str,
+    etag: Optional[str] = None,
+    mimetype: Optional[str] = None,
+    as_attachment: bool = False,
+    download_name: Optional[str] = None,
+):
+    """
+    Send a file honouring ``If-None-Match``/``If-Modified-Since`` (304) and ``Range`` (206),
+    including multi-range requests answered as ``multipart/byteranges``.
+
+    ``etag`` should be a stable content hash (e.g. the stored MD5 checksum); it is sent as a
+    strong validator. Without it, werkzeug derives one from the file's mtime, size and path.
+    """
+    mimetype = mimetype or mimetypes.guess_type(download_name or path)[0] or "application/octet-stream"
+    stat = os.stat(path)
+    last_modified = datetime.fromtimestamp(int(stat.st_mtime), tz=timezone.utc)
+
+    ranges = None
+    if request.method in ("GET", "HEAD") and _if_range_matches(etag, last_modified):
+        ranges = parse_byte_ranges(request.headers.get("Range"), stat.st_size)
+
+    if ranges is not None and is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        if not ranges:
+            return RequestedRangeNotSatisfiable(length=stat.st_size).get_response()
+        return _range_response(path, ranges, stat.st_size, mimetype, etag, last_modified, as_attachment, download_name)
+
+    # Full and 304 responses. Ranges were fully handled above, so werkzeug must not see them again
+    request.environ.pop("HTTP_RANGE", None)
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        as_attachment=as_attachment,
+        download_name=download_name,
+        etag=etag if etag else True,
+        last_modified=last_modified,
+        conditional=True,
+    )
+    response.headers["Accept-Ranges"] = "bytes"
+    return response
+
+
+def not_modified_response(etag: str) -> Response:
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def request_matches_etag(etag: str) -> bool:
+    return request.if_none_match.contains(etag)
+
+
+def _internal_uri(path: str) -> Optional[str]:
+    """Map a file below FILE_DELIVERY_ROOT to the front-end server's internal location."""
+    root = os.path.abspath(os.path.join(os.getenv("WORKING_DIR", ""), current_app.config["FILE_DELIVERY_ROOT"]))
+    relative_path = os.path.relpath(os.path.abspath(path), root)
+    if relative_path.startswith(os.pardir):
+        return None
+    prefix = current_app.config["FILE_DELIVERY_INTERNAL_PREFIX"].rstrip("/")
+    return f"{prefix}/{quote(relative_path.replace(os.sep, '/'))}"
+
+
+def offloads_delivery() -> bool:
+    return current_app.config.get("FILE_DELIVERY_MODE", "app") in ("x-accel", "x-sendfile")
+
+
+def deliver_file(
+    path: str,
+    etag: Optional[str] = None,
+    mimetype: Optional[str] = None,
+    as_attachment: bool = False,
+    download_name: Optional[str] = None,
+):
+    """
+    Deliver a file according to FILE_DELIVERY_MODE.
+
+    ``app`` streams it from this worker (see send_file_conditional). ``x-accel`` and
+    ``x-sendfile`` return an empty response whose header tells nginx (X-Accel-Redirect) or
+    Apache/lighttpd (X-Sendfile) to transfer the bytes, so the worker is released as soon as the
+    route has done its authorisation and accounting. Ranges are then handled by the front end.
+    """
+    mode = current_app.config.get("FILE_DELIVERY_MODE", "app")
+    internal_uri = _internal_uri(path) if mode == "x-accel" else None
+
+    if not offloads_delivery() or (mode == "x-accel" and internal_uri is None):
+        return send_file_conditional(
+            path, etag=etag, mimetype=mimetype, as_attachment=as_attachment, download_name=download_name
+        )
+
+    if etag and request_matches_etag(etag):
+        return not_modified_response(etag)
+
+    mimetype = mimetype or mimetypes.guess_type(download_name or path)[0] or "application/octet-stream"
+    response = Response(mimetype=mimetype)
+    if mode == "x-accel":
+        response.headers["X-Accel-Redirect"] = internal_uri
+    else:
+        response.headers["X-Sendfile"] = os.path.abspath(path)
+
+    if etag:
+        response.set_etag(etag)
+    if as_attachment:
+        response.headers.set("Content-Disposition", "attachment", filename=download_name or os.path.basename(path))
+    return response
+
+
+def deliver_stored_file(
+    storage,
+    key: str,
+    etag: Optional[str] = None,
+    mimetype: Optional[str] = None,
+    as_attachment: bool = False,
+    download_name: Optional[str] = None,
+):
+    """
+    Deliver ``key`` from a storage backend. Local files go through deliver_file; remote objects
+    are redirected to a presigned URL (S3_PRESIGNED_DOWNLOADS) or proxied as a stream.
+    """
+    local_path = storage.local_path(key)
+    if local_path:
+        return deliver_file(
+            local_path, etag=etag, mimetype=mimetype, as_attachment=as_attachment, download_name=download_name
+        )
+
+    if etag and request_matches_etag(etag):
+        return not_modified_response(etag)
+
+    download_name = download_name or key.rsplit("/", 1)[-1]
+    url = storage.url(key, download_name if as_attachment else None)
+    if url and current_app.config.get("S3_PRESIGNED_DOWNLOADS", True):
+        return redirect(url)
+
+    mimetype = mimetype or mimetypes.guess_type(download_name)[0] or "application/octet-stream"
+    response = Response(storage.iter_chunks(key), mimetype=mimetype)
+    size = storage.size(key)
+    if size is not None:
+        response.headers["Content-Length"] = str(size)
+    if etag:
+        response.set_etag(etag)
+    if as_attachment:
+        response.headers.set("Content-Disposition", "attachment", filename=download_name)
+    return response
@@ -0,0 +1,27 @@
+from flask import current_app
+
+from core.analytics.writer import AnalyticsWriter
+
+
+class AnalyticsManager:
+    def __init__(self, app):
+        self.app = app
+
+    def init_writer(self):
+        config = self.app.config
+        writer = AnalyticsWriter(
+            self.app,
+            write_behind=config.get("ANALYTICS_WRITE_BEHIND", True),
+            batch_size=config.get("ANALYTICS_BATCH_SIZE", 500),
+            flush_interval=config.get("ANALYTICS_FLUSH_INTERVAL", 2.0),
+            dedupe_size=config.get("ANALYTICS_DEDUPE_SIZE", 100_000),
+            spool_dir=config.get("ANALYTICS_SPOOL_DIR"),
+        )
+
+        self.app.extensions["analytics"] = writer
+        return writer
+
+
+def get_analytics() -> AnalyticsWriter:
+    """The view/download event writer set up by AnalyticsManager"""
+    return current_app.extensions["analytics"]
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from cachelib import BaseCache, NullCache, RedisCache, SimpleCache
+from cachelib.serializers import SimpleSerializer
+from flask import current_app
+
+
+class LRUCache(BaseCache):
+    """
+    Per-process cache holding at most ``threshold`` entries. Entries expire after their timeout and,
+    when the cache is full, the least recently used one is evicted first.
+    """
+
+    serializer = SimpleSerializer()
+
+    def __init__(self, threshold: int = 500, default_timeout: int = 300):
+        super().__init__(default_timeout)
+        self._threshold = threshold or 500
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expiry(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return time.monotonic() + timeout if timeout > 0 else 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires and expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return self.serializer.loads(value)
+
+    def set(self, key, value, timeout=None):
+        entry = (self._expiry(timeout), self.serializer.dumps(value))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._threshold:
+                self._entries.popitem(last=False)
+        return True
+
+    def add(self, key, value, timeout=None):
+        if self.has(key):
+            return False
+        return self.set(key, value, timeout)
+
+    def delete(self, key):
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def has(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (not entry[0] or entry[0] > time.monotonic())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        return True
+
+    def inc(self, key, delta=1):
+        with self._lock:
+            entry = self._entries.get(key)
+            value = self.serializer.loads(entry[1]) + delta if entry is not None else delta
+            self._entries[key] = (entry[0] if entry is not None else 0, self.serializer.dumps(value))
+        return value
+
+
+class CacheManager:
+    def __init__(self, app):
+        self.app = app
+
+    def init_cache(self):
+        config = self.app.config
+        cache_type = config.get("CACHE_TYPE", "lru")
+        timeout = config.get("CACHE_DEFAULT_TIMEOUT", 300)
+
+        if cache_type == "redis":
+            import redis
+
+            cache = RedisCache(
+                host=redis.from_url(config["CACHE_REDIS_URL"]),
+                key_prefix=config.get("CACHE_KEY_PREFIX", ""),
+                default_timeout=timeout,
+            )
+        elif cache_type == "null":
+            cache = NullCache()
+        elif cache_type == "simple":
+            cache = SimpleCache(threshold=config.get("CACHE_THRESHOLD", 5000), default_timeout=timeout)
+        else:
+            cache = LRUCache(threshold=config.get("CACHE_THRESHOLD", 5000), default_timeout=timeout)
+
+        self.app.extensions["cache"] = cache
+        return cache
+
+
+def get_cache():
+    """The application cache (a cachelib cache) set up by CacheManager"""
+    return current_app.extensions["cache"]
+
+
+def namespace_version(namespace: str) -> int:
+    """
+    Current version of a group of cache entries; keys built with it go stale together once
+    ``bump_namespace_version`` is called, in every worker. A lost counter restarts from the clock,
+    never from an old value.
+    """
+    path = _version_path(namespace)
+    if path is not None:
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            bump_namespace_version(namespace)
+            return os.stat(path).st_mtime_ns
+
+    cache = get_cache()
+    key = f"version:{namespace}"
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1000, timeout=0)
+        version = cache.get(key)
+    return version or 0
+
+
+def bump_namespace_version(namespace: str):
+    path = _version_path(namespace)
+    if path is not None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a"):
+            pass
+        now = time.time_ns()
+        os.utime(path, ns=(now, max(now, os.stat(path).st_mtime_ns + 1)))
+        return
+
+    cache = get_cache()
+    key = f"version:{namespace}"
+    if cache.get(key) is None:
+        cache.set(key, time.time_ns() // 1000, timeout=0)
+    else:
+        cache.inc(key)
+
+
+def _version_path(namespace: str) -> Optional[str]:
+    """
+    File whose modification time is the version of ``namespace`` when the cache is per process, so all
+    the workers of the host share it; None when the versions live in the (shared) cache itself.
+    """
+    directory = current_app.config.get("CACHE_VERSION_DIR")
+    if not directory or isinstance(get_cache(), RedisCache):
+        return None
+    return os.path.abspath(os.path.join(os.getenv("WORKING_DIR", ""), directory, f"{namespace}.version"))
@@ -34,6 +34,66 @@ class Config:
     TIMEZONE = "Europe/Madrid"
     TEMPLATES_AUTO_RELOAD = True
     UPLOAD_FOLDER = "uploads"
+    ARCHIVE_CACHE_DIR = os.getenv("ARCHIVE_CACHE_DIR", os.path.join("uploads", ".archive_cache"))
+    ARCHIVE_CACHE_MAX_BYTES = int(os.getenv("ARCHIVE_CACHE_MAX_BYTES", 2 * 1024**3))
+    BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", os.path.join("uploads", ".blobs"))
+    CHECKSUM_MAX_WORKERS = int(os.getenv("CHECKSUM_MAX_WORKERS", 4))
+    RESUMABLE_UPLOAD_MAX_BYTES = int(os.getenv("RESUMABLE_UPLOAD_MAX_BYTES", 1024**3))
+
+    # "local" (files under STORAGE_ROOT), "sharded" (hash-sharded dirs under STORAGE_ROOT) or "s3"
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+    STORAGE_ROOT = os.getenv("STORAGE_ROOT", "uploads")
+    S3_BUCKET = os.getenv("S3_BUCKET")
+    S3_PREFIX = os.getenv("S3_PREFIX", "")
+    S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+    S3_REGION = os.getenv("S3_REGION")
+    S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID")
+    S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY")
+    # Redirect downloads to presigned URLs instead of proxying them through the app
+    S3_PRESIGNED_DOWNLOADS = os.getenv("S3_PRESIGNED_DOWNLOADS", "True").lower() == "true"
+
+    # "app" streams files from the worker, "x-accel" (nginx) and "x-sendfile" hand them to the front end
+    FILE_DELIVERY_MODE = os.getenv("FILE_DELIVERY_MODE", "app")
+    FILE_DELIVERY_ROOT = os.getenv("FILE_DELIVERY_ROOT", "uploads")
+    FILE_DELIVERY_INTERNAL_PREFIX = os.getenv("FILE_DELIVERY_INTERNAL_PREFIX", "/protected/uploads")
+
+    # "database" (full-text index of the database) or "memory" (in-process BM25 index, persisted to a snapshot)
+    SEARCH_ENGINE = os.getenv("SEARCH_ENGINE", "database")
+    SEARCH_SNAPSHOT_PATH = os.getenv("SEARCH_SNAPSHOT_PATH", os.path.join("uploads", ".search", "explore.idx"))
+
+    EXPLORE_PAGE_SIZE = int(os.getenv("EXPLORE_PAGE_SIZE", 20))
+    EXPLORE_MAX_PAGE_SIZE = int(os.getenv("EXPLORE_MAX_PAGE_SIZE", 100))
+    # Result totals are counted exactly up to this many matches and reported as "more than" past it
+    EXPLORE_COUNT_LIMIT = int(os.getenv("EXPLORE_COUNT_LIMIT", 1000))
+    EXPLORE_FACET_TAG_LIMIT = int(os.getenv("EXPLORE_FACET_TAG_LIMIT", 10))
+    # Lifetime of cached Explore pages; publishing, editing or deleting a dataset invalidates them sooner
+    EXPLORE_CACHE_TIMEOUT = int(os.getenv("EXPLORE_CACHE_TIMEOUT", 300))
+    EXPLORE_SUGGEST_LIMIT = int(os.getenv("EXPLORE_SUGGEST_LIMIT", 8))
+    EXPLORE_SUGGEST_MAX_LIMIT = int(os.getenv("EXPLORE_SUGGEST_MAX_LIMIT", 20))
+
+    # Seconds the homepage statistics may be stale before one worker recomputes them in the background
+    HOMEPAGE_STATS_TTL = int(os.getenv("HOMEPAGE_STATS_TTL", 60))
+    HOMEPAGE_STATS_BACKGROUND_REFRESH = True
+
+    # View and download records are buffered per worker and written in batches (journaled to the spool
+    # directory until then); without write-behind each one is written during its request
+    ANALYTICS_WRITE_BEHIND = os.getenv("ANALYTICS_WRITE_BEHIND", "True").lower() == "true"
+    ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", 500))
+    ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", 2))
+    ANALYTICS_DEDUPE_SIZE = int(os.getenv("ANALYTICS_DEDUPE_SIZE", 100_000))
+    ANALYTICS_SPOOL_DIR = os.getenv("ANALYTICS_SPOOL_DIR", os.path.join("uploads", ".analytics"))
+    # Distinct visitors per dataset/file and day are kept in HyperLogLog sketches. The per-visitor records
+    # are an opt-in audit trail; without them, views and downloads count each day's distinct visitors (estimated)
+    ANALYTICS_SKETCHES = os.getenv("ANALYTICS_SKETCHES", "True").lower() == "true"
+    ANALYTICS_AUDIT_RECORDS = os.getenv("ANALYTICS_AUDIT_RECORDS", "False").lower() == "true"
+
+    # "lru" (per process, least recently used evicted first), "simple", "redis" (shared by all workers) or "null"
+    CACHE_TYPE = os.getenv("CACHE_TYPE", "lru")
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    CACHE_KEY_PREFIX = "uvlhub:cache:"
+    CACHE_DEFAULT_TIMEOUT = int(os.getenv("CACHE_DEFAULT_TIMEOUT", 300))
+    # Without a shared cache, the versions that invalidate groups of entries are files of this directory
+    CACHE_VERSION_DIR = os.getenv("CACHE_VERSION_DIR", os.path.join("uploads", ".cache"))
 
     SESSION_TYPE = "sqlalchemy"
     SESSION_PERMANENT = False
@@ -53,6 +113,16 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
     WTF_CSRF_ENABLED = False
     SERVER_NAME = "localhost"
+    FILE_DELIVERY_MODE = "app"
+    STORAGE_BACKEND = "local"
+    # Tests recreate the database between cases, so nothing may outlive one of them
+    CACHE_TYPE = "null"
+    CACHE_VERSION_DIR = None
+    # Background threads would not see the in-memory database
+    HOMEPAGE_STATS_BACKGROUND_REFRESH = False
+    ANALYTICS_WRITE_BEHIND = False
+    # Tests follow the per-visitor records; those of the sketches alone turn them off
+    ANALYTICS_AUDIT_RECORDS = True
 
 
 class ProductionConfig(Config):
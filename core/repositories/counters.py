@@ -0,0 +1,88 @@
+from datetime import date
+from typing import List
+
+from sqlalchemy import Table, func
+from sqlalchemy.exc import IntegrityError
+
+
+def increment_counters(connection, table: Table, keys: dict, increments: dict):
+    """
+    Add ``increments`` to the counter columns of the row of ``table`` identified by ``keys`` (its primary
+    key or a unique key), creating the row when it is missing. Databases with upserts do it in one
+    atomic statement, so concurrent writers never lose an increment nor collide on the insert.
+    """
+    values = {**keys, **increments}
+    dialect = connection.dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table).values(**values)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: table.c[column] + statement.excluded[column] for column in increments},
+        )
+    elif dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+
+        statement = insert(table).values(**values)
+        statement = statement.on_duplicate_key_update(
+            {column: table.c[column] + statement.inserted[column] for column in increments}
+        )
+    else:
+        condition = [table.c[column] == value for column, value in keys.items()]
+        updated = connection.execute(
+            table.update()
+            .where(*condition)
+            .values({column: table.c[column] + value for column, value in increments.items()})
+        )
+        if updated.rowcount:
+            return
+        statement = table.insert().values(**values)
+
+    connection.execute(statement)
+
+
+def insert_ignoring_duplicates(connection, table: Table, rows: List[dict]) -> int:
+    """
+    Insert ``rows`` into ``table`` with one multi-row statement that skips, instead of failing on, the
+    rows whose unique key is already taken; returns how many rows were actually inserted.
+    """
+    dialect = connection.dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table).values(rows).on_conflict_do_nothing()
+    elif dialect in ("mysql", "mariadb"):
+        statement = table.insert().values(rows).prefix_with("IGNORE")
+    else:
+        inserted = 0
+        for row in rows:
+            try:
+                with connection.begin_nested():
+                    connection.execute(table.insert().values(**row))
+            except IntegrityError:
+                continue
+            inserted += 1
+        return inserted
+
+    return connection.execute(statement).rowcount
+
+
+def daily_counts(session, key_column, moment_column) -> dict:
+    """Events of a raw record table counted per (key, day), grouped by the database"""
+    day = func.date(moment_column)
+    counts = {}
+    for key, event_day, count in (
+        session.query(key_column, day, func.count()).filter(key_column.isnot(None)).group_by(key_column, day)
+    ):
+        # SQLite hands DATE() back as an ISO string
+        if isinstance(event_day, str):
+            event_day = date.fromisoformat(event_day)
+        counts[(key, event_day)] = count
+    return counts
@@ -19,14 +19,22 @@ class GenericResource(Resource):
         self.serializer = serializer
 
     def get(self, id=None):
+        try:
+            fields = self.serializer.parse_fields(request.args.get("fields"))
+        except ValueError as exc:
+            return {"message": str(exc)}, 400
+
         if id:
             item = self.model.query.get(id)
             if not item:
                 return {"message": f"{self.model_name} not found"}, 404
-            return self.serializer.serialize(item), 200
+            return self.serializer.serialize(item, fields), 200
         else:
-            items = self.model.query.all()
-            return {"items": [self.serializer.serialize(i) for i in items]}, 200
+            return {"items": self.list_items(fields)}, 200
+
+    def list_items(self, fields=None) -> list:
+        """Serialized collection; resources override it to answer narrow field sets without loading models"""
+        return [self.serializer.serialize(item, fields) for item in self.model.query.all()]
 
     def post(self):
         data = request.get_json()
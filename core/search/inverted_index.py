@@ -0,0 +1,197 @@
+import math
+import os
+import pickle
+import tempfile
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SNAPSHOT_VERSION = 1
+MAX_TERM_FREQUENCY = 2**16 - 1
+_DELETED = -1
+
+
+class InvertedIndex:
+    """
+    In-memory inverted index with BM25 ranking.
+
+    Postings are kept per term in two parallel typed arrays (internal document numbers and term
+    frequencies), so memory grows with a few bytes per posting rather than per Python object.
+    Updating a document appends new postings and tombstones the old ones, which are dropped by
+    ``compact`` once they make up a sizeable share of the index.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._term_ids: Dict[str, int] = {}
+        self._postings_docs: List[array] = []
+        self._postings_tfs: List[array] = []
+        self._doc_ids = array("q")  # internal document number -> external id (or _DELETED)
+        self._doc_lengths = array("I")
+        self._live: Dict[int, int] = {}  # external id -> internal document number
+        self._total_length = 0
+        self._sorted_terms: Optional[List[str]] = None
+        self.snapshot_mtime_ns: Optional[int] = None
+
+    def __len__(self):
+        return len(self._live)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._live
+
+    def add(self, doc_id: int, tokens: Iterable[str]):
+        """Index a document under ``doc_id``, replacing any previous version of it."""
+        self.remove(doc_id)
+
+        frequencies = Counter(tokens)
+        docno = len(self._doc_ids)
+        self._doc_ids.append(doc_id)
+        length = sum(frequencies.values())
+        self._doc_lengths.append(length)
+        self._live[doc_id] = docno
+        self._total_length += length
+
+        for term, frequency in frequencies.items():
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                term_id = self._term_ids[term] = len(self._postings_docs)
+                self._postings_docs.append(array("I"))
+                self._postings_tfs.append(array("H"))
+                self._sorted_terms = None
+            self._postings_docs[term_id].append(docno)
+            self._postings_tfs[term_id].append(min(frequency, MAX_TERM_FREQUENCY))
+
+        if len(self._doc_ids) > 2 * max(len(self._live), 64):
+            self.compact()
+
+    def remove(self, doc_id: int):
+        docno = self._live.pop(doc_id, None)
+        if docno is not None:
+            self._doc_ids[docno] = _DELETED
+            self._total_length -= self._doc_lengths[docno]
+
+    def search(self, terms: Iterable[str], limit: Optional[int] = None, prefix: bool = True) -> List[Tuple[int, float]]:
+        """
+        (doc_id, score) of the documents containing any of the terms, best first. With ``prefix``,
+        every term also matches the indexed terms it is a prefix of.
+        """
+        if not self._live:
+            return []
+
+        document_count = len(self._live)
+        average_length = self._total_length / document_count or 1.0
+        scores = defaultdict(float)
+
+        for term in set(terms):
+            for term_id in self._expand(term, prefix):
+                docs, tfs = self._postings_docs[term_id], self._postings_tfs[term_id]
+                document_frequency = len(docs)
+                idf = math.log(1 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+                for docno, tf in zip(docs, tfs):
+                    doc_id = self._doc_ids[docno]
+                    if doc_id == _DELETED:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[docno] / average_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return ranked[:limit] if limit is not None else ranked
+
+    def _expand(self, term: str, prefix: bool) -> List[int]:
+        if not prefix:
+            term_id = self._term_ids.get(term)
+            return [] if term_id is None else [term_id]
+
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._term_ids)
+        term_ids = []
+        position = bisect_left(self._sorted_terms, term)
+        while position < len(self._sorted_terms) and self._sorted_terms[position].startswith(term):
+            term_ids.append(self._term_ids[self._sorted_terms[position]])
+            position += 1
+        return term_ids
+
+    def compact(self):
+        """Drop tombstoned documents and terms left without postings, renumbering documents densely."""
+        renumbered = {}
+        doc_ids, doc_lengths = array("q"), array("I")
+        for docno, doc_id in enumerate(self._doc_ids):
+            if doc_id != _DELETED:
+                renumbered[docno] = len(doc_ids)
+                doc_ids.append(doc_id)
+                doc_lengths.append(self._doc_lengths[docno])
+
+        term_ids, postings_docs, postings_tfs = {}, [], []
+        for term, term_id in self._term_ids.items():
+            docs, tfs = array("I"), array("H")
+            for docno, tf in zip(self._postings_docs[term_id], self._postings_tfs[term_id]):
+                if docno in renumbered:
+                    docs.append(renumbered[docno])
+                    tfs.append(tf)
+            if docs:
+                term_ids[term] = len(postings_docs)
+                postings_docs.append(docs)
+                postings_tfs.append(tfs)
+
+        self._term_ids, self._postings_docs, self._postings_tfs = term_ids, postings_docs, postings_tfs
+        self._doc_ids, self._doc_lengths = doc_ids, doc_lengths
+        self._live = {doc_id: docno for docno, doc_id in enumerate(doc_ids)}
+        self._sorted_terms = None
+
+    def save(self, path: str):
+        """Write a compacted snapshot atomically, so readers never see a partial file."""
+        self.compact()
+        state = {
+            "version": SNAPSHOT_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "terms": list(self._term_ids),
+            "postings_docs": self._postings_docs,
+            "postings_tfs": self._postings_tfs,
+            "doc_ids": self._doc_ids,
+            "doc_lengths": self._doc_lengths,
+        }
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.snapshot_mtime_ns = os.stat(path).st_mtime_ns
+
+    @classmethod
+    def load(cls, path: str) -> Optional["InvertedIndex"]:
+        """The index stored in a snapshot written by ``save``, or None if there is no usable one."""
+        try:
+            with open(path, "rb") as f:
+                mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+                state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if not isinstance(state, dict) or state.get("version") != SNAPSHOT_VERSION:
+            return None
+
+        index = cls(k1=state["k1"], b=state["b"])
+        index._term_ids = {term: term_id for term_id, term in enumerate(state["terms"])}
+        index._postings_docs = state["postings_docs"]
+        index._postings_tfs = state["postings_tfs"]
+        index._doc_ids = state["doc_ids"]
+        index._doc_lengths = state["doc_lengths"]
+        index._live = {doc_id: docno for docno, doc_id in enumerate(index._doc_ids)}
+        index._total_length = sum(index._doc_lengths)
+        index.snapshot_mtime_ns = mtime_ns
+        return index
+
+    def is_stale(self, path: str) -> bool:
+        """Whether the snapshot at ``path`` was rewritten (e.g. by another worker) since this index last saw it."""
+        try:
+            return os.stat(path).st_mtime_ns != self.snapshot_mtime_ns
+        except OSError:
+            return False
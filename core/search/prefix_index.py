@@ -0,0 +1,111 @@
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+MEMO_SIZE = 4096
+
+
+class PrefixIndex:
+    """
+    In-memory completion index over short strings (titles, tags, names...) attached to documents.
+
+    Every suggestion is reachable from the start of each of its words through one sorted array of
+    keys, so a prefix lookup is a binary search plus a scan of the matching range. Suggestions are
+    ranked by the summed weight (e.g. downloads) of the documents carrying them, and the ranking of
+    each prefix is memoized until the next update.
+    """
+
+    def __init__(self, normalize: Callable[[str], str] = str.lower):
+        self.normalize = normalize
+        self._keys: List[Tuple[str, int]] = []  # (word-start suffix, suggestion number), sorted
+        self._suggestions: List[Optional[dict]] = []
+        self._numbers: Dict[Tuple[str, str], int] = {}  # (kind, normalized text) -> suggestion number
+        self._documents: Dict[int, Set[int]] = {}  # document id -> suggestion numbers
+        self._weights: Dict[int, int] = {}
+        self._memo: Dict[str, List[dict]] = {}
+        self.version = None
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._documents
+
+    def add(self, doc_id: int, suggestions: Iterable[Tuple[str, str]], weight: int = 0):
+        """Attach (kind, text) suggestions to ``doc_id``, replacing the ones it had."""
+        self.remove(doc_id)
+
+        numbers = set()
+        for kind, text in suggestions:
+            normalized = " ".join(self.normalize(text or "").split())
+            if not normalized:
+                continue
+            number = self._numbers.get((kind, normalized))
+            if number is None:
+                number = self._numbers[(kind, normalized)] = len(self._suggestions)
+                self._suggestions.append({"text": text.strip(), "kind": kind, "documents": set(), "score": 0})
+                for suffix in self._word_starts(normalized):
+                    insort(self._keys, (suffix, number))
+            if number not in numbers:
+                suggestion = self._suggestions[number]
+                suggestion["documents"].add(doc_id)
+                suggestion["score"] += weight
+                numbers.add(number)
+
+        self._documents[doc_id] = numbers
+        self._weights[doc_id] = weight
+        self._memo.clear()
+
+    def remove(self, doc_id: int):
+        numbers = self._documents.pop(doc_id, None)
+        if numbers is None:
+            return
+        weight = self._weights.pop(doc_id, 0)
+        for number in numbers:
+            suggestion = self._suggestions[number]
+            suggestion["documents"].discard(doc_id)
+            suggestion["score"] -= weight
+            if not suggestion["documents"]:
+                self._drop(number)
+        self._memo.clear()
+
+    def complete(self, prefix: str, limit: int = 10) -> List[dict]:
+        """The ``limit`` best suggestions with a word starting with ``prefix``, best first."""
+        prefix = " ".join(self.normalize(prefix or "").split())
+        if not prefix or limit <= 0:
+            return []
+
+        ranked = self._memo.get(prefix)
+        if ranked is None:
+            ranked = self._rank(prefix)
+            if len(self._memo) >= MEMO_SIZE:
+                self._memo.clear()
+            self._memo[prefix] = ranked
+        return [
+            {"text": suggestion["text"], "kind": suggestion["kind"], "count": len(suggestion["documents"])}
+            for suggestion in ranked[:limit]
+        ]
+
+    def _rank(self, prefix: str) -> List[dict]:
+        numbers = set()
+        position = bisect_left(self._keys, (prefix,))
+        while position < len(self._keys) and self._keys[position][0].startswith(prefix):
+            numbers.add(self._keys[position][1])
+            position += 1
+
+        suggestions = [self._suggestions[number] for number in numbers]
+        return sorted(suggestions, key=lambda s: (-s["score"], -len(s["documents"]), len(s["text"]), s["text"]))
+
+    def _drop(self, number: int):
+        suggestion = self._suggestions[number]
+        normalized = " ".join(self.normalize(suggestion["text"]).split())
+        for suffix in self._word_starts(normalized):
+            position = bisect_left(self._keys, (suffix, number))
+            if position < len(self._keys) and self._keys[position] == (suffix, number):
+                del self._keys[position]
+        del self._numbers[(suggestion["kind"], normalized)]
+        self._suggestions[number] = None
+
+    @staticmethod
+    def _word_starts(normalized: str) -> List[str]:
+        words = normalized.split(" ")
+        return [" ".join(words[i:]) for i in range(len(words))]
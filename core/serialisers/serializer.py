@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Optional
 
 
 def convert_value(value):
@@ -12,9 +13,24 @@ class Serializer:
         self.serialization_fields = serialization_fields
         self.related_serializers = related_serializers or {}
 
-    def serialize(self, instance):
+    def parse_fields(self, value: Optional[str]) -> Optional[list]:
+        """
+        Keys named in a comma-separated ``fields`` parameter, or None (every key) when it is absent.
+        Raises ValueError for keys this serializer does not know.
+        """
+        if not value:
+            return None
+        fields = [field.strip() for field in value.split(",") if field.strip()]
+        unknown = [field for field in fields if field not in self.serialization_fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return fields
+
+    def serialize(self, instance, fields=None):
         serialized_data = {}
         for key, attr_name in self.serialization_fields.items():
+            if fields is not None and key not in fields:
+                continue
             if key in self.related_serializers:
                 related_data = getattr(instance, attr_name)()
                 if isinstance(related_data, list):
@@ -0,0 +1,274 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from functools import partial
+from typing import BinaryIO, Iterator, List, Optional
+
+from flask import current_app
+
+from core.storage.blob_store import BlobStore
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # S3 support is optional
+    boto3 = None
+    ClientError = Exception
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _normalize_key(key: str) -> str:
+    parts = [part for part in key.replace("\\", "/").split("/") if part not in ("", ".")]
+    if not parts or ".." in parts:
+        raise ValueError(f"Invalid storage key: {key}")
+    return "/".join(parts)
+
+
+class StorageBackend:
+    """
+    Where uploaded files live. Keys are relative, "/"-separated paths such as
+    ``user_1/dataset_2/model.uvl``; reads and writes are streamed.
+    """
+
+    def open(self, key: str) -> BinaryIO:
+        raise NotImplementedError
+
+    def write(self, key: str, stream: BinaryIO):
+        raise NotImplementedError
+
+    def put_file(self, key: str, source_path: str, checksum: Optional[str] = None):
+        """Move the local file ``source_path`` into storage under ``key``."""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def size(self, key: str) -> Optional[int]:
+        raise NotImplementedError
+
+    def delete(self, key: str, checksum: Optional[str] = None):
+        raise NotImplementedError
+
+    def list(self, prefix: str) -> List[str]:
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Filesystem path of ``key`` when the backend has one (for send_file and X-Accel-Redirect)."""
+        return None
+
+    def url(self, key: str, download_name: Optional[str] = None) -> Optional[str]:
+        """A URL clients can download ``key`` from directly, if the backend offers one."""
+        return None
+
+    def link_duplicate(self, checksum: str, size: int, dest_path: str) -> bool:
+        """Materialise an already stored file with this checksum at ``dest_path``; False if unknown."""
+        return False
+
+    def iter_chunks(self, key: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        with self.open(key) as source:
+            for chunk in iter(lambda: source.read(chunk_size), b""):
+                yield chunk
+
+    @contextmanager
+    def local_file(self, key: str) -> Iterator[str]:
+        """A filesystem path with the content of ``key``, downloaded to a temp file if needed."""
+        path = self.local_path(key)
+        if path:
+            yield path
+            return
+
+        fd, temp_path = tempfile.mkstemp(suffix=os.path.splitext(key)[1])
+        try:
+            with os.fdopen(fd, "wb") as dest, self.open(key) as source:
+                shutil.copyfileobj(source, dest, CHUNK_SIZE)
+            yield temp_path
+        finally:
+            os.remove(temp_path)
+
+
+class LocalStorage(StorageBackend):
+    """Files under ``root`` at their key, deduplicated through a BlobStore when one is given."""
+
+    def __init__(self, root: str, blob_store: Optional[BlobStore] = None):
+        self.root = root
+        self.blob_store = blob_store
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *_normalize_key(key).split("/"))
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self._path(key), "rb")
+
+    def write(self, key: str, stream: BinaryIO):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as dest:
+            shutil.copyfileobj(stream, dest, CHUNK_SIZE)
+
+    def put_file(self, key: str, source_path: str, checksum: Optional[str] = None):
+        path = self._path(key)
+        if self.blob_store and checksum:
+            self.blob_store.store(source_path, checksum, path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.move(source_path, path)
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return os.path.getsize(self._path(key))
+        except OSError:
+            return None
+
+    def delete(self, key: str, checksum: Optional[str] = None):
+        path = self._path(key)
+        if self.blob_store and checksum:
+            self.blob_store.release(path, checksum)
+        elif os.path.lexists(path):
+            os.remove(path)
+
+    def list(self, prefix: str) -> List[str]:
+        prefix = _normalize_key(prefix)
+        # The directory that files directly under ``prefix`` are stored in
+        base = os.path.dirname(self._path(f"{prefix}/_"))
+        keys = []
+        for current, _, files in os.walk(base):
+            relative = os.path.relpath(current, base)
+            for name in files:
+                parts = [prefix] + ([] if relative == os.curdir else relative.split(os.sep)) + [name]
+                keys.append("/".join(parts))
+        return sorted(keys)
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self._path(key)
+
+    def link_duplicate(self, checksum: str, size: int, dest_path: str) -> bool:
+        if not self.blob_store or self.blob_store.get(checksum, size) is None:
+            return False
+        self.blob_store.link(checksum, dest_path)
+        return True
+
+
+class ShardedLocalStorage(LocalStorage):
+    """
+    Like LocalStorage, but each key's directory is placed under ``root/ab/cd/`` (from a hash of
+    the directory), so no single directory grows with the number of users or datasets. Files of
+    one dataset stay together.
+    """
+
+    def _path(self, key: str) -> str:
+        key = _normalize_key(key)
+        directory = key.rsplit("/", 1)[0] if "/" in key else ""
+        shard = hashlib.md5(directory.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, shard[:2], shard[2:4], *key.split("/"))
+
+
+class S3Storage(StorageBackend):
+    """Objects in an S3-compatible bucket (AWS S3, MinIO, ...). Requires boto3."""
+
+    def __init__(self, bucket: str, prefix: str = "", client=None, **client_kwargs):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("The S3 storage backend requires boto3 (pip install boto3)")
+            client = boto3.client("s3", **{k: v for k, v in client_kwargs.items() if v})
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+
+    def _object_key(self, key: str) -> str:
+        key = _normalize_key(key)
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def open(self, key: str) -> BinaryIO:
+        return self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))["Body"]
+
+    def iter_chunks(self, key: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        body = self.open(key)
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def write(self, key: str, stream: BinaryIO):
+        self.client.upload_fileobj(stream, self.bucket, self._object_key(key))
+
+    def put_file(self, key: str, source_path: str, checksum: Optional[str] = None):
+        self.client.upload_file(source_path, self.bucket, self._object_key(key))
+        os.remove(source_path)
+
+    def _head(self, key: str) -> Optional[dict]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def exists(self, key: str) -> bool:
+        return self._head(key) is not None
+
+    def size(self, key: str) -> Optional[int]:
+        head = self._head(key)
+        return head["ContentLength"] if head else None
+
+    def delete(self, key: str, checksum: Optional[str] = None):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    def list(self, prefix: str) -> List[str]:
+        object_prefix = self._object_key(prefix) + "/"
+        strip = len(self.prefix) + 1 if self.prefix else 0
+        keys = []
+        for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=object_prefix):
+            keys.extend(item["Key"][strip:] for item in page.get("Contents", []))
+        return sorted(keys)
+
+    def url(self, key: str, download_name: Optional[str] = None) -> Optional[str]:
+        params = {"Bucket": self.bucket, "Key": self._object_key(key)}
+        if download_name:
+            params["ResponseContentDisposition"] = f'attachment; filename="{download_name}"'
+        return self.client.generate_presigned_url("get_object", Params=params, ExpiresIn=300)
+
+
+def create_storage(config: dict, working_dir: str) -> StorageBackend:
+    backend = config.get("STORAGE_BACKEND", "local")
+    if backend == "s3":
+        return S3Storage(
+            config["S3_BUCKET"],
+            prefix=config.get("S3_PREFIX", ""),
+            endpoint_url=config.get("S3_ENDPOINT_URL"),
+            region_name=config.get("S3_REGION"),
+            aws_access_key_id=config.get("S3_ACCESS_KEY_ID"),
+            aws_secret_access_key=config.get("S3_SECRET_ACCESS_KEY"),
+        )
+
+    root = os.path.abspath(os.path.join(working_dir, config.get("STORAGE_ROOT", "uploads")))
+    blob_store = BlobStore(os.path.abspath(os.path.join(working_dir, config["BLOB_STORE_DIR"])))
+    if backend == "sharded":
+        return ShardedLocalStorage(root, blob_store)
+    if backend == "local":
+        return LocalStorage(root, blob_store)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+_STORAGE_SETTINGS = ("STORAGE_BACKEND", "STORAGE_ROOT", "BLOB_STORE_DIR", "S3_BUCKET", "S3_PREFIX", "S3_ENDPOINT_URL")
+
+
+def get_storage() -> StorageBackend:
+    """The application's storage backend, built from its config and reused while that is unchanged."""
+    settings = tuple(current_app.config.get(name) for name in _STORAGE_SETTINGS)
+    cached = current_app.extensions.get("storage")
+    if cached is None or cached[0] != settings:
+        working_dir = os.getenv("WORKING_DIR") or os.path.dirname(current_app.root_path)
+        cached = (settings, create_storage(current_app.config, working_dir))
+        current_app.extensions["storage"] = cached
+    return cached[1]
+
+
+def storage_source(storage: StorageBackend, key: str):
+    """A stream_zip source for ``key``: its path when stored locally, else a lazy opener."""
+    return storage.local_path(key) or partial(storage.open, key)
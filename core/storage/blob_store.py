@@ -0,0 +1,100 @@
+import errno
+import logging
+import os
+import re
+import shutil
+import uuid
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_CHECKSUM = re.compile(r"^[0-9a-f]{32}$")
+
+
+class BlobStore:
+    """
+    Content-addressed file store: one copy of each distinct file, named by its MD5 and sharded
+    as ``<root>/ab/cd/abcd...``. Dataset paths are hardlinks to the blob, so the blob's link count
+    is its reference count: a blob is removed when the last path pointing at it is released.
+
+    Where hardlinks are not available (e.g. the blob root is on another filesystem) files are
+    copied instead, which keeps paths valid at the cost of the deduplication.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path_for(self, checksum: str) -> str:
+        checksum = checksum.lower()
+        if not _CHECKSUM.match(checksum):
+            raise ValueError(f"Invalid checksum: {checksum}")
+        return os.path.join(self.root, checksum[:2], checksum[2:4], checksum)
+
+    def get(self, checksum: str, size: Optional[int] = None) -> Optional[str]:
+        """Return the blob path if a blob with this checksum (and size, when given) is stored."""
+        try:
+            path = self.path_for(checksum)
+            stat = os.stat(path)
+        except (ValueError, FileNotFoundError):
+            return None
+        if size is not None and stat.st_size != size:
+            return None
+        return path
+
+    def references(self, checksum: str) -> int:
+        path = self.get(checksum)
+        return os.stat(path).st_nlink - 1 if path else 0
+
+    def ingest(self, source: str, checksum: str) -> str:
+        """
+        Take ownership of ``source``, a file whose MD5 is ``checksum``. If the blob already exists
+        the source is simply dropped, otherwise it becomes the blob.
+        """
+        blob_path = self.path_for(checksum)
+        if os.path.exists(blob_path):
+            os.remove(source)
+            return blob_path
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        temp_path = os.path.join(os.path.dirname(blob_path), f".tmp-{uuid.uuid4().hex}")
+        shutil.move(source, temp_path)
+        os.replace(temp_path, blob_path)
+        return blob_path
+
+    def link(self, checksum: str, dest: str) -> str:
+        """Materialise the blob at ``dest`` (hardlink, or copy when links are unsupported)."""
+        blob_path = self.path_for(checksum)
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+        if os.path.lexists(dest):
+            os.remove(dest)
+        try:
+            os.link(blob_path, dest)
+        except OSError as exc:
+            if exc.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                raise
+            logger.warning(f"Cannot hardlink {blob_path} to {dest} ({exc}), copying instead")
+            shutil.copy2(blob_path, dest)
+        return dest
+
+    def store(self, source: str, checksum: str, dest: str) -> str:
+        """Move ``source`` into the store and leave a reference to it at ``dest``."""
+        self.ingest(source, checksum)
+        return self.link(checksum, dest)
+
+    def release(self, path: str, checksum: Optional[str] = None) -> bool:
+        """
+        Remove ``path`` and, if it was the last reference to its blob, the blob itself.
+        Returns True when the blob was removed.
+        """
+        if os.path.lexists(path):
+            os.remove(path)
+        blob_path = self.get(checksum) if checksum else None
+        if blob_path is None:
+            return False
+        try:
+            if os.stat(blob_path).st_nlink <= 1:
+                os.remove(blob_path)
+                return True
+        except FileNotFoundError:
+            pass
+        return False
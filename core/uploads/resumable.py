@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+from typing import BinaryIO, Optional, Tuple
+
+CHUNK_SIZE = 64 * 1024
+PARTIAL_DIR = ".partial"
+CHECKSUM_DIR = ".checksums"
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadNotFound(Exception):
+    pass
+
+
+class UploadOffsetMismatch(Exception):
+    def __init__(self, offset: int):
+        super().__init__(f"Upload is at offset {offset}")
+        self.offset = offset
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def normalize_upload_id(upload_id: str) -> Optional[str]:
+    """Accept plain or dashed UUIDs (Dropzone sends the latter) and return the 32-char hex form."""
+    candidate = str(upload_id or "").replace("-", "").lower()
+    return candidate if _UPLOAD_ID.match(candidate) else None
+
+
+def _sidecar_path(path: str) -> str:
+    directory, name = os.path.split(path)
+    return os.path.join(directory, CHECKSUM_DIR, f"{name}.json")
+
+
+def write_checksum_sidecar(path: str, checksum: str, size: int):
+    """Record the MD5 and size of ``path`` next to it, pinned to its current mtime."""
+    sidecar = _sidecar_path(path)
+    os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+    stat = os.stat(path)
+    with open(sidecar, "w") as sidecar_file:
+        json.dump({"checksum": checksum, "size": size, "mtime_ns": stat.st_mtime_ns}, sidecar_file)
+
+
+def read_checksum_sidecar(path: str) -> Optional[Tuple[str, int]]:
+    """Return the recorded (checksum, size) of ``path`` if the file has not changed since."""
+    try:
+        with open(_sidecar_path(path)) as sidecar_file:
+            data = json.load(sidecar_file)
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    if data.get("size") != stat.st_size or data.get("mtime_ns") != stat.st_mtime_ns:
+        return None
+    return data["checksum"], data["size"]
+
+
+def remove_checksum_sidecar(path: str):
+    try:
+        os.remove(_sidecar_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def save_stream(stream: BinaryIO, path: str) -> Tuple[str, int]:
+    """Write ``stream`` to ``path``, hashing it on the way, and record the checksum sidecar."""
+    hash_md5 = hashlib.md5()
+    size = 0
+    with open(path, "wb") as dest:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+            hash_md5.update(chunk)
+            dest.write(chunk)
+            size += len(chunk)
+    checksum = hash_md5.hexdigest()
+    write_checksum_sidecar(path, checksum, size)
+    return checksum, size
+
+
+class ResumableUploadStore:
+    """
+    Offset-based resumable uploads (the tus core protocol) into a directory.
+
+    Each upload is a ``<id>.part`` file plus a ``<id>.json`` state file under ``.partial/``.
+    A chunk is only accepted at the current offset, so a client that lost a response asks for
+    the offset and retries from there. MD5 is updated as bytes arrive; the running hash lives in
+    this process, and is rebuilt from the partial file if the upload resumes in another worker.
+    """
+
+    _hashers = {}
+    _lock = threading.Lock()
+
+    def __init__(self, root: str, max_bytes: Optional[int] = None):
+        self.root = root
+        self.partial_dir = os.path.join(root, PARTIAL_DIR)
+        self.max_bytes = max_bytes
+
+    def _part_path(self, upload_id: str) -> str:
+        return os.path.join(self.partial_dir, f"{upload_id}.part")
+
+    def _state_path(self, upload_id: str) -> str:
+        return os.path.join(self.partial_dir, f"{upload_id}.json")
+
+    def _write_state(self, upload_id: str, state: dict):
+        temp_path = f"{self._state_path(upload_id)}.tmp"
+        with open(temp_path, "w") as state_file:
+            json.dump(state, state_file)
+        os.replace(temp_path, self._state_path(upload_id))
+
+    def create(self, filename: str, length: int, upload_id: Optional[str] = None) -> str:
+        if length < 0 or (self.max_bytes is not None and length > self.max_bytes):
+            raise UploadTooLarge(f"Upload length {length} exceeds the limit of {self.max_bytes} bytes")
+        upload_id = upload_id or uuid.uuid4().hex
+        os.makedirs(self.partial_dir, exist_ok=True)
+        open(self._part_path(upload_id), "wb").close()
+        self._write_state(upload_id, {"filename": filename, "length": length})
+        return upload_id
+
+    def status(self, upload_id: str) -> Optional[dict]:
+        """Return {filename, length, offset} or None if the upload does not exist."""
+        try:
+            with open(self._state_path(upload_id)) as state_file:
+                state = json.load(state_file)
+            state["offset"] = os.path.getsize(self._part_path(upload_id))
+        except (OSError, ValueError):
+            return None
+        return state
+
+    def _hasher_for(self, upload_id: str, offset: int):
+        key = self._part_path(upload_id)
+        with self._lock:
+            entry = self._hashers.get(key)
+        if entry and entry[0] == offset:
+            return entry[1].copy()
+
+        # Resumed in another process or after a restart: rebuild the hash from what we have
+        hash_md5 = hashlib.md5()
+        with open(key, "rb") as part_file:
+            remaining = offset
+            while remaining > 0:
+                chunk = part_file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                hash_md5.update(chunk)
+                remaining -= len(chunk)
+        return hash_md5
+
+    def append(self, upload_id: str, offset: int, stream: BinaryIO) -> int:
+        """Append ``stream`` at ``offset`` and return the new offset."""
+        state = self.status(upload_id)
+        if state is None:
+            raise UploadNotFound(upload_id)
+        if offset != state["offset"]:
+            raise UploadOffsetMismatch(state["offset"])
+
+        hash_md5 = self._hasher_for(upload_id, offset)
+        new_offset = offset
+        with open(self._part_path(upload_id), "r+b") as part_file:
+            part_file.seek(offset)
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                if new_offset + len(chunk) > state["length"]:
+                    part_file.truncate(offset)
+                    with self._lock:
+                        self._hashers.pop(self._part_path(upload_id), None)
+                    raise UploadTooLarge(f"Upload exceeds its declared length of {state['length']} bytes")
+                part_file.write(chunk)
+                hash_md5.update(chunk)
+                new_offset += len(chunk)
+
+        with self._lock:
+            self._hashers[self._part_path(upload_id)] = (new_offset, hash_md5)
+        return new_offset
+
+    def is_complete(self, upload_id: str) -> bool:
+        state = self.status(upload_id)
+        return state is not None and state["offset"] == state["length"]
+
+    def finish(self, upload_id: str, dest_path: str) -> Tuple[str, int]:
+        """Move a complete upload to ``dest_path`` and record its checksum sidecar."""
+        state = self.status(upload_id)
+        if state is None:
+            raise UploadNotFound(upload_id)
+        if state["offset"] != state["length"]:
+            raise UploadOffsetMismatch(state["offset"])
+
+        checksum = self._hasher_for(upload_id, state["offset"]).hexdigest()
+        shutil.move(self._part_path(upload_id), dest_path)
+        self.abort(upload_id)
+        write_checksum_sidecar(dest_path, checksum, state["length"])
+        return checksum, state["length"]
+
+    def abort(self, upload_id: str):
+        with self._lock:
+            self._hashers.pop(self._part_path(upload_id), None)
+        for path in (self._part_path(upload_id), self._state_path(upload_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
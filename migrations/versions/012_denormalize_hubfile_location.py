@@ -0,0 +1,48 @@
+"""denormalize dataset_id and user_id on file
+
+Revision ID: 012
+Revises: a953b1fc1a78
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "012"
+down_revision = "a953b1fc1a78"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("file", sa.Column("dataset_id", sa.Integer(), nullable=True))
+    op.add_column("file", sa.Column("user_id", sa.Integer(), nullable=True))
+    op.create_foreign_key("fk_file_dataset_id", "file", "data_set", ["dataset_id"], ["id"], ondelete="CASCADE")
+    op.create_foreign_key("fk_file_user_id", "file", "user", ["user_id"], ["id"])
+    op.create_index("ix_file_dataset_id", "file", ["dataset_id"])
+
+    # Backfill from whichever child (feature model, image or audio) owns each file
+    for child_table, child_column in (
+        ("feature_model", "feature_model_id"),
+        ("image", "image_id"),
+        ("audio", "audio_id"),
+    ):
+        op.execute(
+            f"UPDATE file SET dataset_id = "
+            f"(SELECT {child_table}.data_set_id FROM {child_table} WHERE {child_table}.id = file.{child_column}) "
+            f"WHERE file.{child_column} IS NOT NULL AND file.dataset_id IS NULL"
+        )
+    op.execute(
+        "UPDATE file SET user_id = (SELECT data_set.user_id FROM data_set WHERE data_set.id = file.dataset_id) "
+        "WHERE file.dataset_id IS NOT NULL"
+    )
+
+
+def downgrade():
+    op.drop_index("ix_file_dataset_id", table_name="file")
+    op.drop_constraint("fk_file_user_id", "file", type_="foreignkey")
+    op.drop_constraint("fk_file_dataset_id", "file", type_="foreignkey")
+    op.drop_column("file", "user_id")
+    op.drop_column("file", "dataset_id")
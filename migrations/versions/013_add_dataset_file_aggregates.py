@@ -0,0 +1,32 @@
+"""add materialized files_count and total_size to data_set
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "013"
+down_revision = "012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("data_set", sa.Column("files_count", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("data_set", sa.Column("total_size", sa.BigInteger(), nullable=False, server_default="0"))
+
+    op.execute(
+        "UPDATE data_set SET "
+        "files_count = (SELECT COUNT(*) FROM file WHERE file.dataset_id = data_set.id), "
+        "total_size = (SELECT COALESCE(SUM(file.size), 0) FROM file WHERE file.dataset_id = data_set.id)"
+    )
+
+
+def downgrade():
+    op.drop_column("data_set", "total_size")
+    op.drop_column("data_set", "files_count")
@@ -0,0 +1,54 @@
+"""add full-text search index for explore
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "014"
+down_revision = "013"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "dataset_search_index",
+        sa.Column("data_set_id", sa.Integer(), nullable=False),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(["data_set_id"], ["data_set.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("data_set_id"),
+    )
+    op.execute("CREATE FULLTEXT INDEX ix_dataset_search_index_body ON dataset_search_index (body)")
+
+    # Rough backfill; `rosemary explore:reindex` rebuilds it with the application's normalization
+    op.execute(
+        "INSERT INTO dataset_search_index (data_set_id, body) "
+        "SELECT data_set.id, LOWER(CONCAT_WS(' ', "
+        "ds_meta_data.title, ds_meta_data.description, ds_meta_data.tags, "
+        "ds_meta_data.publication_doi, ds_meta_data.dataset_doi, "
+        "(SELECT GROUP_CONCAT(CONCAT_WS(' ', author.name, author.affiliation, author.orcid) SEPARATOR ' ') "
+        "FROM author WHERE author.ds_meta_data_id = ds_meta_data.id), "
+        "(SELECT GROUP_CONCAT(CONCAT_WS(' ', fm_meta_data.uvl_filename, fm_meta_data.title, "
+        "fm_meta_data.description, fm_meta_data.publication_doi, fm_meta_data.tags) SEPARATOR ' ') "
+        "FROM feature_model JOIN fm_meta_data ON fm_meta_data.id = feature_model.fm_meta_data_id "
+        "WHERE feature_model.data_set_id = data_set.id), "
+        "(SELECT GROUP_CONCAT(CONCAT_WS(' ', image_meta_data.filename, image_meta_data.title, "
+        "image_meta_data.description, image_meta_data.publication_doi, image_meta_data.tags) SEPARATOR ' ') "
+        "FROM image JOIN image_meta_data ON image_meta_data.id = image.image_meta_data_id "
+        "WHERE image.data_set_id = data_set.id), "
+        "(SELECT GROUP_CONCAT(CONCAT_WS(' ', audio_meta_data.filename, audio_meta_data.title, "
+        "audio_meta_data.description, audio_meta_data.publication_doi, audio_meta_data.tags) SEPARATOR ' ') "
+        "FROM audio JOIN audio_meta_data ON audio_meta_data.id = audio.audio_meta_data_id "
+        "WHERE audio.data_set_id = data_set.id))) "
+        "FROM data_set JOIN ds_meta_data ON ds_meta_data.id = data_set.ds_meta_data_id"
+    )
+
+
+def downgrade():
+    op.drop_table("dataset_search_index")
@@ -0,0 +1,23 @@
+"""add (created_at, id) index on data_set for keyset pagination
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "015"
+down_revision = "014"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_data_set_created_at_id", "data_set", ["created_at", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_data_set_created_at_id", table_name="data_set")
@@ -0,0 +1,89 @@
+"""add normalized tag table and tag associations
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+import unidecode
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "016"
+down_revision = "015"
+branch_labels = None
+depends_on = None
+
+OWNER_TABLES = ("ds_meta_data", "fm_meta_data", "image_meta_data", "audio_meta_data")
+
+
+def normalize_tag(name):
+    return " ".join(unidecode.unidecode(name).lower().split())
+
+
+def upgrade():
+    op.create_table(
+        "tag",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=120), nullable=False),
+        sa.Column("normalized_name", sa.String(length=120), nullable=False),
+        sa.Column("usage_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_tag_normalized_name", "tag", ["normalized_name"], unique=True)
+
+    for owner_table in OWNER_TABLES:
+        op.create_table(
+            f"{owner_table}_tag",
+            sa.Column(f"{owner_table}_id", sa.Integer(), nullable=False),
+            sa.Column("tag_id", sa.Integer(), nullable=False),
+            sa.Column("position", sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint([f"{owner_table}_id"], [f"{owner_table}.id"], ondelete="CASCADE"),
+            sa.ForeignKeyConstraint(["tag_id"], ["tag.id"], ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint(f"{owner_table}_id", "tag_id"),
+        )
+        op.create_index(f"ix_{owner_table}_tag_tag_id", f"{owner_table}_tag", ["tag_id"])
+
+    # Backfill from the comma-separated tag strings
+    connection = op.get_bind()
+    tag_ids = {}
+    for owner_table in OWNER_TABLES:
+        rows = connection.execute(sa.text(f"SELECT id, tags FROM {owner_table} WHERE tags IS NOT NULL")).fetchall()
+        for owner_id, tags in rows:
+            seen = set()
+            for name in tags.split(","):
+                name = name.strip()
+                normalized = normalize_tag(name)
+                if not normalized or normalized in seen:
+                    continue
+                if normalized not in tag_ids:
+                    connection.execute(
+                        sa.text("INSERT INTO tag (name, normalized_name, usage_count) VALUES (:name, :normalized, 0)"),
+                        {"name": name, "normalized": normalized},
+                    )
+                    tag_ids[normalized] = connection.execute(
+                        sa.text("SELECT id FROM tag WHERE normalized_name = :normalized"), {"normalized": normalized}
+                    ).scalar()
+                connection.execute(
+                    sa.text(
+                        f"INSERT INTO {owner_table}_tag ({owner_table}_id, tag_id, position) "
+                        "VALUES (:owner_id, :tag_id, :position)"
+                    ),
+                    {"owner_id": owner_id, "tag_id": tag_ids[normalized], "position": len(seen)},
+                )
+                seen.add(normalized)
+
+    usage = " + ".join(
+        f"(SELECT COUNT(*) FROM {owner_table}_tag WHERE {owner_table}_tag.tag_id = tag.id)"
+        for owner_table in OWNER_TABLES
+    )
+    op.execute(f"UPDATE tag SET usage_count = {usage}")
+
+
+def downgrade():
+    for owner_table in reversed(OWNER_TABLES):
+        op.drop_table(f"{owner_table}_tag")
+    op.drop_index("ix_tag_normalized_name", table_name="tag")
+    op.drop_table("tag")
@@ -0,0 +1,149 @@
+"""turn the search index into a denormalized search document per published dataset
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+import json
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "017"
+down_revision = "016"
+branch_labels = None
+depends_on = None
+
+PUBLICATION_TYPES = (
+    "NONE",
+    "ANNOTATION_COLLECTION",
+    "BOOK",
+    "BOOK_SECTION",
+    "CONFERENCE_PAPER",
+    "DATA_MANAGEMENT_PLAN",
+    "JOURNAL_ARTICLE",
+    "PATENT",
+    "PREPRINT",
+    "PROJECT_DELIVERABLE",
+    "PROJECT_MILESTONE",
+    "PROPOSAL",
+    "REPORT",
+    "SOFTWARE_DOCUMENTATION",
+    "TAXONOMIC_TREATMENT",
+    "TECHNICAL_NOTE",
+    "THESIS",
+    "WORKING_PAPER",
+    "OTHER",
+)
+
+
+def upgrade():
+    op.rename_table("dataset_search_index", "dataset_search_document")
+    op.execute(
+        "ALTER TABLE dataset_search_document "
+        "RENAME INDEX ix_dataset_search_index_body TO ix_dataset_search_document_body"
+    )
+
+    with op.batch_alter_table("dataset_search_document") as batch_op:
+        batch_op.add_column(sa.Column("ds_meta_data_id", sa.Integer(), nullable=False, server_default="0"))
+        batch_op.add_column(sa.Column("dataset_type", sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column("title", sa.String(length=120), nullable=False, server_default=""))
+        batch_op.add_column(sa.Column("description", sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column("authors", sa.JSON(), nullable=True))
+        batch_op.add_column(
+            sa.Column("publication_type", sa.Enum(*PUBLICATION_TYPES, name="publicationtype"), nullable=True)
+        )
+        batch_op.add_column(sa.Column("publication_doi", sa.String(length=120), nullable=True))
+        batch_op.add_column(sa.Column("dataset_doi", sa.String(length=120), nullable=True))
+        batch_op.add_column(sa.Column("tags", sa.String(length=120), nullable=True))
+        batch_op.add_column(sa.Column("files_count", sa.Integer(), nullable=False, server_default="0"))
+        batch_op.add_column(sa.Column("total_size", sa.BigInteger(), nullable=False, server_default="0"))
+        batch_op.add_column(sa.Column("download_count", sa.Integer(), nullable=False, server_default="0"))
+        batch_op.add_column(sa.Column("created_at", sa.DateTime(), nullable=True))
+    op.create_index(
+        "ix_dataset_search_document_created_at_id", "dataset_search_document", ["created_at", "data_set_id"]
+    )
+
+    # Only published datasets keep a document
+    op.execute(
+        "DELETE FROM dataset_search_document WHERE data_set_id NOT IN ("
+        "SELECT data_set.id FROM data_set JOIN ds_meta_data ON ds_meta_data.id = data_set.ds_meta_data_id "
+        "WHERE ds_meta_data.dataset_doi IS NOT NULL)"
+    )
+
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.text(
+            "SELECT data_set.id, ds_meta_data.id, data_set.dataset_type, ds_meta_data.title, "
+            "ds_meta_data.description, ds_meta_data.publication_type, ds_meta_data.publication_doi, "
+            "ds_meta_data.dataset_doi, ds_meta_data.tags, data_set.files_count, data_set.total_size, "
+            "data_set.download_count, data_set.created_at "
+            "FROM dataset_search_document "
+            "JOIN data_set ON data_set.id = dataset_search_document.data_set_id "
+            "JOIN ds_meta_data ON ds_meta_data.id = data_set.ds_meta_data_id"
+        )
+    ).fetchall()
+    for row in rows:
+        authors = connection.execute(
+            sa.text("SELECT name, affiliation, orcid FROM author WHERE ds_meta_data_id = :id ORDER BY id"),
+            {"id": row[1]},
+        ).fetchall()
+        connection.execute(
+            sa.text(
+                "UPDATE dataset_search_document SET ds_meta_data_id = :ds_meta_data_id, dataset_type = :dataset_type, "
+                "title = :title, description = :description, authors = :authors, "
+                "publication_type = :publication_type, publication_doi = :publication_doi, "
+                "dataset_doi = :dataset_doi, tags = :tags, files_count = :files_count, total_size = :total_size, "
+                "download_count = :download_count, created_at = :created_at WHERE data_set_id = :data_set_id"
+            ),
+            {
+                "data_set_id": row[0],
+                "ds_meta_data_id": row[1],
+                "dataset_type": row[2],
+                "title": row[3],
+                "description": row[4],
+                "authors": json.dumps(
+                    [{"name": name, "affiliation": affiliation, "orcid": orcid} for name, affiliation, orcid in authors]
+                ),
+                "publication_type": row[5],
+                "publication_doi": row[6],
+                "dataset_doi": row[7],
+                "tags": row[8],
+                "files_count": row[9] or 0,
+                "total_size": row[10] or 0,
+                "download_count": row[11] or 0,
+                "created_at": row[12],
+            },
+        )
+
+    with op.batch_alter_table("dataset_search_document") as batch_op:
+        batch_op.alter_column("created_at", existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    op.drop_index("ix_dataset_search_document_created_at_id", table_name="dataset_search_document")
+    with op.batch_alter_table("dataset_search_document") as batch_op:
+        for column_name in (
+            "created_at",
+            "download_count",
+            "total_size",
+            "files_count",
+            "tags",
+            "dataset_doi",
+            "publication_doi",
+            "publication_type",
+            "authors",
+            "description",
+            "title",
+            "dataset_type",
+            "ds_meta_data_id",
+        ):
+            batch_op.drop_column(column_name)
+    op.execute(
+        "ALTER TABLE dataset_search_document "
+        "RENAME INDEX ix_dataset_search_document_body TO ix_dataset_search_index_body"
+    )
+    op.rename_table("dataset_search_document", "dataset_search_index")
@@ -0,0 +1,64 @@
+"""add daily view/download rollups of datasets and files
+
+Revision ID: 018
+Revises: 017
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "018"
+down_revision = "017"
+branch_labels = None
+depends_on = None
+
+# (rollup table, key column, raw record table, its date column, rollup counter)
+BACKFILLS = (
+    ("ds_daily_stats", "dataset_id", "ds_download_record", "download_date", "downloads"),
+    ("ds_daily_stats", "dataset_id", "ds_view_record", "view_date", "views"),
+    ("file_daily_stats", "file_id", "file_download_record", "download_date", "downloads"),
+    ("file_daily_stats", "file_id", "file_view_record", "view_date", "views"),
+)
+
+
+def upgrade():
+    op.create_table(
+        "ds_daily_stats",
+        sa.Column("dataset_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("views", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("downloads", sa.Integer(), nullable=False, server_default="0"),
+        sa.ForeignKeyConstraint(["dataset_id"], ["data_set.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("dataset_id", "day"),
+    )
+    op.create_index("ix_ds_daily_stats_day", "ds_daily_stats", ["day"])
+
+    op.create_table(
+        "file_daily_stats",
+        sa.Column("file_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("views", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("downloads", sa.Integer(), nullable=False, server_default="0"),
+        sa.ForeignKeyConstraint(["file_id"], ["file.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("file_id", "day"),
+    )
+    op.create_index("ix_file_daily_stats_day", "file_daily_stats", ["day"])
+
+    # Count the existing records; the second pass of each table adds to the days the first one created
+    for table, key, records, date_column, counter in BACKFILLS:
+        op.execute(
+            f"INSERT INTO {table} ({key}, day, {counter}) "
+            f"SELECT {key}, DATE({date_column}), COUNT(*) FROM {records} "
+            f"WHERE {key} IS NOT NULL GROUP BY {key}, DATE({date_column}) "
+            f"ON DUPLICATE KEY UPDATE {counter} = VALUES({counter})"
+        )
+
+
+def downgrade():
+    op.drop_index("ix_file_daily_stats_day", table_name="file_daily_stats")
+    op.drop_table("file_daily_stats")
+    op.drop_index("ix_ds_daily_stats_day", table_name="ds_daily_stats")
+    op.drop_table("ds_daily_stats")
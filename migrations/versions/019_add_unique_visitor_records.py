@@ -0,0 +1,61 @@
+"""unique (subject, user, cookie) key on view and download records
+
+Revision ID: 019
+Revises: 018
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "019"
+down_revision = "018"
+branch_labels = None
+depends_on = None
+
+# (record table, subject column, cookie column, unique constraint)
+RECORD_TABLES = (
+    ("ds_download_record", "dataset_id", "download_cookie", "uq_ds_download_record_visitor"),
+    ("ds_view_record", "dataset_id", "view_cookie", "uq_ds_view_record_visitor"),
+    ("file_download_record", "file_id", "download_cookie", "uq_file_download_record_visitor"),
+    ("file_view_record", "file_id", "view_cookie", "uq_file_view_record_visitor"),
+)
+
+# (rollup table, key column, record table, its date column, rollup counter), as backfilled by 018
+ROLLUPS = (
+    ("ds_daily_stats", "dataset_id", "ds_download_record", "download_date", "downloads"),
+    ("ds_daily_stats", "dataset_id", "ds_view_record", "view_date", "views"),
+    ("file_daily_stats", "file_id", "file_download_record", "download_date", "downloads"),
+    ("file_daily_stats", "file_id", "file_view_record", "view_date", "views"),
+)
+
+
+def upgrade():
+    for table, subject, cookie, constraint in RECORD_TABLES:
+        op.add_column(table, sa.Column("user_key", sa.Integer(), sa.Computed("coalesce(user_id, 0)", persisted=True)))
+
+        # Keep the first record of each visitor; the check-then-insert it replaces let duplicates through
+        op.execute(
+            f"DELETE newer FROM {table} newer JOIN {table} older "
+            f"ON newer.{subject} = older.{subject} AND newer.user_key = older.user_key "
+            f"AND newer.{cookie} = older.{cookie} AND newer.id > older.id"
+        )
+        op.create_unique_constraint(constraint, table, [subject, "user_key", cookie])
+
+    # The rollups were counted from the records duplicates included, so they are counted again
+    for table, key, records, date_column, counter in ROLLUPS:
+        op.execute(f"UPDATE {table} SET {counter} = 0")
+        op.execute(
+            f"INSERT INTO {table} ({key}, day, {counter}) "
+            f"SELECT {key}, DATE({date_column}), COUNT(*) FROM {records} "
+            f"WHERE {key} IS NOT NULL GROUP BY {key}, DATE({date_column}) "
+            f"ON DUPLICATE KEY UPDATE {counter} = VALUES({counter})"
+        )
+
+
+def downgrade():
+    for table, subject, cookie, constraint in RECORD_TABLES:
+        op.drop_constraint(constraint, table, type_="unique")
+        op.drop_column(table, "user_key")
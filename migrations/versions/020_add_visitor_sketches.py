@@ -0,0 +1,117 @@
+"""add daily and monthly HyperLogLog sketches of distinct visitors of datasets and files
+
+Revision ID: 020
+Revises: 019
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+import hashlib
+import zlib
+from collections import defaultdict
+from itertools import groupby
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "020"
+down_revision = "019"
+branch_labels = None
+depends_on = None
+
+# Sketch layout of core.analytics.hyperloglog at the time of this migration, copied so that later changes
+# to the application code do not change what the migration writes
+PRECISION = 12
+
+# (table prefix, subject column, referenced table)
+SUBJECTS = (
+    ("ds", "dataset_id", "data_set"),
+    ("file", "file_id", "file"),
+)
+
+# Table prefix -> (record table, time column, cookie column, sketch column)
+RECORDS = {
+    "ds": (
+        ("ds_view_record", "view_date", "view_cookie", "views"),
+        ("ds_download_record", "download_date", "download_cookie", "downloads"),
+    ),
+    "file": (
+        ("file_view_record", "view_date", "view_cookie", "views"),
+        ("file_download_record", "download_date", "download_cookie", "downloads"),
+    ),
+}
+
+
+def upgrade():
+    connection = op.get_bind()
+    for prefix, subject, parent in SUBJECTS:
+        for period in ("day", "month"):
+            table = f"{prefix}_{'daily' if period == 'day' else 'monthly'}_sketch"
+            op.create_table(
+                table,
+                sa.Column(subject, sa.Integer(), nullable=False),
+                sa.Column(period, sa.Date(), nullable=False),
+                sa.Column("views", sa.LargeBinary(), nullable=True),
+                sa.Column("downloads", sa.LargeBinary(), nullable=True),
+                sa.ForeignKeyConstraint([subject], [f"{parent}.id"], ondelete="CASCADE"),
+                sa.PrimaryKeyConstraint(subject, period),
+            )
+        op.create_index(f"ix_{prefix}_daily_sketch_day", f"{prefix}_daily_sketch", ["day"])
+
+        _backfill(connection, prefix, subject)
+
+
+def downgrade():
+    for prefix, _, _ in SUBJECTS:
+        op.drop_table(f"{prefix}_monthly_sketch")
+        op.drop_index(f"ix_{prefix}_daily_sketch_day", table_name=f"{prefix}_daily_sketch")
+        op.drop_table(f"{prefix}_daily_sketch")
+
+
+def _backfill(connection, prefix: str, subject: str):
+    """Sketch the visitors of the records stored so far, one subject at a time"""
+    tables = {
+        period: sa.table(name, sa.column(subject), sa.column(period), sa.column("views"), sa.column("downloads"))
+        for period, name in (("day", f"{prefix}_daily_sketch"), ("month", f"{prefix}_monthly_sketch"))
+    }
+    written = set()
+    for records, moment, cookie, column in RECORDS[prefix]:
+        record_table = sa.table(
+            records, sa.column(subject), sa.column("user_id"), sa.column(cookie), sa.column(moment, sa.DateTime())
+        )
+        rows = connection.execute(
+            sa.select(record_table.c[subject], record_table.c.user_id, record_table.c[cookie], record_table.c[moment])
+            .where(record_table.c[subject].isnot(None))
+            .order_by(record_table.c[subject])
+        )
+        for subject_id, subject_rows in groupby(rows, key=lambda row: row[0]):
+            sketches = defaultdict(lambda: bytearray(1 << PRECISION))
+            for _, user_id, visitor_cookie, at in subject_rows:
+                visitor = f"{user_id or 0}:{visitor_cookie}"
+                _add(sketches[("day", at.date())], visitor)
+                _add(sketches[("month", at.date().replace(day=1))], visitor)
+
+            for (period, start), registers in sketches.items():
+                sketch_table = tables[period]
+                sketch = bytes([PRECISION]) + zlib.compress(bytes(registers))
+                if (period, subject_id, start) in written:
+                    connection.execute(
+                        sketch_table.update()
+                        .where(sketch_table.c[subject] == subject_id, sketch_table.c[period] == start)
+                        .values({column: sketch})
+                    )
+                else:
+                    connection.execute(
+                        sketch_table.insert().values({subject: subject_id, period: start, column: sketch})
+                    )
+                    written.add((period, subject_id, start))
+
+
+def _add(registers: bytearray, visitor: str):
+    digest = int.from_bytes(hashlib.blake2b(visitor.encode("utf-8"), digest_size=8).digest(), "big")
+    bucket = digest >> (64 - PRECISION)
+    rest = digest & ((1 << (64 - PRECISION)) - 1)
+    rank = (64 - PRECISION) - rest.bit_length() + 1
+    if rank > registers[bucket]:
+        registers[bucket] = rank
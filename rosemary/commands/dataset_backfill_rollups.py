@@ -0,0 +1,20 @@
+import click
+from flask.cli import with_appcontext
+
+
+@click.command(
+    "dataset:backfill-rollups",
+    help="Rebuilds the daily view/download rollups of datasets and files from the raw record tables.",
+)
+@with_appcontext
+def dataset_backfill_rollups():
+    from app.modules.dataset.services import DataSetService
+    from app.modules.hubfile.services import HubfileService
+
+    try:
+        dataset_days = DataSetService().rebuild_daily_stats()
+        file_days = HubfileService().rebuild_daily_stats()
+    except ValueError as exc:
+        raise click.ClickException(str(exc))
+
+    click.echo(click.style(f"Rebuilt {dataset_days} dataset day(s) and {file_days} file day(s).", fg="green"))
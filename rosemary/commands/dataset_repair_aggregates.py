@@ -0,0 +1,28 @@
+import click
+from flask.cli import with_appcontext
+
+
+@click.command(
+    "dataset:repair-aggregates",
+    help="Recomputes the materialized files_count/total_size of every dataset from the file table.",
+)
+@with_appcontext
+def dataset_repair_aggregates():
+    from app.modules.dataset.services import DataSetService
+
+    dataset_service = DataSetService()
+
+    filled = dataset_service.backfill_file_locations()
+    if filled:
+        click.echo(click.style(f"Filled in the dataset of {filled} file(s).", fg="yellow"))
+
+    repaired = dataset_service.repair_file_aggregates()
+    for dataset_id, (old_count, old_size), (new_count, new_size) in repaired:
+        click.echo(
+            f"dataset {dataset_id}: {old_count} files / {old_size} bytes -> {new_count} files / {new_size} bytes"
+        )
+
+    if repaired:
+        click.echo(click.style(f"Repaired {len(repaired)} dataset(s).", fg="green"))
+    else:
+        click.echo(click.style("All dataset aggregates are consistent.", fg="green"))
@@ -0,0 +1,13 @@
+import click
+from flask.cli import with_appcontext
+
+
+@click.command(
+    "explore:reindex", help="Rebuilds the search documents (and full-text index) Explore reads published datasets from."
+)
+@with_appcontext
+def explore_reindex():
+    from app.modules.explore.services import ExploreService
+
+    indexed = ExploreService().rebuild_search_index()
+    click.echo(click.style(f"Indexed {indexed} dataset(s).", fg="green"))